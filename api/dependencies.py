@@ -1,4 +1,9 @@
+import asyncio
+import hmac
+import os
 from functools import lru_cache
+from typing import Any, Dict, Optional
+from fastapi import Header, HTTPException
 from core.services.openai_service import OpenAIService
 from core.services.formatter_service import MessageFormatter
 from core.services.dixa_service import DixaAPIService
@@ -6,6 +11,17 @@ from core.services.database_service import MongoDBService
 from core.services.validation_service import ValidationService
 from core.services.dashboard_service import DashboardAPIService
 from core.services.slack_service import SlackService
+from core.services.email_preprocessor import EmailPreprocessor
+from core.services.coalescing_service import MessageCoalescer
+from core.services.openai_usage import OpenAIUsageTracker
+from core.services.traffic_capture import TrafficRecorder
+from utils.http_pool import pool_stats
+from utils.loop_watchdog import LoopLagWatchdog
+from utils.profiling import SlowRequestProfiler
+from utils.readiness import ReadinessMonitor
+from core.services.checkpoint_service import CheckpointRecovery
+from utils.warmup import Warmup
+from config import settings
 
 # Service factory functions with caching for singleton behavior
 @lru_cache()
@@ -36,6 +52,75 @@ def get_dashboard_service() -> DashboardAPIService:
 def get_slack_service() -> SlackService:
     return SlackService()
 
+@lru_cache()
+def get_email_preprocessor() -> EmailPreprocessor:
+    return EmailPreprocessor()
+
+@lru_cache()
+def get_message_coalescer() -> MessageCoalescer:
+    return MessageCoalescer()
+
+@lru_cache()
+def get_openai_usage_tracker() -> OpenAIUsageTracker:
+    return OpenAIUsageTracker()
+
+@lru_cache()
+def get_loop_watchdog() -> LoopLagWatchdog:
+    return LoopLagWatchdog(
+        interval=settings.LOOP_WATCHDOG_INTERVAL_SECONDS,
+        threshold=settings.LOOP_WATCHDOG_THRESHOLD_SECONDS
+    )
+
+@lru_cache()
+def get_slow_request_profiler() -> SlowRequestProfiler:
+    return SlowRequestProfiler(
+        enabled=settings.SLOW_WEBHOOK_PROFILING_ENABLED,
+        threshold=settings.SLOW_WEBHOOK_PROFILE_THRESHOLD_SECONDS
+    )
+
+@lru_cache()
+def get_traffic_recorder() -> TrafficRecorder:
+    return TrafficRecorder(
+        enabled=settings.TRAFFIC_CAPTURE_ENABLED,
+        path=settings.TRAFFIC_CAPTURE_PATH,
+        sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+        salt=settings.TRAFFIC_CAPTURE_SALT
+    )
+
+@lru_cache()
+def get_readiness_monitor() -> ReadinessMonitor:
+    return ReadinessMonitor(
+        interval=settings.READINESS_INTERVAL_SECONDS,
+        stale_after=settings.READINESS_STALE_AFTER_SECONDS
+    )
+
+@lru_cache()
+def get_checkpoint_recovery() -> CheckpointRecovery:
+    return CheckpointRecovery(
+        interval=settings.CHECKPOINT_RECOVERY_INTERVAL_SECONDS,
+        max_attempts=settings.CHECKPOINT_MAX_ATTEMPTS
+    )
+
+SERVICE_FACTORIES = (
+    get_openai_service, get_message_formatter, get_dixa_service, get_mongodb_service, get_validation_service,
+    get_dashboard_service, get_slack_service, get_email_preprocessor, get_message_coalescer,
+    get_openai_usage_tracker, get_loop_watchdog, get_slow_request_profiler, get_traffic_recorder,
+    get_readiness_monitor, get_checkpoint_recovery,
+)
+
+def verify_admin_token(authorization: Optional[str] = Header(None), x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Guard for admin endpoints: requires ADMIN_API_TOKEN as a Bearer token or X-Admin-Token header
+    Admin endpoints are disabled (404) while no token is configured.
+    """
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = x_admin_token or ""
+    if authorization and authorization.lower().startswith("bearer "):
+        supplied = authorization[7:]
+    if not hmac.compare_digest(supplied.encode(), settings.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 # Service container for easy access
 class ServiceContainer:
     def __init__(self):
@@ -46,6 +131,15 @@ class ServiceContainer:
         self._validation_service = None
         self._dashboard_service = None
         self._slack_service = None
+        self._email_preprocessor = None
+        self._message_coalescer = None
+        self._openai_usage_tracker = None
+        self._loop_watchdog = None
+        self._slow_request_profiler = None
+        self._traffic_recorder = None
+        self._readiness = None
+        self._checkpoint_recovery = None
+        self.warmup = Warmup()
     
     @property
     def openai_service(self) -> OpenAIService:
@@ -89,5 +183,117 @@ class ServiceContainer:
             self._slack_service = get_slack_service()
         return self._slack_service
 
+    @property
+    def email_preprocessor(self) -> EmailPreprocessor:
+        if self._email_preprocessor is None:
+            self._email_preprocessor = get_email_preprocessor()
+        return self._email_preprocessor
+
+    @property
+    def message_coalescer(self) -> MessageCoalescer:
+        if self._message_coalescer is None:
+            self._message_coalescer = get_message_coalescer()
+        return self._message_coalescer
+
+    @property
+    def openai_usage_tracker(self) -> OpenAIUsageTracker:
+        if self._openai_usage_tracker is None:
+            self._openai_usage_tracker = get_openai_usage_tracker()
+        return self._openai_usage_tracker
+
+    @property
+    def loop_watchdog(self) -> LoopLagWatchdog:
+        if self._loop_watchdog is None:
+            self._loop_watchdog = get_loop_watchdog()
+        return self._loop_watchdog
+
+    @property
+    def slow_request_profiler(self) -> SlowRequestProfiler:
+        if self._slow_request_profiler is None:
+            self._slow_request_profiler = get_slow_request_profiler()
+        return self._slow_request_profiler
+
+    @property
+    def traffic_recorder(self) -> TrafficRecorder:
+        if self._traffic_recorder is None:
+            self._traffic_recorder = get_traffic_recorder()
+        return self._traffic_recorder
+
+    @property
+    def readiness(self) -> ReadinessMonitor:
+        if self._readiness is None:
+            self._readiness = get_readiness_monitor()
+        return self._readiness
+
+    @property
+    def checkpoint_recovery(self) -> CheckpointRecovery:
+        if self._checkpoint_recovery is None:
+            self._checkpoint_recovery = get_checkpoint_recovery()
+        return self._checkpoint_recovery
+
+    def start_warm_up(self) -> None:
+        """
+        Build every service and open upstream connections in the background
+        Blocking work (Mongo ping and index creation, the OpenAI SDK import) runs
+        in worker threads so the loop keeps answering health checks meanwhile.
+        """
+        for name in ("message_formatter", "validation_service", "email_preprocessor", "message_coalescer",
+                     "openai_usage_tracker", "traffic_recorder"):
+            getattr(self, name)
+
+        async def mongodb():
+            service = await asyncio.to_thread(lambda: self.mongodb_service)
+            return {"success": service.client is not None, "error": "MongoDB not connected"}
+
+        async def openai():
+            service = await asyncio.to_thread(lambda: self.openai_service)
+            await asyncio.to_thread(service.load_resources)
+            return await service.warm_up()
+
+        async def slack():
+            await asyncio.to_thread(lambda: self.slack_service)
+
+        self.warmup.start({
+            "mongodb": mongodb,
+            "openai": openai,
+            "dixa": lambda: self.dixa_service.warm_up(),
+            "dashboard": lambda: self.dashboard_service.warm_up(),
+            "slack": slack,
+        }, timeout=settings.WARMUP_TIMEOUT_SECONDS)
+
+    def http_pool_stats(self) -> Dict[str, Any]:
+        """Usage of the pooled HTTP clients of the services built so far; no I/O"""
+        built = (("dixa", self._dixa_service), ("dashboard", self._dashboard_service), ("openai", self._openai_service))
+        return {name: pool_stats(service.http_client) for name, service in built if service is not None}
+
+    async def close(self) -> None:
+        """Stop warm-up, the readiness refresh and checkpoint recovery, and close the pooled HTTP clients"""
+        await self.warmup.stop()
+        if self._readiness is not None:
+            await self._readiness.stop()
+        if self._checkpoint_recovery is not None:
+            await self._checkpoint_recovery.stop()
+        for service in (self._dixa_service, self._dashboard_service, self._openai_service):
+            if service is not None:
+                await service.close()
+
+    def _reset_after_fork(self) -> None:
+        """
+        Forget every service inherited from the parent process (gunicorn --preload)
+        Their HTTP and MongoDB connections belong to the parent, so the worker
+        rebuilds each service on first use. The parent's clients are dropped, not
+        closed: closing them would shut sockets the parent still owns.
+        """
+        for factory in SERVICE_FACTORIES:
+            factory.cache_clear()
+        for name in list(vars(self)):
+            if name.startswith("_"):
+                setattr(self, name, None)
+        imports = self.warmup.phases.get("imports")
+        self.warmup = Warmup()
+        if imports:
+            self.warmup.phases["imports"] = imports
+
 # Global service container instance
-services = ServiceContainer()
\ No newline at end of file
+services = ServiceContainer()
+os.register_at_fork(after_in_child=services._reset_after_fork)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from api.dependencies import services, verify_admin_token
+from core.services.export_service import DEFAULT_FIELDS, ExportError, build_query
+from utils.profiling import MemoryProfiler, ProfilerBusy, SamplingProfiler, render_collapsed, top_frames
+from utils.streaming import iterate_in_thread
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(verify_admin_token)])
+
+cpu_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
+
+
+@router.get("/profile/cpu")
+async def profile_cpu(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    all_threads: bool = False
+):
+    """
+    Sample the live process for N seconds
+    Returns collapsed stacks (feed to flamegraph.pl or speedscope) or a JSON
+    summary of the hottest frames. By default only the event loop thread is sampled.
+    """
+    logger.info("🔬 CPU profile requested: %ss at %sms intervals", seconds, interval_ms)
+    # Async handlers run on the event loop thread, so that is the thread to sample
+    thread_id = None if all_threads else threading.get_ident()
+    try:
+        result = await asyncio.to_thread(cpu_profiler.profile, seconds, interval_ms / 1000, thread_id)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "collapsed":
+        return PlainTextResponse(render_collapsed(result["stacks"]))
+    return {
+        "seconds": result["seconds"],
+        "interval_ms": result["interval_ms"],
+        "samples": result["samples"],
+        "top_frames": top_frames(result["stacks"], limit=30),
+    }
+
+
+@router.post("/profile/memory/start")
+async def memory_start(frames: int = Query(10, ge=1, le=50)):
+    """Start tracemalloc (if needed) and take the baseline snapshot"""
+    return memory_profiler.start(frames)
+
+
+@router.get("/profile/memory/diff")
+async def memory_diff(limit: int = Query(25, ge=1, le=200), reset: bool = False):
+    """Top allocation growth since the baseline; reset=true makes this snapshot the new baseline"""
+    return await asyncio.to_thread(memory_profiler.diff, limit, reset)
+
+
+@router.post("/profile/memory/stop")
+async def memory_stop():
+    """Stop tracemalloc and drop the baseline (tracing adds noticeable overhead)"""
+    return memory_profiler.stop()
+
+
+@router.get("/profile/slow-webhooks")
+async def slow_webhook_profiles():
+    """Profiles kept for webhooks slower than SLOW_WEBHOOK_PROFILE_THRESHOLD_SECONDS"""
+    profiler = services.slow_request_profiler
+    return {
+        "enabled": profiler.enabled,
+        "threshold_s": profiler.threshold,
+        "profiles": list(profiler.profiles)
+    }
+
+
+@router.get("/openai/usage")
+async def openai_usage():
+    """Rolling OpenAI latency, token and cost aggregates per prompt version, plus daily totals"""
+    return services.openai_usage_tracker.summary()
+
+
+@router.get("/archive/conversations/{conversation_id}")
+async def archived_conversation(conversation_id: int):
+    """Archived (compressed) conversation logs of one conversation, decompressed"""
+    archive = services.mongodb_service.archive
+    if archive is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    documents = await asyncio.to_thread(archive.fetch, conversation_id)
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    return {"conversation_id": conversation_id, "count": len(documents), "documents": documents}
+
+
+@router.get("/export/conversations")
+async def export_conversations(
+    format: str = Query("jsonl", pattern="^(jsonl|csv|parquet)$"),
+    compression: str = Query("gzip", pattern="^(none|gzip|zstd)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    conversation_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+    handoff: Optional[bool] = None,
+    sent: Optional[bool] = None,
+    skipped: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: the prompt review set)"),
+    batch_size: int = Query(1000, ge=10, le=10000)
+):
+    """
+    Stream conversation logs as a file download
+    Batches are read from a secondary when available and only fetched as the
+    client consumes the response, so memory stays flat for any export size.
+    """
+    exporter = services.mongodb_service.export
+    if exporter is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    query = build_query(start, end, conversation_id, user_id, handoff, sent, skipped)
+    try:
+        chunks = exporter.export(format, query, fields.split(",") if fields else DEFAULT_FIELDS, compression, batch_size)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("📤 Conversation export started: %s/%s %s", format, compression, query)
+    filename = exporter.filename(format, compression)
+    return StreamingResponse(iterate_in_thread(chunks, "export"), media_type="application/octet-stream",
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
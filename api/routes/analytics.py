@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from api.dependencies import services, verify_admin_token
+from core.services.rollup_service import GRANULARITIES
+
+router = APIRouter(prefix="/analytics", dependencies=[Depends(verify_admin_token)])
+
+# Range returned when the caller gives no start: the last N buckets
+DEFAULT_BUCKETS = {"minute": 60, "hour": 24, "day": 30}
+
+
+@router.get("/rollups")
+async def conversation_rollups(
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """
+    Conversation counters per minute, hour or day between start and end (UTC)
+    Each bucket has counts by status, handoffs, skipped reasons, failures,
+    a latency histogram and OpenAI usage, plus derived rates; `totals` sums
+    the range. Served from the rollup collection, never from `conversations`.
+    """
+    rollups = services.mongodb_service.rollups
+    if rollups is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    end = end or datetime.utcnow() + GRANULARITIES[granularity]
+    start = start or end - GRANULARITIES[granularity] * DEFAULT_BUCKETS[granularity]
+    result = await asyncio.to_thread(rollups.query, granularity, start, end)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
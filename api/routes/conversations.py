@@ -0,0 +1,117 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pymongo.errors import ExecutionTimeout
+from api.dependencies import services, verify_admin_token
+from core.services.conversation_history import MAX_PAGE_SIZE, InvalidCursor
+from core.services.export_service import InvalidFilter, build_query
+from core.services.rollup_service import SKIP_CATEGORIES
+from core.services.search_service import LANGUAGES, MAX_PAGE_SIZE as MAX_SEARCH_PAGE_SIZE, SEARCH_FIELDS
+from utils.streaming import iterate_in_thread
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/conversations", dependencies=[Depends(verify_admin_token)])
+
+SKIP_REASON_PARAM = f"^({'|'.join(SKIP_CATEGORIES)})$"
+SEARCH_FIELD_PARAM = f"^({'|'.join(SEARCH_FIELDS)})$"
+LANGUAGE_PARAM = f"^({'|'.join(LANGUAGES)})$"
+
+
+def _history():
+    history = services.mongodb_service.history
+    if history is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    return history
+
+
+def _query(**filters):
+    try:
+        return build_query(**filters)
+    except InvalidFilter as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _page(history, query, fields: Optional[str], limit: int, after: Optional[str]) -> StreamingResponse:
+    try:
+        chunks = history.page(query, fields.split(",") if fields else None, limit, after)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(iterate_in_thread(chunks, "conversations"), media_type="application/json")
+
+
+@router.get("")
+async def list_conversations(
+    handoff: Optional[bool] = None,
+    sent: Optional[bool] = None,
+    skipped: Optional[bool] = None,
+    skipped_reason: Optional[str] = Query(None, pattern=SKIP_REASON_PARAM),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_id: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: a summary without message bodies)"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """
+    Logged conversations, newest first, one page at a time
+    Follow `next_cursor` for older entries; every page is an index seek, so
+    paging deep into the history is as fast as reading the first page.
+    """
+    history = _history()
+    query = _query(start=start, end=end, user_id=user_id, handoff=handoff, sent=sent,
+                   skipped=skipped, skipped_reason=skipped_reason)
+    return _page(history, query, fields, limit, after)
+
+
+@router.get("/search")
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=500, description='Words, "exact phrases" and -excluded words'),
+    field: str = Query("all", pattern=SEARCH_FIELD_PARAM, description="all, customer (original_text) or ai (ai_response)"),
+    language: Optional[str] = Query(None, pattern=LANGUAGE_PARAM, description="Stemming language of the query"),
+    handoff: Optional[bool] = None,
+    sent: Optional[bool] = None,
+    skipped: Optional[bool] = None,
+    skipped_reason: Optional[str] = Query(None, pattern=SKIP_REASON_PARAM),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    conversation_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0)
+):
+    """
+    Full-text search over customer messages and AI responses, best match first
+    Served by the conversation text index with per-language stemming; each
+    result carries its text score and snippets around the matched words.
+    Page with `offset` (next_offset); archived conversations are not searched.
+    """
+    search = services.mongodb_service.search
+    if search is None:
+        raise HTTPException(status_code=503, detail="MongoDB not connected")
+    filters = _query(start=start, end=end, conversation_id=conversation_id, user_id=user_id, handoff=handoff,
+                     sent=sent, skipped=skipped, skipped_reason=skipped_reason)
+    try:
+        result = await asyncio.to_thread(search.search, q, filters, field, language, limit, offset)
+    except ExecutionTimeout:
+        raise HTTPException(status_code=504, detail="Search took too long; add filters or more specific words")
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@router.get("/{conversation_id}")
+async def conversation_history(
+    conversation_id: int,
+    fields: Optional[str] = Query(None, description="Comma-separated fields (default: a summary without message bodies)"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
+    """Log entries of one Dixa conversation, newest first, paged like GET /conversations"""
+    history = _history()
+    if not after and not await asyncio.to_thread(history.exists, conversation_id):
+        raise HTTPException(status_code=404, detail=f"No logs for conversation {conversation_id}")
+    return _page(history, _query(conversation_id=conversation_id), fields, limit, after)
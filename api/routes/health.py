@@ -1,12 +1,85 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Any, Dict
+from fastapi import APIRouter, Response
+from api.dependencies import services
+from api.routes.webhook import admission
+from core.services.job_queue import publish_queue_metrics
+from utils.readiness import UpstreamOutcomes
+from config import settings
 
 router = APIRouter()
 
+upstream_outcomes = UpstreamOutcomes()
+
 @router.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "dixa-webhook"}
+async def health_check(response: Response):
+    """
+    Health check endpoint
+    Reports 503 "starting" until startup warm-up has finished, so the platform
+    only routes traffic to an instance whose connections are already open.
+    """
+    startup = services.warmup.report()
+    if not startup["ready"]:
+        response.status_code = 503
+        return {"status": "starting", "service": "dixa-webhook", "startup": startup}
+    return {"status": "healthy", "service": "dixa-webhook", "startup": startup}
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe served from the background snapshot (no I/O per request)
+    503 while starting, when MongoDB is unreachable, the admission queue is
+    full, the event loop is lagging, or the snapshot has gone stale.
+    """
+    ready, body = services.readiness.current()
+    return Response(content=body, status_code=200 if ready else 503, media_type="application/json")
+
+async def collect_readiness() -> Dict[str, Any]:
+    """
+    Build one readiness snapshot; run by the readiness monitor every few seconds
+    The MongoDB ping is the only request made. Dixa, the Dashboard API and
+    OpenAI are judged from the outcomes of real calls since the last snapshot.
+    """
+    if not services.warmup.ready:
+        return {"ready": False, "reasons": ["starting"]}
+
+    reasons = []
+    mongodb = services.mongodb_service
+    ping = await asyncio.to_thread(mongodb.ping, settings.READINESS_MONGO_TIMEOUT_SECONDS)
+    if not ping["success"]:
+        reasons.append("mongodb_unreachable")
+
+    queue = {
+        "in_flight": admission.in_flight,
+        "queued": admission.queued,
+        "max_in_flight": admission.max_in_flight,
+        "max_queue": admission.max_queue,
+    }
+    if admission.max_in_flight > 0 and admission.queued >= admission.max_queue:
+        reasons.append("admission_queue_full")
+
+    loop_lag = services.loop_watchdog.lag_summary() if settings.LOOP_WATCHDOG_ENABLED else None
+    if loop_lag and loop_lag["p99_ms"] > settings.READINESS_MAX_LOOP_LAG_SECONDS * 1000:
+        reasons.append("event_loop_lagging")
+
+    # Queue lag is reported and exported, not a readiness failure: intake can keep queueing while workers catch up
+    jobs = None
+    if settings.PROCESSING_MODE == "queue" and ping["success"]:
+        jobs = await asyncio.to_thread(mongodb.job_stats)
+        if jobs is not None:
+            publish_queue_metrics(jobs)
+
+    return {
+        "ready": not reasons,
+        "reasons": reasons,
+        "mongodb": {**ping, "pool": mongodb.pool_stats() if mongodb.client is not None else None},
+        "http_pools": services.http_pool_stats(),
+        "upstreams": upstream_outcomes.window(),
+        "admission": queue,
+        "event_loop": loop_lag,
+        "jobs": jobs,
+    }
 
 @router.get("/")
 async def root():
-    return {"message": "Dixa Workflow API is running"}
\ No newline at end of file
+    return {"message": "Dixa Workflow API is running"}
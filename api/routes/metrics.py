@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from utils.metrics import render_prometheus
+from api.dependencies import services, verify_admin_token
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/metrics/event-loop", dependencies=[Depends(verify_admin_token)])
+async def event_loop_report():
+    """
+    Event loop lag percentiles and the blocking calls caught by the watchdog
+    Admin only: the reports carry source paths, code lines and stack traces.
+    """
+    return services.loop_watchdog.report()
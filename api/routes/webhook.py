@@ -1,50 +1,291 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
 from datetime import datetime
+from typing import Dict, Optional
+import asyncio
+import dataclasses
 import logging
-import json
+import time
+import orjson
 
 from models.webhook import WebhookPayload
+from models.event import WebhookEvent, parse_webhook_event
 from api.dependencies import services
+from core.services.checkpoint_service import EventCheckpoints, LeaseLost, OPENAI_CALLS_SAVED_TOTAL, RESUMED_TOTAL
+from core.services.job_queue import PRIORITY_AI, PRIORITY_LOG_ONLY
+from utils.keyed_lock import KeyedLock
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.deadline import Deadline
+from utils.metrics import registry, stage_timer
+from utils.logging import bind_log_context
+from utils.tracing import current_span, current_traceparent, start_trace
 from config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.post("/dixa_conversation_started")
-async def dixa_webhook(payload: WebhookPayload):
+# Serializes webhook and transfer handling per conversation (csid)
+conversation_locks = KeyedLock()
+
+# A message this soon after the conversation started is its opening message, the one the AI answers
+INITIAL_MESSAGE_MAX_DELAY_MS = 5000
+
+WEBHOOKS_TOTAL = registry.counter(
+    "dirq_webhooks_total",
+    "Webhooks handled, by final status (processed_and_sent, duplicate_ignored, shed, ...)",
+    labelnames=("status",)
+)
+WEBHOOK_DURATION_SECONDS = registry.histogram(
+    "dirq_webhook_duration_seconds",
+    "End-to-end webhook latency including admission queueing",
+    labelnames=("status",)
+)
+PROMPT_TOKENS_SAVED = registry.counter(
+    "dirq_prompt_tokens_saved_total",
+    "Estimated prompt tokens removed by email preprocessing"
+)
+
+# The endpoint reads the raw body itself, so document the payload schema explicitly
+WEBHOOK_REQUEST_BODY_SCHEMA = {
+    "requestBody": {
+        "content": {"application/json": {"schema": WebhookPayload.model_json_schema()}},
+        "required": True
+    }
+}
+
+admission = AdmissionController(
+    max_in_flight=settings.WEBHOOK_MAX_IN_FLIGHT,
+    max_queue=settings.WEBHOOK_MAX_QUEUED,
+    max_queue_wait=settings.WEBHOOK_MAX_QUEUE_WAIT_SECONDS,
+    retry_after=settings.WEBHOOK_RETRY_AFTER_SECONDS
+)
+
+@router.post("/dixa_conversation_started", openapi_extra=WEBHOOK_REQUEST_BODY_SCHEMA)
+async def dixa_webhook(request: Request):
     """
     Main webhook endpoint that receives Dixa conversation messages
     Replicates the exact functionality from n8n workflow
     """
+    # The end-to-end budget starts on arrival, so admission queueing counts against it
+    deadline = Deadline(settings.WEBHOOK_DEADLINE_SECONDS)
+
+    # Shed load before the body is read or any reservation is taken so Dixa retries later
+    status = "error"
+    http_status = 500
     try:
-        # Log incoming webhook details
-        logger.info("=" * 80)
-        logger.info("🔔 WEBHOOK RECEIVED - Dixa Conversation Started")
-        logger.info(f"📞 Conversation ID: {payload.data.conversation.csid}")
-        logger.info(f"📧 Author Email: {payload.data.author.email}")
-        logger.info(f"👤 Author ID: {payload.data.author.id}")
-        logger.info(f"💬 Message ID: {payload.data.message_id}")
-        logger.info(f"🆔 Event ID: {payload.event_id}")
-        logger.info(f"📝 Message Text: {payload.data.text[:100]}{'...' if len(payload.data.text) > 100 else ''}")
-        logger.info("=" * 80)
+        async with admission.admit():
+            result = await _handle_raw_webhook(request, deadline)
+        status = result.get("status", "unknown")
+        http_status = 200
+        return result
+    except AdmissionRejected as rejected:
+        status = "shed"
+        http_status = 503
+        logger.warning("🚦 WEBHOOK SHED (%s) - %s in flight, %s queued", rejected.reason, admission.in_flight, admission.queued)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service overloaded ({rejected.reason}), retry later",
+            headers={"Retry-After": str(rejected.retry_after)}
+        )
+    except RequestValidationError:
+        status = "invalid"
+        http_status = 422
+        raise
+    except HTTPException as http_error:
+        status = "unavailable" if http_error.status_code == 503 else "error"
+        http_status = http_error.status_code
+        raise
+    finally:
+        root = current_span()
+        if root is not None:
+            root.set_attribute("webhook.status", status)
+        WEBHOOKS_TOTAL.labels(status).inc()
+        WEBHOOK_DURATION_SECONDS.labels(status).observe(deadline.elapsed())
+        if services.traffic_recorder.enabled:
+            await _capture_traffic(request, status, http_status, deadline)
+
+async def _capture_traffic(request: Request, status: str, http_status: int, deadline: Deadline) -> None:
+    """Journal the delivery for replay; shed requests are read here since their body was never consumed"""
+    elapsed = deadline.elapsed()
+    try:
+        body = await request.body()
+    except ClientDisconnect:
+        return
+    services.traffic_recorder.capture(body, time.time() - elapsed, status, elapsed, http_status)
+
+async def recover_stalled_events(max_attempts: int) -> Dict[str, int]:
+    """
+    One recovery sweep: resume the events whose worker died mid-pipeline
+    Each goes through admission and the normal reservation, so recovery
+    yields to live traffic and cannot race a Dixa retry of the same event.
+    """
+    stalled = await asyncio.to_thread(services.mongodb_service.stalled_events, max_attempts)
+    outcomes: Dict[str, int] = {}
+    for record in stalled:
+        event = WebhookEvent(**record["event"])
+        bind_log_context(event_id=event.event_id, conversation_id=event.conversation_id)
+        logger.info("♻️  RECOVERING event %s (attempt %s)", event.event_id, record.get("attempt", 0) + 1)
+        try:
+            async with admission.admit():
+                await _handle_webhook(event, Deadline(settings.WEBHOOK_DEADLINE_SECONDS))
+            outcome = "resumed"
+        except AdmissionRejected:
+            # Busy with live webhooks; the rest waits for the next sweep
+            outcomes["shed"] = outcomes.get("shed", 0) + 1
+            break
+        except Exception as e:
+            logger.warning("⚠️  Recovery of event %s failed: %s", event.event_id, e)
+            outcome = "failed"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return outcomes
+
+async def process_queued_event(event: WebhookEvent, deadline: Deadline, traceparent: Optional[str] = None) -> dict:
+    """
+    Worker tier: run an event taken from the job queue through the pipeline
+    The trace continues the one the intake replica opened when it queued
+    the event. Raises like _handle_webhook, so the job can be retried.
+    """
+    status = "error"
+    with start_trace("job dixa_conversation_started", traceparent, **{"event.id": event.event_id}) as root:
+        if root is not None:
+            bind_log_context(trace_id=root.trace_id)
+        try:
+            async with services.slow_request_profiler.track(event.event_id):
+                result = await _handle_webhook(event, deadline)
+            status = result.get("status", "unknown")
+            return result
+        finally:
+            if root is not None:
+                root.set_attribute("webhook.status", status)
+            WEBHOOKS_TOTAL.labels(status).inc()
 
-        # Step 1: Check if we already processed this event (fastest check)
-        already_processed = await services.mongodb_service.has_event_been_processed(payload.event_id)
+def _current_trace_id():
+    """Trace ID of the request being handled, stored with the conversation log for lookup"""
+    active = current_span()
+    return active.trace_id if active is not None else None
+
+
+def _message_delay_ms(conversation_created: str, message_created: str) -> float:
+    """Milliseconds between conversation creation and the message (exact n8n logic)"""
+    conv_time = datetime.fromisoformat(conversation_created.replace('Z', '+00:00'))
+    msg_time = datetime.fromisoformat(message_created.replace('Z', '+00:00'))
+    return (msg_time - conv_time).total_seconds() * 1000
+
+
+def _raw_field(raw, *path):
+    """Read a nested field from an unvalidated webhook body, None if absent"""
+    value = raw
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+async def _handle_raw_webhook(request: Request, deadline: Deadline) -> dict:
+    """
+    Fast path for duplicates: check the raw event_id before validating the payload
+    Dixa delivers most events 2-3 times, so full validation only runs for new events
+    """
+    try:
+        raw = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body", 0),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": str(e)}
+        }])
+
+    # Step 1: Check if we already processed this event (fastest check)
+    event_id = _raw_field(raw, "event_id")
+    if isinstance(event_id, str):
+        bind_log_context(event_id=event_id)
+        with stage_timer("dedup") as stage:
+            already_processed = await services.mongodb_service.has_event_been_processed(event_id, deadline=deadline)
+            stage.outcome = "duplicate" if already_processed else "new"
         if already_processed:
-            logger.info("🛑 DUPLICATE WEBHOOK - Event already processed (found in conversations), skipping")
+            logger.info("🛑 DUPLICATE WEBHOOK - Event %s already processed (found in conversations), skipping", event_id)
             return {
                 "status": "duplicate_ignored",
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
-                "event_id": payload.event_id,
+                "conversation_id": _raw_field(raw, "data", "conversation", "csid"),
+                "message_id": _raw_field(raw, "data", "message_id"),
+                "event_id": event_id,
                 "reason": "Event already processed (logged in database)"
             }
 
+    try:
+        event = parse_webhook_event(raw)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    bind_log_context(conversation_id=event.conversation_id)
+
+    if settings.PROCESSING_MODE == "queue":
+        return await _enqueue_event(event, deadline)
+
+    async with services.slow_request_profiler.track(event.event_id):
+        return await _handle_webhook(event, deadline)
+
+async def _enqueue_event(event: WebhookEvent, deadline: Deadline) -> dict:
+    """
+    Queue mode: hand the validated event to the worker tier and answer Dixa right away
+    Messages the AI will answer are queued ahead of the ones that are only logged.
+    """
+    is_initial_message = _message_delay_ms(event.conversation_created_at, event.message_created_at) <= INITIAL_MESSAGE_MAX_DELAY_MS
+    should_process, _ = services.validation_service.should_process_message(event.author_email, is_initial_message)
+    priority = PRIORITY_AI if should_process else PRIORITY_LOG_ONLY
+
+    with stage_timer("enqueue") as stage:
+        result = await services.mongodb_service.enqueue_job(
+            event.event_id, dataclasses.asdict(event), priority, traceparent=current_traceparent(), deadline=deadline
+        )
+        stage.succeeded(result["success"])
+    if not result["success"]:
+        logger.error("❌ Could not queue event %s: %s", event.event_id, result.get("error"))
+        raise HTTPException(
+            status_code=503,
+            detail="Service temporarily unavailable: could not queue the event"
+        )
+
+    if not result["queued"]:
+        logger.info("🛑 DUPLICATE WEBHOOK - Event %s is already queued, skipping", event.event_id)
+    else:
+        logger.info("📥 Queued event %s (priority %s)", event.event_id, priority)
+    return {
+        "status": "queued" if result["queued"] else "duplicate_ignored",
+        "conversation_id": event.conversation_id,
+        "message_id": event.message_id,
+        "event_id": event.event_id,
+    }
+
+async def _handle_webhook(event: WebhookEvent, deadline: Deadline) -> dict:
+    """
+    Reserve and process a validated, admitted webhook
+    """
+    checkpoints = None
+    try:
+        # Log incoming webhook details
+        logger.info("=" * 80)
+        logger.info("🔔 WEBHOOK RECEIVED - Dixa Conversation Started")
+        logger.info("📞 Conversation ID: %s", event.conversation_id)
+        logger.info("📧 Author Email: %s", event.author_email)
+        logger.info("👤 Author ID: %s", event.author_id)
+        logger.info("💬 Message ID: %s", event.message_id)
+        logger.info("🆔 Event ID: %s", event.event_id)
+        logger.debug("📝 Message Text: %.100s%s", event.text, '...' if len(event.text) > 100 else '')
+        logger.info("=" * 80)
+
         # Step 2: Try to acquire reservation for this event (prevents concurrent processing)
-        logger.info(f"🔐 Attempting to acquire reservation for event: {payload.event_id}")
-        reservation_acquired = await services.mongodb_service.try_reserve_message(payload.event_id)
+        logger.info("🔐 Attempting to acquire reservation for event: %s", event.event_id)
+        with stage_timer("reserve") as stage:
+            checkpoints = await services.mongodb_service.try_reserve_message(
+                event.event_id, deadline=deadline, event=dataclasses.asdict(event)
+            )
+            stage.outcome = "rejected" if checkpoints is None else "resumed" if checkpoints.stages else "acquired"
 
-        if not reservation_acquired:
+        if checkpoints is None:
             logger.info("🛑 DUPLICATE WEBHOOK - Reservation not acquired (concurrent request), skipping")
 
             # Check if MongoDB is connected
@@ -57,295 +298,560 @@ async def dixa_webhook(payload: WebhookPayload):
 
             return {
                 "status": "duplicate_ignored",
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
-                "event_id": payload.event_id,
+                "conversation_id": event.conversation_id,
+                "message_id": event.message_id,
+                "event_id": event.event_id,
                 "reason": "Another worker is already processing this event"
             }
 
-        logger.info(f"✅ Reservation acquired successfully for event: {payload.event_id}")
-        logger.info("📋 Starting webhook processing...")
+        logger.info("✅ Reservation acquired successfully for event: %s", event.event_id)
+        if checkpoints.stages:
+            # An earlier attempt died mid-pipeline; pick up after its last saved stage
+            RESUMED_TOTAL.labels(checkpoints.last_stage).inc()
+            logger.info("♻️  RESUMING event %s after stage '%s' (attempt %s)",
+                        event.event_id, checkpoints.last_stage, checkpoints.attempt)
 
-        # Extract timestamps exactly as in n8n Python code
-        conversation_created = payload.data.conversation.created_at
-        message_created = payload.data.created_at
-        
-        logger.info("⏰ TIMESTAMP PROCESSING:")
-        logger.info(f"   Conversation Created: {conversation_created}")
-        logger.info(f"   Message Created: {message_created}")
-        
-        # Convert to datetime objects (matching n8n logic)
-        conv_time = datetime.fromisoformat(conversation_created.replace('Z', '+00:00'))
-        msg_time = datetime.fromisoformat(message_created.replace('Z', '+00:00'))
-        
-        # Calculate time difference in milliseconds (exact n8n logic)
-        time_diff = (msg_time - conv_time).total_seconds() * 1000
-        is_initial_message = time_diff <= 5000
-        
-        logger.info(f"   Time Difference: {time_diff}ms")
-        logger.info(f"   Is Initial Message: {is_initial_message} (threshold: ≤5000ms)")
+        # Step 3: Merge into an open burst window of this conversation, if any
+        if services.message_coalescer.enabled and not checkpoints.stages:
+            leader_event_id = services.message_coalescer.try_join(
+                event.conversation_id,
+                event.event_id,
+                event.message_id,
+                event.author_email,
+                event.text
+            )
+            # The leader holds the follower's text only in memory until it saves its burst;
+            # until then this event stays leased, so a crashed leader leaves it to recovery
+            if leader_event_id and not await services.message_coalescer.wait_until_saved(leader_event_id):
+                logger.warning("🧲 Leader %s failed before saving the burst, processing message %s on its own",
+                               leader_event_id, event.message_id)
+                leader_event_id = None
+            if leader_event_id:
+                log_result = await services.mongodb_service.log_conversation({
+                    "conversation_id": event.conversation_id,
+                    "message_id": event.message_id,
+                    "event_id": event.event_id,
+                    "user_id": event.author_id,
+                    "ai_response": None,
+                    "dixa_message_sent": False,
+                    "original_text": event.text,
+                    "coalesced_into": leader_event_id,
+                    "skipped_reason": f"Coalesced into event {leader_event_id}"
+                }, deadline=deadline)
+                logger.info("🧲 MESSAGE COALESCED into event %s (logged: %s)", leader_event_id, log_result.get('success', False))
+                logger.info("=" * 80)
+                if log_result.get("success"):
+                    await services.mongodb_service.complete_reservation(checkpoints, deadline=deadline)
+                return {
+                    "status": "coalesced",
+                    "conversation_id": event.conversation_id,
+                    "message_id": event.message_id,
+                    "event_id": event.event_id,
+                    "coalesced_into": leader_event_id
+                }
+
+        # Step 4: Process in arrival order for this conversation (other conversations run in parallel)
+        async with conversation_locks.hold(event.conversation_id):
+            return await _process_reserved_event(event, deadline, checkpoints)
+
+    except HTTPException:
+        # Re-raise HTTP exceptions (like 503 from MongoDB down)
+        raise
+    except LeaseLost as lost:
+        # Our lease ran out and another worker resumed the event; it owns the remaining stages
+        logger.warning("🔁 LEASE LOST - %s, stopping this attempt", lost)
+        return {
+            "status": "duplicate_ignored",
+            "conversation_id": event.conversation_id,
+            "message_id": event.message_id,
+            "event_id": event.event_id,
+            "reason": "Another worker took over this event"
+        }
+    except Exception as e:
+        logger.error("💥 WEBHOOK ERROR - Unexpected exception occurred")
+        logger.error("   Exception Type: %s", type(e).__name__)
+        logger.error("   Exception Message: %s", e)
+        # Log full stack trace for debugging
+        logger.error("   Stack Trace:", exc_info=True)
+        logger.error("   Conversation ID: %s", event.conversation_id)
+        logger.error("   Event ID: %s", event.event_id)
+        logger.error("=" * 80)
+        # Best-effort release of reservation on unexpected exceptions; saved stages are kept for the retry
+        if checkpoints is not None:
+            try:
+                logger.info("   Releasing reservation for event: %s", event.event_id)
+                await services.mongodb_service.release_reservation(checkpoints, deadline=deadline)
+            except Exception as release_err:
+                logger.error("   Failed to release reservation: %s", release_err)
+        raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
+
+async def _log_conversation_once(event: WebhookEvent, log_data: dict, deadline: Deadline,
+                                 checkpoints: EventCheckpoints) -> dict:
+    """Log the conversation unless an earlier attempt of this event already did"""
+    saved = checkpoints.get("log")
+    if saved:
+        logger.info("   ♻️  Logged by an earlier attempt")
+        return saved
+    # An attempt can die between writing the log and saving the checkpoint
+    if checkpoints.attempt > 1 and await services.mongodb_service.has_event_been_processed(event.event_id, deadline=deadline):
+        logger.info("   ♻️  Logged by an earlier attempt")
+        return {"success": True}
+    with stage_timer("mongo_log") as stage:
+        log_result = await services.mongodb_service.log_conversation(log_data, deadline=deadline)
+        stage.succeeded(log_result.get("success", False))
+    return log_result
+
+async def _process_reserved_event(event: WebhookEvent, deadline: Deadline, checkpoints: EventCheckpoints) -> dict:
+    """
+    Run the claim/context/AI/send/log pipeline for an event we hold the reservation for
+    Called with the per-conversation lock held. Each stage saves its result
+    to `checkpoints` and is skipped when a previous attempt already saved it.
+    """
+    logger.info("📋 Starting webhook processing...")
+
+    # Extract timestamps exactly as in n8n Python code
+    conversation_created = event.conversation_created_at
+    message_created = event.message_created_at
+    
+    logger.info("⏰ TIMESTAMP PROCESSING:")
+    logger.info("   Conversation Created: %s", conversation_created)
+    logger.info("   Message Created: %s", message_created)
+    
+    time_diff = _message_delay_ms(conversation_created, message_created)
+    is_initial_message = time_diff <= INITIAL_MESSAGE_MAX_DELAY_MS
+    
+    logger.info("   Time Difference: %sms", time_diff)
+    logger.info("   Is Initial Message: %s (threshold: ≤5000ms)", is_initial_message)
+    
+    # Domain validation - only process messages from whoppah.com domain
+    author_email = event.author_email
+    logger.info("🔍 VALIDATION PROCESSING:")
+    logger.info("   Checking email domain: %s", author_email)
+    
+    should_process, validation_reason = services.validation_service.should_process_message(
+        author_email, is_initial_message
+    )
+    
+    logger.info("   Validation Result: %s", '✅ PASS' if should_process else '❌ FAIL')
+    logger.info("   Validation Reason: %s", validation_reason)
+    
+    # Conditional processing - only process if domain and initial message validation passes
+    if should_process:
+        logger.info("🤖 AI PROCESSING STARTED:")
+        logger.debug("   Processing message: '%s'", event.text)
+
+        # Buffer follow-up messages of the same burst so they share one AI call
+        message_texts = [event.text]
+        coalesced_event_ids = []
+        saved_burst = checkpoints.get("burst")
+        if saved_burst:
+            message_texts, coalesced_event_ids = saved_burst["texts"], saved_burst["event_ids"]
+            logger.info("🧲 COALESCING - Reusing the burst of an earlier attempt (%s message(s))", len(message_texts))
+        elif services.message_coalescer.enabled:
+            logger.info("🧲 COALESCING - Waiting up to %ss for follow-up messages", services.message_coalescer.max_wait_seconds)
+            burst = await services.message_coalescer.wait_for_burst(
+                event.conversation_id,
+                event.event_id,
+                event.message_id,
+                event.author_email,
+                event.text
+            )
+            message_texts = burst["texts"]
+            coalesced_event_ids = burst["event_ids"][1:]
+            logger.info("   ✅ Burst closed with %s message(s)", len(message_texts))
+            burst_saved = False
+            try:
+                burst_saved = await services.mongodb_service.save_checkpoint(
+                    checkpoints, {"burst": {"texts": message_texts, "event_ids": coalesced_event_ids}}, deadline=deadline
+                )
+            finally:
+                # Followers are completed only once their text is saved with the burst
+                services.message_coalescer.burst_saved(event.event_id, burst_saved)
+        user_text = services.message_coalescer.merge_texts(message_texts) if coalesced_event_ids else event.text
         
-        # Domain validation - only process messages from whoppah.com domain
-        author_email = payload.data.author.email
-        logger.info("🔍 VALIDATION PROCESSING:")
-        logger.info(f"   Checking email domain: {author_email}")
+        # First claim the conversation for the agent
+        logger.info("🔒 CLAIMING CONVERSATION:")
+        logger.info("   Claiming conversation %s for agent %s", event.conversation_id, settings.AGENT_ID)
         
-        should_process, validation_reason = services.validation_service.should_process_message(
-            author_email, is_initial_message
-        )
+        saved_claim = checkpoints.get("claim")
+        if saved_claim:
+            claim_result = saved_claim
+            logger.info("   ♻️  Claimed by an earlier attempt")
+        else:
+            with stage_timer("claim") as stage:
+                claim_result = await services.dixa_service.claim_conversation(
+                    event.conversation_id,
+                    settings.AGENT_ID,
+                    force=False,  # Don't force to avoid taking over assigned conversations
+                    deadline=deadline
+                )
+                stage.succeeded(claim_result["success"])
+            deadline.check("claim")
+            await services.mongodb_service.save_checkpoint(
+                checkpoints, {"claim": {"success": claim_result["success"]}}, deadline=deadline
+            )
         
-        logger.info(f"   Validation Result: {'✅ PASS' if should_process else '❌ FAIL'}")
-        logger.info(f"   Validation Reason: {validation_reason}")
+        if not claim_result["success"]:
+            logger.error("   ❌ Failed to claim conversation: %s", claim_result.get('error', 'Unknown error'))
+            # Continue anyway - conversation might already be claimed
+            logger.info("   Continuing with message processing despite claim failure...")
+        else:
+            logger.info("   ✅ Conversation claimed successfully")
         
-        # Conditional processing - only process if domain and initial message validation passes
-        if should_process:
-            logger.info("🤖 AI PROCESSING STARTED:")
-            logger.info(f"   Processing message: '{payload.data.text}'")
-            
-            # First claim the conversation for the agent
-            logger.info("🔒 CLAIMING CONVERSATION:")
-            logger.info(f"   Claiming conversation {payload.data.conversation.csid} for agent {settings.AGENT_ID}")
-            
-            claim_result = await services.dixa_service.claim_conversation(
-                payload.data.conversation.csid,
-                settings.AGENT_ID,
-                force=False  # Don't force to avoid taking over assigned conversations
-            )
-            
-            if not claim_result["success"]:
-                logger.error(f"   ❌ Failed to claim conversation: {claim_result.get('error', 'Unknown error')}")
-                # Continue anyway - conversation might already be claimed
-                logger.info("   Continuing with message processing despite claim failure...")
-            else:
-                logger.info("   ✅ Conversation claimed successfully")
-            
+        saved_context = checkpoints.get("context")
+        if saved_context:
+            user_context_formatted = saved_context["user_context"]
+            prompt_text = saved_context["prompt_text"]
+            preprocessing = saved_context["preprocessing"]
+            logger.info("📊 CONTEXT - Reusing user context and preprocessed text of an earlier attempt")
+        else:
             # Fetch user context from Dashboard API before OpenAI processing
             logger.info("📊 DASHBOARD API - Fetching user context")
             user_context_formatted = None
 
-            # Only fetch if Dashboard API token is configured
-            if settings.DASHBOARD_API_TOKEN:
-                user_context_data = await services.dashboard_service.get_user_context(
-                    email=payload.data.author.email,
-                    orders_limit=10,
-                    threads_limit=10
-                )
+            # Only fetch if Dashboard API token is configured and the budget leaves room for it
+            if not settings.DASHBOARD_API_TOKEN:
+                logger.info("   ⚠️  Dashboard API token not configured - skipping user context fetch")
+            elif not deadline.allows("dashboard", settings.DEADLINE_OPTIONAL_STAGE_MIN_SECONDS):
+                logger.warning("   ⏱️  Skipping user context fetch - only %.1fs of budget left", deadline.remaining())
+            else:
+                with stage_timer("dashboard") as stage:
+                    user_context_data = await services.dashboard_service.get_user_context(
+                        email=event.author_email,
+                        orders_limit=10,
+                        threads_limit=10,
+                        deadline=deadline
+                    )
+                    stage.outcome = "ok" if user_context_data else "empty"
+                deadline.check("dashboard")
 
                 # Format user context for OpenAI if available
                 if user_context_data:
                     user_context_formatted = services.dashboard_service.format_user_context(user_context_data)
-                    logger.info(f"   ✅ User context formatted ({len(user_context_formatted)} chars)")
+                    logger.info("   ✅ User context formatted (%s chars)", len(user_context_formatted))
                 else:
                     logger.info("   ⚠️  No user context available - proceeding without it")
-            else:
-                logger.info("   ⚠️  Dashboard API token not configured - skipping user context fetch")
 
-            # Process with OpenAI Prompts (using customer name and user context from payload)
-            logger.info("🤖 AI PROCESSING:")
+            # Extract the new content of the email (drop quoted replies, signatures, footers)
+            prompt_text = user_text
+            preprocessing = None
+            if settings.EMAIL_PREPROCESSING_ENABLED:
+                logger.info("✂️  EMAIL PREPROCESSING:")
+                html_content = None
+                if not event.text.strip() and event.processed_content_url \
+                        and deadline.allows("content_fetch", settings.DEADLINE_OPTIONAL_STAGE_MIN_SECONDS):
+                    html_content = await services.dixa_service.fetch_processed_content(
+                        event.processed_content_url,
+                        deadline=deadline
+                    )
+                # Preprocess each buffered message separately so a quoted reply in
+                # the first one does not cut off the follow-ups
+                preprocessing = services.email_preprocessor.merge_results([
+                    services.email_preprocessor.preprocess(
+                        event.text,
+                        html_content=html_content,
+                        content_type=event.content_type
+                    )
+                ] + [services.email_preprocessor.preprocess(text) for text in message_texts[1:]])
+                prompt_text = preprocessing["text"]
+                PROMPT_TOKENS_SAVED.inc(preprocessing["original_tokens_est"] - preprocessing["processed_tokens_est"])
+                logger.info(
+                    "   ✅ %s → %s chars, ~%s → %s tokens (%s%% reduction, removed: %s)",
+                    preprocessing["original_chars"], preprocessing["processed_chars"],
+                    preprocessing["original_tokens_est"], preprocessing["processed_tokens_est"],
+                    preprocessing["token_reduction_pct"], preprocessing["removed"] or "nothing"
+                )
+
+            await services.mongodb_service.save_checkpoint(checkpoints, {"context": {
+                "user_context": user_context_formatted, "prompt_text": prompt_text, "preprocessing": preprocessing
+            }}, deadline=deadline)
+
+        # Process with OpenAI Prompts (using customer name and user context from payload)
+        logger.info("🤖 AI PROCESSING:")
+        openai_usage = None
+        saved_ai = checkpoints.get("ai")
+        if saved_ai:
+            ai_response, handoff_required, openai_usage = saved_ai["email"], saved_ai["handoff"], saved_ai["usage"]
+            OPENAI_CALLS_SAVED_TOTAL.inc()
+            logger.info("   ♻️  Reusing the OpenAI response of an earlier attempt (%s chars)", len(ai_response))
+        else:
             logger.info("   Calling OpenAI service...")
+            ai_checkpoint = None
             try:
                 # Extract customer name from payload (fallback to "customer" if null)
-                customer_name = payload.data.author.name or "customer"
-                logger.info(f"   Customer name extracted: {customer_name}")
-
-                openai_result = await services.openai_service.process_message(
-                    payload.data.text,
-                    customer_name=customer_name,
-                    conversation_id=payload.data.conversation.csid,
-                    user_context=user_context_formatted
-                )
+                customer_name = event.author_name or "customer"
+                logger.info("   Customer name extracted: %s", customer_name)
+
+                with stage_timer("openai") as stage:
+                    openai_result = await services.openai_service.process_message(
+                        prompt_text,
+                        customer_name=customer_name,
+                        conversation_id=event.conversation_id,
+                        user_context=user_context_formatted,
+                        deadline=deadline
+                    )
+                    if openai_result.get("deadline_exceeded"):
+                        stage.outcome = "timeout"
+                    else:
+                        stage.succeeded(not openai_result.get("email", "").startswith("Error:"))
+                deadline.check("openai")
 
                 ai_response = openai_result.get("email", "")
                 handoff_required = openai_result.get("handoff", False)
+                openai_usage = openai_result.get("usage")
+                if openai_usage:
+                    services.openai_usage_tracker.record(openai_usage, error=ai_response.startswith("Error:"))
+                if openai_result.get("deadline_exceeded"):
+                    # Never send a timeout error to the customer; hand over to a human instead
+                    logger.warning("   ⏱️  OpenAI call ran out of budget - handing off to a human agent")
+                    handoff_required = True
 
-                logger.info(f"   ✅ OpenAI Response received: {ai_response[:200]}{'...' if len(ai_response) > 200 else ''}")
-                logger.info(f"   🔄 Handoff required: {handoff_required}")
+                logger.info("   ✅ OpenAI Response received (%s chars)", len(ai_response))
+                logger.debug("   Response preview: %.200s%s", ai_response, '...' if len(ai_response) > 200 else '')
+                logger.info("   🔄 Handoff required: %s", handoff_required)
+                # Failed or timed-out calls are not saved, so a retry asks OpenAI again
+                if not openai_result.get("deadline_exceeded") and not ai_response.startswith("Error:"):
+                    ai_checkpoint = {"email": ai_response, "handoff": handoff_required, "usage": openai_usage}
             except Exception as openai_error:
-                logger.error(f"   ❌ OpenAI service failed: {type(openai_error).__name__}: {str(openai_error)}")
+                logger.error("   ❌ OpenAI service failed: %s: %s", type(openai_error).__name__, openai_error)
                 ai_response = f"Error: OpenAI service failed - {str(openai_error)}"
                 handoff_required = False
-            
-            # Send Slack notification (always)
-            logger.info("📤 SLACK NOTIFICATION SENDING:")
-            logger.info(f"   User Email: {payload.data.author.email}")
-            logger.info(f"   Conversation ID: {payload.data.conversation.csid}")
-            
-            slack_result = await services.slack_service.send_notification(
-                user_email=payload.data.author.email,
-                user_message=payload.data.text,
-                ai_response=ai_response,
-                conversation_id=payload.data.conversation.csid,
-                additional_context={
-                    "handoff_required": handoff_required,
-                    "is_initial_message": is_initial_message
-                }
-            )
-            
-            logger.info(f"   ✅ Slack send result: {slack_result.get('success', False)}")
-            if not slack_result.get('success'):
-                logger.error(f"   ❌ Slack error: {slack_result.get('error', 'Unknown error')}")
-            
-            # Initialize dixa_result for tracking
-            dixa_result = {"success": False, "skipped": False}
-            
-            # Only send Dixa reply if handoff is NOT required
-            if not handoff_required:
+            if ai_checkpoint:
+                await services.mongodb_service.save_checkpoint(checkpoints, {"ai": ai_checkpoint}, deadline=deadline)
+        
+        # Send Slack notification (always, unless the budget is nearly spent)
+        logger.info("📤 SLACK NOTIFICATION SENDING:")
+        logger.info("   User Email: %s", event.author_email)
+        logger.info("   Conversation ID: %s", event.conversation_id)
+        
+        if checkpoints.get("slack"):
+            slack_result = checkpoints.get("slack")
+            logger.info("   ♻️  Sent by an earlier attempt")
+        elif deadline.allows("slack", settings.DEADLINE_OPTIONAL_STAGE_MIN_SECONDS):
+            with stage_timer("slack") as stage:
+                slack_result = await services.slack_service.send_notification(
+                    user_email=event.author_email,
+                    user_message=user_text,
+                    ai_response=ai_response,
+                    conversation_id=event.conversation_id,
+                    additional_context={
+                        "handoff_required": handoff_required,
+                        "is_initial_message": is_initial_message
+                    },
+                    deadline=deadline
+                )
+                stage.succeeded(slack_result.get("success", False))
+            deadline.check("slack")
+            if slack_result.get("success"):
+                await services.mongodb_service.save_checkpoint(checkpoints, {"slack": {"success": True}}, deadline=deadline)
+        else:
+            logger.warning("   ⏱️  Skipping Slack notification - only %.1fs of budget left", deadline.remaining())
+            slack_result = {"success": False, "skipped": True, "error": "Skipped: deadline budget too low"}
+        
+        logger.info("   ✅ Slack send result: %s", slack_result.get('success', False))
+        if not slack_result.get('success'):
+            logger.error("   ❌ Slack error: %s", slack_result.get('error', 'Unknown error'))
+        
+        # Initialize dixa_result for tracking
+        dixa_result = {"success": False, "skipped": False}
+        
+        # Only send Dixa reply if handoff is NOT required
+        if not handoff_required:
+            saved_send = checkpoints.get("send")
+            if saved_send and saved_send.get("pending"):
+                logger.warning("⚠️  DIXA SEND UNCONFIRMED - An earlier attempt stopped mid-send, not sending again")
+                dixa_result = {"success": False, "unconfirmed": True, "error": "Send outcome unknown after an interrupted attempt"}
+            elif saved_send:
+                dixa_result = saved_send
+                logger.info("📤 DIXA MESSAGE - Sent by an earlier attempt (success: %s)", saved_send["success"])
+            else:
                 # Format response with webhook buttons (matching n8n Json converter node)
                 logger.info("   Formatting response with webhook buttons...")
                 formatted_response = services.message_formatter.format_response_with_webhook(
                     ai_response, 
-                    user_id=payload.data.author.id,
-                    conversation_id=payload.data.conversation.csid
+                    user_id=event.author_id,
+                    conversation_id=event.conversation_id
                 )
-                logger.info(f"   ✅ Response formatted successfully: {formatted_response.get('success', False)}")
-                
+                logger.info("   ✅ Response formatted successfully: %s", formatted_response.get('success', False))
+            
                 if formatted_response["success"]:
                     # Send message to Dixa (matching n8n "Send Email with webhook included" node)
                     logger.info("📤 DIXA MESSAGE SENDING:")
-                    logger.info(f"   Sending to conversation: {payload.data.conversation.csid}")
-                    logger.info(f"   Payload size: {len(str(formatted_response['dixa_payload']))} chars")
-                    
-                    dixa_result = await services.dixa_service.send_message(
-                        payload.data.conversation.csid,
-                        formatted_response["dixa_payload"]
+                    logger.info("   Sending to conversation: %s", event.conversation_id)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("   Payload size: %s chars", len(str(formatted_response['dixa_payload'])))
+                
+                    # Marked pending first: if this attempt dies mid-send, the retry must not send a second reply
+                    await services.mongodb_service.save_checkpoint(
+                        checkpoints, {"format": formatted_response, "send": {"pending": True}}, deadline=deadline
                     )
-                    
-                    logger.info(f"   ✅ Dixa send result: {dixa_result.get('success', False)}")
+                    with stage_timer("dixa_send") as stage:
+                        dixa_result = await services.dixa_service.send_message(
+                            event.conversation_id,
+                            formatted_response["dixa_payload"],
+                            deadline=deadline
+                        )
+                        stage.succeeded(dixa_result.get("success", False))
+                    await services.mongodb_service.save_checkpoint(checkpoints, {"send": {
+                        "success": dixa_result.get("success", False), "error": dixa_result.get("error")
+                    }}, deadline=deadline)
+                    deadline.check("dixa_send")
+                
+                    logger.info("   ✅ Dixa send result: %s", dixa_result.get('success', False))
                     if not dixa_result.get('success'):
-                        logger.error(f"   ❌ Dixa error: {dixa_result.get('error', 'Unknown error')}")
+                        logger.error("   ❌ Dixa error: %s", dixa_result.get('error', 'Unknown error'))
                 else:
                     logger.error("❌ RESPONSE FORMATTING FAILED")
-                    logger.error(f"   Error: {formatted_response.get('error', 'Unknown formatting error')}")
-            else:
-                logger.info("⏭️  SKIPPING DIXA REPLY - Handoff required, will transfer to human agent")
-                dixa_result = {"success": False, "skipped": True}
-            # Log to MongoDB (matching n8n Postgres node)
-            logger.info("💾 DATABASE LOGGING:")
-            log_data = {
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
-                "event_id": payload.event_id,
-                "user_id": payload.data.author.id,
-                "ai_response": ai_response,
-                "is_initial_message": is_initial_message,
-                "time_diff_ms": time_diff,
-                "dixa_message_sent": dixa_result.get("success", False),
-                "slack_notification_sent": slack_result.get("success", False),
-                "original_text": payload.data.text,
-                "handoff_required": handoff_required
+                    logger.error("   Error: %s", formatted_response.get('error', 'Unknown formatting error'))
+        else:
+            logger.info("⏭️  SKIPPING DIXA REPLY - Handoff required, will transfer to human agent")
+            dixa_result = {"success": False, "skipped": True}
+        # Log to MongoDB (matching n8n Postgres node)
+        logger.info("💾 DATABASE LOGGING:")
+        log_data = {
+            "conversation_id": event.conversation_id,
+            "message_id": event.message_id,
+            "event_id": event.event_id,
+            "user_id": event.author_id,
+            "ai_response": ai_response,
+            "is_initial_message": is_initial_message,
+            "time_diff_ms": time_diff,
+            "dixa_message_sent": dixa_result.get("success", False),
+            "slack_notification_sent": slack_result.get("success", False),
+            "original_text": event.text,
+            "handoff_required": handoff_required,
+            # OpenAI failures come back as "Error: ..." replies, not as an empty response
+            "openai_failed": ai_response.startswith("Error:")
+        }
+        if coalesced_event_ids:
+            log_data["coalesced_event_ids"] = coalesced_event_ids
+            log_data["coalesced_text"] = user_text
+        if preprocessing:
+            log_data["processed_text"] = prompt_text
+            log_data["preprocessing"] = {
+                key: preprocessing[key] for key in (
+                    "source", "removed", "original_chars", "processed_chars",
+                    "original_tokens_est", "processed_tokens_est", "token_reduction_pct"
+                )
             }
-            
-            logger.info(f"   Logging conversation data to MongoDB...")
-            log_result = await services.mongodb_service.log_conversation(log_data)
-            logger.info(f"   ✅ Database log result: {log_result.get('success', False)}")
-            if not log_result.get('success'):
-                logger.error(f"   ❌ Database error: {log_result.get('error', 'Unknown error')}")
-
-            # Handle handoff to human agent if required
+        log_data["deadline"] = deadline.summary()
+        log_data["trace_id"] = _current_trace_id()
+        if openai_usage:
+            log_data["openai_usage"] = openai_usage
+        if dixa_result.get("unconfirmed"):
+            log_data["dixa_send_unconfirmed"] = True
+        
+        logger.info("   Logging conversation data to MongoDB...")
+        log_result = await _log_conversation_once(event, log_data, deadline, checkpoints)
+        if log_result.get("success"):
+            # Without a handoff the log is the last stage; until it is written the recovery sweep retries it
             if handoff_required:
-                logger.info("🔄 HANDOFF REQUIRED - Transferring to queue")
-                logger.info(f"   Transferring conversation {payload.data.conversation.csid} to queue...")
-                
-                transfer_result = await services.dixa_service.transfer_to_queue(
-                    payload.data.conversation.csid,
-                    settings.AGENT_ID  # Use agent ID instead of customer ID
-                )
-                
-                if transfer_result["success"]:
-                    logger.info(f"   ✅ Successfully transferred to queue")
-                else:
-                    logger.error(f"   ❌ Queue transfer failed: {transfer_result.get('error', 'Unknown error')}")
+                await services.mongodb_service.save_checkpoint(checkpoints, {"log": {"success": True}}, deadline=deadline)
+            else:
+                await services.mongodb_service.complete_reservation(checkpoints, {"log": {"success": True}}, deadline=deadline)
+        deadline.check("mongo_log")
+        logger.info("   ✅ Database log result: %s", log_result.get('success', False))
+        if not log_result.get('success'):
+            logger.error("   ❌ Database error: %s", log_result.get('error', 'Unknown error'))
 
-                logger.info("🎉 WEBHOOK PROCESSING COMPLETED WITH HANDOFF!")
-                logger.info("=" * 80)
-                return {
-                    "status": "processed_with_handoff",
-                    "conversation_id": payload.data.conversation.csid,
-                    "message_id": payload.data.message_id,
-                    "isInitialMessage": is_initial_message,
-                    "ai_response": ai_response,
-                    "slack_notification_sent": slack_result.get("success", False),
-                    "dixa_message_sent": False,
-                    "logged_to_db": log_result["success"],
-                    "handoff_detected": True,
-                    "transferred_to_queue": transfer_result.get("success", False)
-                }
+        # Handle handoff to human agent if required
+        if handoff_required:
+            logger.info("🔄 HANDOFF REQUIRED - Transferring to queue")
+            logger.info("   Transferring conversation %s to queue...", event.conversation_id)
+            
+            transfer_result = checkpoints.get("transfer")
+            if transfer_result:
+                logger.info("   ♻️  Transferred by an earlier attempt")
+                if log_result.get("success"):
+                    await services.mongodb_service.complete_reservation(checkpoints, deadline=deadline)
+            else:
+                with stage_timer("transfer") as stage:
+                    transfer_result = await services.dixa_service.transfer_to_queue(
+                        event.conversation_id,
+                        settings.AGENT_ID,  # Use agent ID instead of customer ID
+                        deadline=deadline
+                    )
+                    stage.succeeded(transfer_result.get("success", False))
+                transferred = {"transfer": {"success": transfer_result["success"], "error": transfer_result.get("error")}}
+                if log_result.get("success"):
+                    await services.mongodb_service.complete_reservation(checkpoints, transferred, deadline=deadline)
+                else:
+                    await services.mongodb_service.save_checkpoint(checkpoints, transferred, deadline=deadline)
+                deadline.check("transfer")
+            
+            if transfer_result["success"]:
+                logger.info("   ✅ Successfully transferred to queue")
+            else:
+                logger.error("   ❌ Queue transfer failed: %s", transfer_result.get('error', 'Unknown error'))
 
-            logger.info("🎉 WEBHOOK PROCESSING COMPLETED SUCCESSFULLY!")
+            logger.info("🎉 WEBHOOK PROCESSING COMPLETED WITH HANDOFF!")
             logger.info("=" * 80)
             return {
-                "status": "processed_and_sent",
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
+                "status": "processed_with_handoff",
+                "conversation_id": event.conversation_id,
+                "message_id": event.message_id,
                 "isInitialMessage": is_initial_message,
                 "ai_response": ai_response,
                 "slack_notification_sent": slack_result.get("success", False),
-                "dixa_message_sent": dixa_result.get("success", False),
-                "logged_to_db": log_result["success"],
-                "handoff_detected": False
-            }
-        else:
-            # No operation for messages that don't meet validation criteria
-            logger.info("⏭️  MESSAGE SKIPPED:")
-            logger.info(f"   Reason: {validation_reason}")
-            logger.info(f"   Email: {author_email}")
-            logger.info(f"   Initial Message: {is_initial_message}")
-
-            # Log skipped message to prevent re-processing on duplicate webhooks
-            logger.info("💾 DATABASE LOGGING (SKIPPED MESSAGE):")
-            log_data = {
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
-                "event_id": payload.event_id,
-                "user_id": payload.data.author.id,
-                "ai_response": None,
-                "is_initial_message": is_initial_message,
-                "time_diff_ms": time_diff,
                 "dixa_message_sent": False,
-                "original_text": payload.data.text,
-                "skipped_reason": validation_reason
+                "logged_to_db": log_result["success"],
+                "handoff_detected": True,
+                "transferred_to_queue": transfer_result.get("success", False)
             }
 
-            log_result = await services.mongodb_service.log_conversation(log_data)
-            logger.info(f"   ✅ Skipped message logged: {log_result.get('success', False)}")
-            logger.info("=" * 80)
+        logger.info("🎉 WEBHOOK PROCESSING COMPLETED SUCCESSFULLY!")
+        logger.info("=" * 80)
+        return {
+            "status": "processed_and_sent",
+            "conversation_id": event.conversation_id,
+            "message_id": event.message_id,
+            "isInitialMessage": is_initial_message,
+            "ai_response": ai_response,
+            "slack_notification_sent": slack_result.get("success", False),
+            "dixa_message_sent": dixa_result.get("success", False),
+            "logged_to_db": log_result["success"],
+            "handoff_detected": False
+        }
+    else:
+        # No operation for messages that don't meet validation criteria
+        logger.info("⏭️  MESSAGE SKIPPED:")
+        logger.info("   Reason: %s", validation_reason)
+        logger.info("   Email: %s", author_email)
+        logger.info("   Initial Message: %s", is_initial_message)
 
-            return {
-                "status": "ignored",
-                "conversation_id": payload.data.conversation.csid,
-                "message_id": payload.data.message_id,
-                "event_id": payload.event_id,
-                "author_email": author_email,
-                "isInitialMessage": is_initial_message,
-                "validation_reason": validation_reason,
-                "reason": "Validation failed or not an initial message"
-            }
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions (like 503 from MongoDB down)
-        raise
-    except Exception as e:
-        logger.error("💥 WEBHOOK ERROR - Unexpected exception occurred")
-        logger.error(f"   Exception Type: {type(e).__name__}")
-        logger.error(f"   Exception Message: {str(e)}")
-        # Log full stack trace for debugging
-        import traceback
-        logger.error(f"   Stack Trace:\n{traceback.format_exc()}")
-        # Safely access payload attributes only if payload exists
-        if 'payload' in locals() and hasattr(payload, 'data') and hasattr(payload.data, 'conversation'):
-            logger.error(f"   Conversation ID: {getattr(payload.data.conversation, 'csid', 'Unknown')}")
-            logger.error(f"   Event ID: {getattr(payload, 'event_id', 'Unknown')}")
-        else:
-            logger.error("   Payload info: Unknown (payload not available)")
-        logger.error("=" * 80)
-        # Best-effort release of reservation on unexpected exceptions
-        try:
-            if 'payload' in locals() and hasattr(payload, 'event_id'):
-                logger.info(f"   Releasing reservation for event: {payload.event_id}")
-                await services.mongodb_service.release_reservation(payload.event_id)
-        except Exception as release_err:
-            logger.error(f"   Failed to release reservation: {release_err}")
-        raise HTTPException(status_code=500, detail=f"Error processing webhook: {str(e)}")
+        # Log skipped message to prevent re-processing on duplicate webhooks
+        logger.info("💾 DATABASE LOGGING (SKIPPED MESSAGE):")
+        log_data = {
+            "conversation_id": event.conversation_id,
+            "message_id": event.message_id,
+            "event_id": event.event_id,
+            "user_id": event.author_id,
+            "ai_response": None,
+            "is_initial_message": is_initial_message,
+            "time_diff_ms": time_diff,
+            "dixa_message_sent": False,
+            "original_text": event.text,
+            "skipped_reason": validation_reason,
+            "deadline": deadline.summary(),
+            "trace_id": _current_trace_id()
+        }
+
+        log_result = await _log_conversation_once(event, log_data, deadline, checkpoints)
+        if log_result.get("success"):
+            await services.mongodb_service.complete_reservation(checkpoints, deadline=deadline)
+        logger.info("   ✅ Skipped message logged: %s", log_result.get('success', False))
+        logger.info("=" * 80)
+
+        return {
+            "status": "ignored",
+            "conversation_id": event.conversation_id,
+            "message_id": event.message_id,
+            "event_id": event.event_id,
+            "author_email": author_email,
+            "isInitialMessage": is_initial_message,
+            "validation_reason": validation_reason,
+            "reason": "Validation failed or not an initial message"
+        }
 
 @router.get("/responded_false")
 async def response_webhook_no(user_id: str = None, conversation_id: int = None):
@@ -355,8 +861,8 @@ async def response_webhook_no(user_id: str = None, conversation_id: int = None):
     """
     logger.info("=" * 80)
     logger.info("🔔 WEBHOOK RECEIVED - Response 'No' Endpoint")
-    logger.info(f"👤 User ID: {user_id}")
-    logger.info(f"📞 Conversation ID: {conversation_id}")
+    logger.info("👤 User ID: %s", user_id)
+    logger.info("📞 Conversation ID: %s", conversation_id)
     
     # Validate required parameters - no hardcoded values
     if not conversation_id:
@@ -375,14 +881,15 @@ async def response_webhook_no(user_id: str = None, conversation_id: int = None):
     
     # Transfer to queue (matching n8n "Transfer Queue" node)
     logger.info("🔄 QUEUE TRANSFER PROCESSING:")
-    logger.info(f"   Transferring conversation {conversation_id} to queue...")
-    logger.info(f"   User ID: {user_id}")
+    logger.info("   Transferring conversation %s to queue...", conversation_id)
+    logger.info("   User ID: %s", user_id)
     
-    transfer_result = await services.dixa_service.transfer_to_queue(conversation_id, user_id)
+    async with conversation_locks.hold(conversation_id):
+        transfer_result = await services.dixa_service.transfer_to_queue(conversation_id, user_id)
     
     if transfer_result["success"]:
         logger.info("✅ QUEUE TRANSFER SUCCESSFUL!")
-        logger.info(f"   Queue ID: {transfer_result.get('response', {}).get('queueId', 'unknown')}")
+        logger.info("   Queue ID: %s", transfer_result.get('response', {}).get('queueId', 'unknown'))
         logger.info("=" * 80)
         return {
             "status": "response_received_and_transferred",
@@ -393,7 +900,7 @@ async def response_webhook_no(user_id: str = None, conversation_id: int = None):
         }
     else:
         logger.error("❌ QUEUE TRANSFER FAILED!")
-        logger.error(f"   Error: {transfer_result['error']}")
+        logger.error("   Error: %s", transfer_result['error'])
         logger.error("=" * 80)
         return {
             "status": "response_received_but_transfer_failed",
@@ -0,0 +1,17 @@
+"""
+The app on an in-memory MongoDB, for the offline load test
+
+MongoDBService connects with pymongo's MongoClient; here it is swapped for
+mongomock's before the app is imported, so the service code runs unchanged
+and nothing bench-only is imported by core/. Each worker process imports
+this module itself and gets its own empty database.
+
+    uvicorn bench.app:app
+    gunicorn -c gunicorn.conf.py bench.app:app
+"""
+import mongomock
+from core.services import database_service
+
+database_service.MongoClient = mongomock.MongoClient
+
+from main import app  # noqa: E402
@@ -0,0 +1,236 @@
+"""
+Load generator for the dirq webhook
+
+Replays test_payloads/*.json, synthetic conversations and duplicate storms
+against a running instance, then reports throughput, client-side latency
+percentiles and per-stage percentiles taken from the /metrics histograms
+(scraped before and after the run, so only this run's requests count).
+
+    python -m bench.loadgen --target http://127.0.0.1:8000 --scenario mixed --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import copy
+import glob
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from utils.metrics import _HistogramChild, histogram_quantile
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_payloads")
+WEBHOOK_PATH = "/dixa_conversation_started"
+STAGE_METRIC = "dirq_stage_duration_seconds"
+
+SYNTHETIC_MESSAGES = [
+    "Hi, where is my order? It was supposed to arrive yesterday.",
+    "I would like to cancel my purchase, can you help?",
+    "The item I received is damaged, what should I do?",
+    "Can I change the delivery address for my order?",
+    "How do I get a refund for the sofa I returned last week?",
+]
+QUOTED_REPLY = "\n\nOn Mon, 20 Jan 2025 at 10:00, Whoppah <support@whoppah.com> wrote:\n> Thanks for your message.\n> " + "> Earlier conversation text.\n" * 20
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def load_templates() -> List[Dict[str, Any]]:
+    templates = []
+    for path in sorted(glob.glob(os.path.join(PAYLOAD_DIR, "*.json"))):
+        with open(path) as handle:
+            templates.append(json.load(handle))
+    return templates
+
+
+def fresh_event(template: Dict[str, Any], text: Optional[str] = None) -> Dict[str, Any]:
+    """Copy a payload with new ids and timestamps, so it is neither a duplicate nor stale"""
+    event = copy.deepcopy(template)
+    now = datetime.now(timezone.utc)
+    event["event_id"] = f"bench-{uuid.uuid4()}"
+    event["event_timestamp"] = _iso(now)
+    data = event["data"]
+    data["message_id"] = f"bench-msg-{uuid.uuid4()}"
+    data["conversation"]["csid"] = random.randint(100_000, 9_999_999)
+    data["conversation"]["created_at"] = _iso(now)
+    data["created_at"] = _iso(now + timedelta(seconds=1))
+    if text is not None:
+        data["text"] = text
+        data["content"]["text"] = text
+    return event
+
+
+def build_events(scenario: str, count: int, templates: List[Dict[str, Any]], storm_size: int = 20) -> List[Dict[str, Any]]:
+    """
+    payloads:  the test payloads with fresh ids
+    synthetic: the processable templates with varied messages, a third with long quoted replies
+    storm:     each event delivered `storm_size` times, like Dixa retrying a slow webhook
+    mixed:     70% synthetic, 20% payloads, 10% storm duplicates
+    """
+    valid = [template for template in templates if template["data"]["author"].get("email", "").endswith("@whoppah.com")] or templates
+    events = []
+    while len(events) < count:
+        kind = scenario
+        if scenario == "mixed":
+            kind = random.choices(("synthetic", "payloads", "storm"), weights=(70, 20, 10))[0]
+        if kind == "payloads":
+            events.append(fresh_event(random.choice(templates)))
+        elif kind == "synthetic":
+            text = random.choice(SYNTHETIC_MESSAGES)
+            if random.random() < 0.33:
+                text += QUOTED_REPLY
+            events.append(fresh_event(random.choice(valid), text))
+        elif kind == "storm":
+            event = fresh_event(random.choice(valid), random.choice(SYNTHETIC_MESSAGES))
+            events.extend(copy.deepcopy(event) for _ in range(storm_size if scenario == "storm" else max(2, storm_size // 4)))
+        else:
+            raise ValueError(f"Unknown scenario: {scenario}")
+    return events[:count]
+
+
+_BUCKET_LINE = re.compile(r'^' + STAGE_METRIC + r'_bucket\{(?P<labels>[^}]*)\} (?P<value>\S+)$', re.MULTILINE)
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_stage_buckets(text: str) -> Dict[str, Dict[float, float]]:
+    """Cumulative bucket counts per stage (summed over outcomes) from Prometheus text"""
+    stages: Dict[str, Dict[float, float]] = defaultdict(lambda: defaultdict(float))
+    for match in _BUCKET_LINE.finditer(text):
+        labels = dict(_LABEL.findall(match.group("labels")))
+        bound = float("inf") if labels["le"] == "+Inf" else float(labels["le"])
+        stages[labels["stage"]][bound] += float(match.group("value"))
+    return stages
+
+
+def stage_quantiles(before: str, after: str) -> Dict[str, Dict[str, Optional[float]]]:
+    """Per-stage p50/p99/p999 in ms over the requests made between two scrapes"""
+    start, end = parse_stage_buckets(before), parse_stage_buckets(after)
+    report = {}
+    for stage, buckets in end.items():
+        bounds = sorted(buckets)
+        cumulative = [buckets[bound] - start.get(stage, {}).get(bound, 0) for bound in bounds]
+        child = _HistogramChild(tuple(bound for bound in bounds if bound != float("inf")))
+        child.counts = [int(value - previous) for value, previous in zip(cumulative, [0] + cumulative[:-1])]
+        child.count = int(cumulative[-1]) if cumulative else 0
+        if child.count <= 0:
+            continue
+        report[stage] = {"count": child.count}
+        for name, quantile in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999)):
+            value = histogram_quantile(child, quantile)
+            report[stage][f"{name}_ms"] = round(value * 1000, 1) if value is not None else None
+    return dict(sorted(report.items()))
+
+
+def latency_percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_ms": None, "p99_ms": None, "p999_ms": None, "max_ms": None}
+    pick = lambda quantile: round(ordered[min(len(ordered) - 1, int(len(ordered) * quantile))] * 1000, 1)
+    return {"p50_ms": pick(0.5), "p99_ms": pick(0.99), "p999_ms": pick(0.999), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+async def run_load(target: str, events: List[Dict[str, Any]], concurrency: int, rate: Optional[float] = None,
+                   timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Closed loop (`concurrency` workers back to back) or, with `rate`, open loop:
+    requests start on a fixed schedule whether or not earlier ones finished,
+    so a slow server shows up as latency instead of as lower offered load.
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        before = (await client.get("/metrics")).text
+
+        async def send(event: Dict[str, Any]) -> None:
+            started = time.perf_counter()
+            try:
+                response = await client.post(WEBHOOK_PATH, json=event)
+                status = response.json().get("status") if response.status_code == 200 else f"http_{response.status_code}"
+            except httpx.HTTPError as error:
+                status = f"client_{type(error).__name__}"
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+        started = time.perf_counter()
+        if rate:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def scheduled(index: int, event: Dict[str, Any]) -> None:
+                await asyncio.sleep(max(0.0, started + index / rate - time.perf_counter()))
+                async with semaphore:
+                    await send(event)
+
+            await asyncio.gather(*(scheduled(index, event) for index, event in enumerate(events)))
+        else:
+            queue: asyncio.Queue = asyncio.Queue()
+            for event in events:
+                queue.put_nowait(event)
+
+            async def worker() -> None:
+                while not queue.empty():
+                    await send(queue.get_nowait())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        after = (await client.get("/metrics")).text
+
+    return {
+        "requests": len(events),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(events) / elapsed, 2) if elapsed else None,
+        "client_latency": latency_percentiles(latencies),
+        "statuses": dict(statuses.most_common()),
+        "stages": stage_quantiles(before, after),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['requests']} requests in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    latency = report["client_latency"]
+    print(f"   client latency  p50 {latency['p50_ms']}ms  p99 {latency['p99_ms']}ms  "
+          f"p999 {latency['p999_ms']}ms  max {latency['max_ms']}ms")
+    print("   statuses: " + ", ".join(f"{status}={count}" for status, count in report["statuses"].items()))
+    print(f"\n   {'stage':<20} {'count':>7} {'p50 ms':>10} {'p99 ms':>10} {'p999 ms':>10}")
+    for stage, values in report["stages"].items():
+        print(f"   {stage:<20} {values['count']:>7} {values['p50_ms']!s:>10} {values['p99_ms']!s:>10} {values['p999_ms']!s:>10}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load generator for the dirq webhook")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=("payloads", "synthetic", "storm", "mixed"), default="mixed")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rate", type=float, help="Open loop: requests per second (default: closed loop)")
+    parser.add_argument("--storm-size", type=int, default=20, help="Deliveries per event in duplicate storms")
+    parser.add_argument("--seed", type=int, help="Random seed, for repeatable event mixes")
+    parser.add_argument("--json-out", help="Also write the report to this file")
+    return parser
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.seed is not None:
+        random.seed(args.seed)
+    events = build_events(args.scenario, args.requests, load_templates(), args.storm_size)
+    report = asyncio.run(run_load(args.target, events, args.concurrency, args.rate))
+    report["scenario"] = args.scenario
+    report["concurrency"] = args.concurrency
+    report["rate"] = args.rate
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as handle:
+            json.dump(report, handle, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
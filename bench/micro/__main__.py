@@ -0,0 +1,125 @@
+"""
+Microbenchmark runner for pure hot-path functions
+
+Discovers bench/micro/bench_*.py; every module-level bench_* function does its
+setup and returns the zero-argument callable to time. Each callable is timed
+with timeit (auto-ranged to ~0.2s per repeat); the best repeat is compared
+with bench/micro/baselines.json and the run fails when any benchmark is slower
+than its baseline by more than the threshold.
+
+    python -m bench.micro                   # compare against the baselines
+    python -m bench.micro --save            # record new baselines (after an intended change)
+    python -m bench.micro -k handoff --threshold 0.1
+
+Baselines are only comparable on the machine that recorded them; the runner
+warns when the recorded machine differs.
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+MICRO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(MICRO_DIR, "baselines.json")
+
+
+def machine_info() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def discover(keyword: str = "") -> List[Tuple[str, Callable[[], Callable[[], Any]]]]:
+    benchmarks = []
+    for path in sorted(glob.glob(os.path.join(MICRO_DIR, "bench_*.py"))):
+        module = importlib.import_module(f"bench.micro.{os.path.basename(path)[:-3]}")
+        for name in sorted(dir(module)):
+            factory = getattr(module, name)
+            if name.startswith("bench_") and callable(factory) and keyword in f"{module.__name__}.{name}":
+                benchmarks.append((f"{module.__name__.rsplit('.', 1)[-1]}::{name}", factory))
+    return benchmarks
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Per-call time in microseconds: best repeat (the comparison value) and median"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, number)
+    runs = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {"best_us": round(min(runs), 4), "median_us": round(statistics.median(runs), 4), "calls": number}
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], threshold: float):
+    rows, regressions = [], []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        change = None
+        if baseline:
+            change = result["best_us"] / baseline["best_us"] - 1
+            if change > threshold:
+                regressions.append(name)
+        rows.append((name, result, baseline, change))
+    return rows, regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the hot-path microbenchmarks")
+    parser.add_argument("-k", dest="keyword", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baselines")
+    parser.add_argument("--json-out", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    stored = {"machine": {}, "benchmarks": {}}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            stored = json.load(handle)
+    machine = machine_info()
+    if stored["benchmarks"] and stored.get("machine") != machine and not args.save:
+        print(f"⚠️  Baselines were recorded on {stored.get('machine')}, this is {machine}; comparisons are indicative only")
+
+    results = {}
+    for name, factory in discover(args.keyword):
+        results[name] = measure(factory(), args.repeat)
+
+    rows, regressions = compare(results, stored["benchmarks"], args.threshold)
+    print(f"\n{'benchmark':<56} {'best µs':>12} {'median µs':>12} {'baseline µs':>12} {'change':>8}")
+    for name, result, baseline, change in rows:
+        baseline_text = f"{baseline['best_us']:.3f}" if baseline else "-"
+        change_text = f"{change:+.1%}" if change is not None else "new"
+        flag = "  ❌" if name in regressions else ""
+        print(f"{name:<56} {result['best_us']:>12.3f} {result['median_us']:>12.3f} {baseline_text:>12} {change_text:>8}{flag}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as handle:
+            json.dump({"machine": machine, "benchmarks": results}, handle, indent=2)
+
+    if args.save:
+        benchmarks = {**stored["benchmarks"], **results} if args.keyword else results
+        with open(args.baseline, "w") as handle:
+            json.dump({"machine": machine, "benchmarks": dict(sorted(benchmarks.items()))}, handle, indent=2)
+            handle.write("\n")
+        print(f"\n💾 Saved {len(results)} baselines to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
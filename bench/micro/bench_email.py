@@ -0,0 +1,14 @@
+from bench.micro import fixtures
+from core.services.email_preprocessor import EmailPreprocessor
+
+
+def bench_preprocess_long_email():
+    preprocessor = EmailPreprocessor()
+    text = fixtures.long_email()
+    return lambda: preprocessor.preprocess(text)
+
+
+def bench_preprocess_short_email():
+    preprocessor = EmailPreprocessor()
+    text = fixtures.NEW_MESSAGE
+    return lambda: preprocessor.preprocess(text)
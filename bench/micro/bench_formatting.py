@@ -0,0 +1,27 @@
+from bench.micro import fixtures
+from core.services.dashboard_service import DashboardAPIService
+from core.services.formatter_service import MessageFormatter
+
+
+def bench_format_user_context_large():
+    service = DashboardAPIService()
+    context = fixtures.user_context(orders=40, threads=25)
+    return lambda: service.format_user_context(context)
+
+
+def bench_format_user_context_small():
+    service = DashboardAPIService()
+    context = fixtures.user_context(orders=1, threads=0)
+    return lambda: service.format_user_context(context)
+
+
+def bench_clean_text_for_json_long_email():
+    formatter = MessageFormatter()
+    text = fixtures.long_email()
+    return lambda: formatter.clean_text_for_json(text)
+
+
+def bench_clean_text_for_json_ai_reply():
+    formatter = MessageFormatter()
+    text = fixtures.ai_reply()
+    return lambda: formatter.clean_text_for_json(text)
@@ -0,0 +1,19 @@
+from bench.micro import fixtures
+from core.services.openai_service import OpenAIService
+
+
+def _service() -> OpenAIService:
+    # Only pure helpers are measured, so skip building the API client
+    return OpenAIService.__new__(OpenAIService)
+
+
+def bench_detect_handoff_no_match():
+    service = _service()
+    text = fixtures.ai_reply(handoff=False)
+    return lambda: service._detect_handoff_in_content(text)
+
+
+def bench_detect_handoff_match():
+    service = _service()
+    text = fixtures.ai_reply(handoff=True)
+    return lambda: service._detect_handoff_in_content(text)
@@ -0,0 +1,18 @@
+import orjson
+from api.routes.webhook import _message_delay_ms
+from bench.micro import fixtures
+from models.event import parse_webhook_event
+
+
+def bench_message_delay_ms():
+    return lambda: _message_delay_ms("2025-01-26T13:01:02.900Z", "2025-01-26T13:01:02.954Z")
+
+
+def bench_parse_webhook_event_short():
+    body = orjson.dumps(fixtures.webhook_payload())
+    return lambda: parse_webhook_event(orjson.loads(body))
+
+
+def bench_parse_webhook_event_long_email():
+    body = orjson.dumps(fixtures.webhook_payload(fixtures.long_email()))
+    return lambda: parse_webhook_event(orjson.loads(body))
@@ -0,0 +1,86 @@
+"""
+Realistic inputs for the microbenchmarks
+
+Sizes follow what production sends: Dashboard contexts for repeat buyers
+with dozens of orders, and email replies carrying long quoted histories.
+Everything is built deterministically so runs compare like with like.
+"""
+import copy
+import json
+import os
+from typing import Any, Dict
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "test_payloads")
+
+NEW_MESSAGE = (
+    "Hi,\r\n\r\nI ordered the teak sideboard last week (order 48213) and the tracking page still says "
+    "'awaiting pickup'.   The seller told me it was collected on Monday.\r\n\r\n"
+    "Could you check what is going on? I need it before the weekend because we are moving.\r\n\r\n"
+    "Kind regards,\r\nAnna de Vries\r\n\r\nSent from my iPhone\r\n"
+)
+
+QUOTED_BLOCK = (
+    "\r\nOn Thu, 4 Sep 2025 at 17:27, Whoppah Support <support@whoppah.com> wrote:\r\n"
+    "> Hi Anna,\r\n>\r\n> Thanks for your message. The courier has been booked and will contact the seller\r\n"
+    "> within two working days to arrange the pickup.   You will receive an email with the\r\n"
+    "> tracking link as soon as the item has been collected.\r\n>\r\n"
+    "> Kind regards,\r\n> Whoppah\r\n>\r\n"
+)
+
+
+def long_email(quoted_replies: int = 12) -> str:
+    """A reply with the whole thread quoted below it (~10 KB at the default depth)"""
+    return NEW_MESSAGE + "".join(QUOTED_BLOCK.replace("\r\n>", "\r\n" + ">" * (depth + 1)) for depth in range(quoted_replies))
+
+
+def ai_reply(handoff: bool = False, paragraphs: int = 6) -> str:
+    body = "\n\n".join(
+        f"Paragraph {index}: thanks for your patience while we look into the delivery of your order. "
+        "The courier confirmed the pickup and the parcel is now at the regional depot."
+        for index in range(paragraphs)
+    )
+    closing = "I'll connect you with a colleague who can help you better with this." if handoff else "Have a great day!"
+    return f"Hi Anna,\n\n{body}\n\n{closing}\n\nKind regards,\nWhoppah"
+
+
+def user_context(orders: int = 40, threads: int = 25) -> Dict[str, Any]:
+    """Dashboard user-context response for a repeat buyer/seller"""
+    return {
+        "user": {"id": 91234, "name": "Anna de Vries", "email": "anna@example.com", "created_at": "2021-03-14T09:12:00Z"},
+        "stats": {"total_orders": orders, "total_threads": threads},
+        "orders": [
+            {
+                "id": 48000 + index,
+                "status": ("shipped", "delivered", "awaiting_pickup", "cancelled")[index % 4],
+                "total_price": 125.0 + index * 17.5,
+                "created_at": f"2025-{1 + index % 12:02d}-{1 + index % 28:02d}T10:00:00Z",
+                "items": [{"id": index * 10 + item} for item in range(1 + index % 3)],
+                "tracking_url": f"https://tracking.example.com/{48000 + index}",
+                "pickup_tracking_url": f"https://tracking.example.com/pickup/{48000 + index}" if index % 2 else None,
+                "delivery_tracking_url": f"https://tracking.example.com/delivery/{48000 + index}",
+                "stripe_payout": 99.5 + index if index % 3 == 0 else None,
+                "stripe_account_error": "Account restricted" if index == 2 else None,
+            }
+            for index in range(orders)
+        ],
+        "threads": [
+            {
+                "id": 7000 + index,
+                "subject": f"Question about listing {index}",
+                "status": "open" if index % 2 else "closed",
+                "message_count": 3 + index,
+                "updated_at": "2025-09-01T12:00:00Z",
+            }
+            for index in range(threads)
+        ],
+    }
+
+
+def webhook_payload(text: str = None) -> Dict[str, Any]:
+    with open(os.path.join(PAYLOAD_DIR, "valid_whoppah_payload.json")) as handle:
+        payload = json.load(handle)
+    if text is not None:
+        payload = copy.deepcopy(payload)
+        payload["data"]["text"] = text
+        payload["data"]["content"]["text"] = text
+    return payload
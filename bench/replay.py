@@ -0,0 +1,190 @@
+"""
+Replay a captured traffic journal against a dirq instance
+
+Feeds the sanitized deliveries written by TRAFFIC_CAPTURE_ENABLED back into
+a running instance (normally one pointed at bench/stubs.py), keeping their
+recorded arrival pattern at 1x, Nx or maximum speed:
+
+    python -m bench.replay captures/traffic.jsonl --target http://127.0.0.1:8765 --speed 10
+    python -m bench.replay captures/traffic.jsonl --speed max --from 2025-03-03T08:00 --until 2025-03-03T11:00
+
+Event and message ids get a per-run suffix, so the same journal can be
+replayed repeatedly against one database while retries of an event still
+share an id, and message timestamps are moved to the replay clock keeping
+their age at arrival. The report compares the replayed outcomes with the
+ones recorded in production.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import httpx
+from bench.loadgen import WEBHOOK_PATH, latency_percentiles, print_report, stage_quantiles
+
+TIMESTAMP_PATHS = (("event_timestamp",), ("data", "created_at"), ("data", "conversation", "created_at"))
+
+
+def _parse_time(value: str) -> float:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def load_journal(path: str, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Journal entries with a payload, in arrival order, optionally limited to a time window"""
+    start = _parse_time(since) if since else float("-inf")
+    end = _parse_time(until) if until else float("inf")
+    entries = []
+    with open(path, "rb") as journal:
+        for line in journal:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("payload") is not None and start <= entry["arrived_at"] < end:
+                entries.append(entry)
+    return sorted(entries, key=lambda entry: entry["arrived_at"])
+
+
+def _shift_timestamp(value: Any, seconds: float) -> Any:
+    if not isinstance(value, str):
+        return value
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    return (moment + timedelta(seconds=seconds)).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def prepare_payload(entry: Dict[str, Any], run_tag: str, sent_at: float) -> Dict[str, Any]:
+    """Payload with run-scoped ids and timestamps moved so the event is as old as when it was recorded"""
+    payload = copy.deepcopy(entry["payload"])
+    if isinstance(payload.get("event_id"), str):
+        payload["event_id"] = f"{payload['event_id']}-{run_tag}"
+    data = payload.get("data")
+    if isinstance(data, dict) and isinstance(data.get("message_id"), str):
+        data["message_id"] = f"{data['message_id']}-{run_tag}"
+    shift = sent_at - entry["arrived_at"]
+    for path in TIMESTAMP_PATHS:
+        parent = payload
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict) and path[-1] in parent:
+            parent[path[-1]] = _shift_timestamp(parent[path[-1]], shift)
+    return payload
+
+
+async def replay(target: str, entries: List[Dict[str, Any]], speed: Optional[float], concurrency: int,
+                 timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Open-loop replay: each delivery is sent at its recorded offset divided by
+    `speed` (speed None sends as fast as `concurrency` allows). Late starts are
+    reported, since a saturated client would otherwise flatten the bursts.
+    """
+    run_tag = f"r{uuid.uuid4().hex[:8]}"
+    latencies: List[float] = []
+    start_lag: List[float] = []
+    statuses: Counter = Counter()
+    first_arrival = entries[0]["arrived_at"]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        before = (await client.get("/metrics")).text
+        started = time.perf_counter()
+        wall_started = time.time()
+
+        async def send(entry: Dict[str, Any]) -> None:
+            due = (entry["arrived_at"] - first_arrival) / speed if speed else 0.0
+            await asyncio.sleep(max(0.0, started + due - time.perf_counter()))
+            async with semaphore:
+                start_lag.append(max(0.0, time.perf_counter() - started - due))
+                payload = prepare_payload(entry, run_tag, wall_started + (time.perf_counter() - started))
+                sent = time.perf_counter()
+                try:
+                    response = await client.post(WEBHOOK_PATH, json=payload)
+                    status = response.json().get("status") if response.status_code == 200 else f"http_{response.status_code}"
+                except (httpx.HTTPError, ValueError) as error:
+                    status = f"client_{type(error).__name__}"
+                latencies.append(time.perf_counter() - sent)
+                statuses[status] += 1
+
+        await asyncio.gather(*(send(entry) for entry in entries))
+        elapsed = time.perf_counter() - started
+        after = (await client.get("/metrics")).text
+
+    recorded = Counter(
+        entry["status"] if entry.get("http_status") == 200 else f"http_{entry.get('http_status')}" for entry in entries
+    )
+    recorded_span = entries[-1]["arrived_at"] - first_arrival
+    return {
+        "run_tag": run_tag,
+        "requests": len(entries),
+        "speed": speed or "max",
+        "recorded_span_s": round(recorded_span, 2),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(entries) / elapsed, 2) if elapsed else None,
+        "recorded_rps": round(len(entries) / recorded_span, 2) if recorded_span else None,
+        "client_latency": latency_percentiles(latencies),
+        "recorded_latency": latency_percentiles([entry["duration_ms"] / 1000 for entry in entries]),
+        "start_lag": latency_percentiles(start_lag),
+        "statuses": dict(statuses.most_common()),
+        "recorded_statuses": dict(recorded.most_common()),
+        "stages": stage_quantiles(before, after),
+    }
+
+
+def print_replay_report(report: Dict[str, Any]) -> None:
+    print_report(report)
+    recorded = report["recorded_latency"]
+    print(f"\n   speed {report['speed']}: {report['recorded_span_s']}s of traffic "
+          f"({report['recorded_rps']} req/s recorded) replayed in {report['elapsed_s']}s")
+    print(f"   recorded latency  p50 {recorded['p50_ms']}ms  p99 {recorded['p99_ms']}ms  p999 {recorded['p999_ms']}ms")
+    print(f"   send start lag    p99 {report['start_lag']['p99_ms']}ms  max {report['start_lag']['max_ms']}ms")
+    print("   recorded statuses: " + ", ".join(f"{status}={count}" for status, count in report["recorded_statuses"].items()))
+
+
+def parse_speed(value: str) -> Optional[float]:
+    if value == "max":
+        return None
+    speed = float(value.rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def add_replay_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10 (or 10x), or 'max'")
+    parser.add_argument("--from", dest="since", help="Only replay deliveries recorded at or after this ISO time")
+    parser.add_argument("--until", help="Only replay deliveries recorded before this ISO time")
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    entries = load_journal(args.journal, args.since, args.until)
+    if not entries:
+        raise SystemExit(f"No replayable deliveries in {args.journal}")
+    report = asyncio.run(replay(args.target, entries, args.speed, args.concurrency))
+    print_replay_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as handle:
+            json.dump(report, handle, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured webhook journal")
+    parser.add_argument("journal", help="JSONL journal written by the traffic recorder")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=500, help="Upper bound on requests in flight")
+    parser.add_argument("--json-out", help="Also write the report to this file")
+    add_replay_arguments(parser)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
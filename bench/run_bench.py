@@ -0,0 +1,117 @@
+"""
+Offline load test: stub dependencies + in-memory Mongo + dirq + load generator
+
+Starts bench/stubs.py and the app (uvicorn, in-memory mongomock database) as
+subprocesses, waits for both to come up, runs the load generator (or replays
+a captured journal with --journal) and stops
+everything. Nothing leaves the machine, so results are repeatable and
+dependency latencies are whatever the stubs are told to use.
+
+    pip install -r bench/requirements.txt
+    python -m bench.run_bench --scenario mixed --requests 1000 --concurrency 100 \\
+        --latency openai=lognormal:2500:0.35 --errors dixa_send=0.01
+    python -m bench.run_bench --journal captures/traffic.jsonl --speed 10 --concurrency 500
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import httpx
+from bench import loadgen, replay
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def app_environment(stub_url: str, extra_env) -> dict:
+    env = {
+        **os.environ,
+        "DIXA_BASE_URL": f"{stub_url}/dixa/v1",
+        "DIXA_CONTENT_BASE_URL": f"{stub_url}/dixa/v1/content",
+        "DIXA_API_KEY": "bench",
+        "DASHBOARD_API_URL": f"{stub_url}/dashboard/user-context/",
+        "DASHBOARD_API_TOKEN": "bench",
+        "OPENAI_BASE_URL": f"{stub_url}/openai/v1",
+        "OPENAI_API_KEY": "bench",
+        "SLACK_API_URL": f"{stub_url}/slack/api/",
+        "SLACK_BOT_TOKEN": "xoxb-bench",
+        # Never dialed: bench.app swaps in an in-memory client
+        "MONGO_URL": "mongodb://localhost/dirq",
+        "LOG_PROFILE": "production",
+        "LOG_LEVEL": "WARNING",
+    }
+    for item in extra_env or []:
+        name, _, value = item.partition("=")
+        env[name] = value
+    return env
+
+
+def main():
+    parser = loadgen.build_parser()
+    parser.description = "Run the offline load test (stubs + in-memory Mongo + dirq + load generator)"
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the app")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn",
+                        help="Run the app under uvicorn --workers or gunicorn -c gunicorn.conf.py")
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=SPEC", help="Passed to bench.stubs")
+    parser.add_argument("--errors", action="append", metavar="ENDPOINT=RATE", help="Passed to bench.stubs")
+    parser.add_argument("--env", action="append", metavar="NAME=VALUE", help="Extra environment for the app")
+    parser.add_argument("--journal", help="Replay this captured traffic journal instead of generating load")
+    replay.add_replay_arguments(parser)
+    args = parser.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    args.target = f"http://127.0.0.1:{args.app_port}"
+
+    stub_cmd = [sys.executable, "-m", "bench.stubs", "--port", str(args.stub_port)]
+    for item in args.latency or []:
+        stub_cmd += ["--latency", item]
+    for item in args.errors or []:
+        stub_cmd += ["--errors", item]
+    app_env = app_environment(stub_url, args.env)
+    app_env["WEB_CONCURRENCY"] = str(args.workers)
+    if args.server == "gunicorn":
+        app_env["PORT"] = str(args.app_port)
+        app_cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "bench.app:app"]
+    else:
+        app_cmd = [sys.executable, "-m", "uvicorn", "bench.app:app", "--port", str(args.app_port),
+                   "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    if args.workers > 1:
+        print("ℹ️  Each worker keeps its own metrics, so the stage breakdown covers only the worker that answered /metrics")
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(stub_cmd, cwd=PROJECT_ROOT))
+        wait_until_up(f"{stub_url}/stats")
+        processes.append(subprocess.Popen(app_cmd, cwd=PROJECT_ROOT, env=app_env))
+        wait_until_up(f"{args.target}/health")
+        if args.journal:
+            replay.run(args)
+        else:
+            loadgen.run(args)
+        print("\n   stub calls: " + ", ".join(f"{name}={count}" for name, count in httpx.get(f"{stub_url}/stats").json()["calls"].items()))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Worker scaling benchmark: the same offline load test at 1, 2, 4, ... workers
+
+Runs bench.run_bench once per worker count and prints throughput, client
+latency and speedup against one worker. Stub latencies default to a few
+milliseconds so the app's own CPU work (validation, formatting, logging)
+is the bottleneck; with realistic multi-second OpenAI latencies a single
+event loop is rarely CPU-bound and extra workers change little.
+
+    python -m bench.scaling                          # 1, 2, 4, ... up to the core count
+    python -m bench.scaling --workers 1,2,4 --server gunicorn --requests 2000
+    python -m bench.scaling -- --latency openai=fixed:50 --env WEBHOOK_MAX_IN_FLIGHT=256
+
+Arguments after `--` are passed to every bench.run_bench run. Each worker
+has its own in-memory Mongo (mongomock), so only the synthetic scenario
+(no duplicate deliveries) gives comparable results.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from bench.run_bench import PROJECT_ROOT
+
+FAST_STUBS = ["claim=fixed:5", "dixa_send=fixed:5", "transfer=fixed:5", "content=fixed:5",
+              "dashboard=fixed:5", "openai=fixed:20", "slack=fixed:5"]
+
+
+def available_cores() -> int:
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+
+def default_worker_counts() -> List[int]:
+    """Powers of two up to the core count; 1 and 2 on a single core, to show the (lack of) effect"""
+    cores = available_cores()
+    counts, workers = [], 1
+    while workers < cores:
+        counts.append(workers)
+        workers *= 2
+    return counts + [cores] if cores > 1 else [1, 2]
+
+
+def run_once(workers: int, args: argparse.Namespace, passthrough: List[str]) -> Dict[str, Any]:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as handle:
+        report_path = handle.name
+    command = [sys.executable, "-m", "bench.run_bench", "--workers", str(workers), "--server", args.server,
+               "--scenario", "synthetic", "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+               "--seed", str(args.seed), "--json-out", report_path]
+    if "--latency" not in passthrough:
+        for spec in FAST_STUBS:
+            command += ["--latency", spec]
+    try:
+        subprocess.run(command + passthrough, cwd=PROJECT_ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(report_path) as handle:
+            return json.load(handle)
+    finally:
+        os.unlink(report_path)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure throughput at increasing worker counts")
+    parser.add_argument("--workers", help="Comma-separated worker counts (default: 1, 2, 4, ... up to the core count)")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="gunicorn")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json-out", help="Also write the table to this file")
+    args, passthrough = parser.parse_known_args()
+    passthrough = [item for item in passthrough if item != "--"]
+
+    counts = [int(value) for value in args.workers.split(",")] if args.workers else default_worker_counts()
+    cores = available_cores()
+    if max(counts) > cores:
+        print(f"⚠️  Only {cores} core(s) available: worker counts above that share cores and cannot scale")
+
+    rows = []
+    for workers in counts:
+        print(f"▶️  {workers} worker(s)...", flush=True)
+        report = run_once(workers, args, passthrough)
+        rows.append({"workers": workers, "throughput_rps": report["throughput_rps"],
+                     "p50_ms": report["client_latency"]["p50_ms"], "p99_ms": report["client_latency"]["p99_ms"],
+                     "statuses": report["statuses"]})
+
+    baseline = rows[0]["throughput_rps"] or 0
+    print(f"\n{'workers':>8} {'req/s':>10} {'speedup':>9} {'efficiency':>11} {'p50 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        speedup = row["throughput_rps"] / baseline if baseline else 0
+        row["speedup"] = round(speedup, 2)
+        print(f"{row['workers']:>8} {row['throughput_rps']:>10} {speedup:>8.2f}x {speedup / row['workers']:>10.0%} "
+              f"{row['p50_ms']!s:>9} {row['p99_ms']!s:>9}")
+
+    if args.json_out:
+        with open(args.json_out, "w") as handle:
+            json.dump({"cores": cores, "server": args.server, "runs": rows}, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Local stub servers for Dixa, the Dashboard API, the OpenAI Responses API and Slack
+
+One FastAPI app serves every dependency under its own prefix, with a
+configurable latency distribution and error rate per endpoint:
+
+    python -m bench.stubs --port 9100 --latency openai=lognormal:2500:0.35 --errors dixa_send=0.01
+
+Point dirq at it with DIXA_BASE_URL=http://127.0.0.1:9100/dixa/v1,
+DASHBOARD_API_URL=http://127.0.0.1:9100/dashboard/user-context/,
+OPENAI_BASE_URL=http://127.0.0.1:9100/openai/v1 and
+SLACK_API_URL=http://127.0.0.1:9100/slack/api/ (bench/run_bench.py does this).
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Dict, Optional
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Latency per endpoint: "fixed:<ms>", "uniform:<min_ms>:<max_ms>" or "lognormal:<median_ms>:<sigma>"
+DEFAULT_LATENCIES = {
+    "claim": "lognormal:80:0.3",
+    "dixa_send": "lognormal:120:0.3",
+    "transfer": "lognormal:100:0.3",
+    "content": "lognormal:60:0.3",
+    "dashboard": "lognormal:150:0.4",
+    "openai": "lognormal:2500:0.35",
+    "slack": "lognormal:200:0.3",
+}
+
+AI_REPLY = {
+    "email": "Hi there,\n\nThanks for reaching out. Your order is on its way and should arrive within 2 working days.\n\nKind regards,\nWhoppah",
+    "handoff": False,
+}
+
+
+class LatencyProfile:
+    """Samples a delay in seconds from a "kind:params" spec"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in params.split(":")] if params else []
+        if kind not in ("fixed", "uniform", "lognormal", "none"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0] / 1000
+        if self.kind == "uniform":
+            return random.uniform(self.params[0], self.params[1]) / 1000
+        if self.kind == "lognormal":
+            return random.lognormvariate(math.log(self.params[0]), self.params[1]) / 1000
+        return 0.0
+
+
+def parse_assignments(items, cast=str) -> Dict[str, object]:
+    """["name=value", ...] -> {name: cast(value)}"""
+    parsed = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        parsed[name.strip()] = cast(value.strip())
+    return parsed
+
+
+def create_stub_app(latencies: Optional[Dict[str, str]] = None, error_rates: Optional[Dict[str, float]] = None) -> FastAPI:
+    profiles = {name: LatencyProfile(spec) for name, spec in {**DEFAULT_LATENCIES, **(latencies or {})}.items()}
+    error_rates = error_rates or {}
+    calls: Dict[str, int] = {name: 0 for name in profiles}
+    app = FastAPI(title="dirq dependency stubs")
+
+    async def behave(endpoint: str) -> Optional[JSONResponse]:
+        """Sleep for the endpoint's latency; return an error response at its error rate"""
+        calls[endpoint] += 1
+        await asyncio.sleep(profiles[endpoint].sample())
+        if random.random() < error_rates.get(endpoint, 0.0):
+            return JSONResponse({"error": f"stub {endpoint} failure"}, status_code=500)
+        return None
+
+    @app.post("/dixa/v1/conversations/{conversation_id}/claim")
+    async def claim(conversation_id: int):
+        return await behave("claim") or {}
+
+    @app.post("/dixa/v1/conversations/{conversation_id}/messages")
+    async def send_message(conversation_id: int):
+        return await behave("dixa_send") or {"data": {"messageId": str(uuid.uuid4())}}
+
+    @app.put("/dixa/v1/conversations/{conversation_id}/transfer/queue")
+    async def transfer(conversation_id: int, request: Request):
+        body = await request.json()
+        return await behave("transfer") or {"data": {"queueId": body.get("queueId")}}
+
+    @app.get("/dixa/v1/content/{content_id}")
+    async def content(content_id: str):
+        return await behave("content") or JSONResponse("<p>Processed content</p>")
+
+    @app.get("/dashboard/user-context/")
+    async def user_context(email: str):
+        return await behave("dashboard") or {
+            "user": {"id": 1, "name": "Bench User", "email": email, "created_at": "2024-01-01T00:00:00Z"},
+            "stats": {"total_orders": 2, "total_threads": 1},
+            "orders": [{"id": 1001, "status": "shipped", "total_price": 149.0, "created_at": "2025-01-20T10:00:00Z"}],
+            "threads": [],
+        }
+
+    @app.post("/openai/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        variables = (body.get("prompt") or {}).get("variables") or {}
+        input_tokens = 900 + len(str(variables)) // 4
+        error = await behave("openai")
+        if error:
+            return error
+        text = JSONResponse(AI_REPLY).body.decode()
+        return {
+            "id": f"resp_{uuid.uuid4().hex}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": "gpt-4.1-mini-2025-04-14",
+            "output": [{
+                "type": "message",
+                "id": f"msg_{uuid.uuid4().hex}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 768},
+                "output_tokens": 120,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + 120,
+            },
+        }
+
+    @app.post("/slack/api/chat.postMessage")
+    async def slack_post_message():
+        return await behave("slack") or {"ok": True, "channel": "CBENCH", "ts": f"{time.time():.6f}"}
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": calls, "latencies": {name: profile.spec for name, profile in profiles.items()}, "error_rates": error_rates}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub servers for dirq's external dependencies")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", action="append", metavar="ENDPOINT=SPEC",
+                        help=f"Latency per endpoint ({', '.join(DEFAULT_LATENCIES)}), e.g. openai=lognormal:2500:0.35")
+    parser.add_argument("--errors", action="append", metavar="ENDPOINT=RATE",
+                        help="Error rate per endpoint (0-1), e.g. dixa_send=0.01")
+    args = parser.parse_args()
+
+    app = create_stub_app(parse_assignments(args.latency), parse_assignments(args.errors, float))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,12 @@ class Settings:
     AGENT_ID = os.getenv("AGENT_ID", "65355895-3def-4735-aed4-82ef1f2b7000")
     QUEUE_ID = os.getenv("QUEUE_ID", "d768da52-2eb2-4841-a5e8-ce2d7eed3f3f")
     OPENAI_PROMPT_ID = os.getenv("OPENAI_PROMPT_ID", "pmpt_68bcc4524178819485c37da997deecab093b3fe5540d118b")
+    OPENAI_PROMPT_VERSION = os.getenv("OPENAI_PROMPT_VERSION", "12")
+    # Price overrides in USD per 1M tokens: "model:input:cached_input:output;..."
+    OPENAI_PRICING = os.getenv("OPENAI_PRICING", "")
+    # Override API endpoints (e.g. local stub servers for benchmarks); empty uses the public API
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
     # Railway uses MONGO_URL, fallback to MONGODB_URL for local dev
     MONGODB_URL = os.getenv("MONGO_URL") or os.getenv("MONGODB_URL", "mongodb://localhost:27017/dirq")
     WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "https://your-webhook-url.com")
@@ -19,5 +25,94 @@ class Settings:
     # Slack configuration
     SLACK_BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN", "")
     SLACK_CHANNEL_ID = os.getenv("SLACK_CHANNEL_ID", "dirq-responses")  # Channel for production testing notifications
+    # Email preprocessing (strip quoted replies/signatures before prompting)
+    EMAIL_PREPROCESSING_ENABLED = os.getenv("EMAIL_PREPROCESSING_ENABLED", "true").lower() == "true"
+    # Base URL used to resolve content.processed_content_url; empty disables fetching
+    DIXA_CONTENT_BASE_URL = os.getenv("DIXA_CONTENT_BASE_URL", "")
+    # Burst coalescing per conversation (0 disables); must stay well below the 90s reservation TTL
+    COALESCE_WINDOW_SECONDS = float(os.getenv("COALESCE_WINDOW_SECONDS", "0"))
+    COALESCE_MAX_WAIT_SECONDS = float(os.getenv("COALESCE_MAX_WAIT_SECONDS", "10"))
+    # Admission control on the webhook endpoint (0 in-flight disables it)
+    WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "64"))
+    WEBHOOK_MAX_QUEUED = int(os.getenv("WEBHOOK_MAX_QUEUED", "128"))
+    WEBHOOK_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("WEBHOOK_MAX_QUEUE_WAIT_SECONDS", "2"))
+    WEBHOOK_RETRY_AFTER_SECONDS = int(os.getenv("WEBHOOK_RETRY_AFTER_SECONDS", "10"))
+    # End-to-end budget per webhook; optional stages (Dashboard, Slack) are skipped below the minimum
+    WEBHOOK_DEADLINE_SECONDS = float(os.getenv("WEBHOOK_DEADLINE_SECONDS", "60"))
+    DEADLINE_OPTIONAL_STAGE_MIN_SECONDS = float(os.getenv("DEADLINE_OPTIONAL_STAGE_MIN_SECONDS", "10"))
+    # Logging: "production" (compact JSON at INFO) or, opt-in for local work, "development" (readable text,
+    # app debug lines that include message content)
+    LOG_PROFILE = os.getenv("LOG_PROFILE") or "production"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "")  # empty uses the profile's default
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "")  # "text" or "json"; empty uses the profile's default
+    # Per-logger sampling of DEBUG records, e.g. "core.services.dixa_service=0.05,api.routes=0.1"
+    LOG_DEBUG_SAMPLE_RATES = os.getenv("LOG_DEBUG_SAMPLE_RATES", "")
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Tracing: comma-separated exporters ("jsonl", "otlp"); empty disables tracing
+    TRACE_EXPORTERS = os.getenv("TRACE_EXPORTERS", "")
+    TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "traces/traces.jsonl")
+    OTLP_ENDPOINT = os.getenv("OTLP_ENDPOINT", "http://localhost:4318")
+    OTLP_HEADERS = os.getenv("OTLP_HEADERS", "")  # "key=value,key=value"
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "dirq")
+    # Head sampling rate; slow and failed traces are always kept
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    TRACE_SLOW_THRESHOLD_SECONDS = float(os.getenv("TRACE_SLOW_THRESHOLD_SECONDS", "10"))
+    # Event loop watchdog: heartbeat interval and the stall length that triggers a stack capture
+    LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+    LOOP_WATCHDOG_INTERVAL_SECONDS = float(os.getenv("LOOP_WATCHDOG_INTERVAL_SECONDS", "0.1"))
+    LOOP_WATCHDOG_THRESHOLD_SECONDS = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_SECONDS", "0.25"))
+    # Token for /admin endpoints; empty disables them
+    ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+    # Keep a wall-clock profile of every webhook slower than the threshold
+    SLOW_WEBHOOK_PROFILING_ENABLED = os.getenv("SLOW_WEBHOOK_PROFILING_ENABLED", "false").lower() == "true"
+    SLOW_WEBHOOK_PROFILE_THRESHOLD_SECONDS = float(os.getenv("SLOW_WEBHOOK_PROFILE_THRESHOLD_SECONDS", "15"))
+    # Startup warm-up: build services and pre-connect to APIs before reporting healthy
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "20"))
+    # /ready is served from a snapshot refreshed in the background; stale snapshots report not ready
+    READINESS_INTERVAL_SECONDS = float(os.getenv("READINESS_INTERVAL_SECONDS", "5"))
+    READINESS_STALE_AFTER_SECONDS = float(os.getenv("READINESS_STALE_AFTER_SECONDS", "15"))
+    READINESS_MONGO_TIMEOUT_SECONDS = float(os.getenv("READINESS_MONGO_TIMEOUT_SECONDS", "2"))
+    READINESS_MAX_LOOP_LAG_SECONDS = float(os.getenv("READINESS_MAX_LOOP_LAG_SECONDS", "0.5"))
+    # Shared httpx connection pools (per upstream API)
+    HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+    HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+    HTTP_POOL_KEEPALIVE_SECONDS = float(os.getenv("HTTP_POOL_KEEPALIVE_SECONDS", "30"))
+    # Worker processes serving the app (set by gunicorn.conf.py); pool limits are instance-wide and split per worker
+    WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY") or "1"))
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    # Sanitized webhook journal for replay (bench/replay.py); sampled per event_id so duplicates stay together
+    TRAFFIC_CAPTURE_ENABLED = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+    TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "captures/traffic.jsonl")
+    TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+    # Key for pseudonymizing emails and names; empty uses a random key per process
+    TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "")
+    # Conversation logs older than this move to the compressed archive (scripts/archive_conversations.py)
+    ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+    # Idempotency records double as pipeline checkpoints: a worker leases an event, saves each stage
+    # result, and a retry after a crash resumes from the last saved stage
+    CHECKPOINT_LEASE_SECONDS = float(os.getenv("CHECKPOINT_LEASE_SECONDS", "90"))
+    CHECKPOINT_RETENTION_HOURS = float(os.getenv("CHECKPOINT_RETENTION_HOURS", "24"))
+    # Sweep for events whose worker died mid-pipeline (0 disables); events are given up after this many leases
+    CHECKPOINT_RECOVERY_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_RECOVERY_INTERVAL_SECONDS", "30"))
+    CHECKPOINT_MAX_ATTEMPTS = int(os.getenv("CHECKPOINT_MAX_ATTEMPTS", "3"))
+    # inline: the webhook runs the whole pipeline; queue: it only validates and enqueues for worker.py
+    PROCESSING_MODE = os.getenv("PROCESSING_MODE", "inline")
+    JOB_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("JOB_VISIBILITY_TIMEOUT_SECONDS", "120"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "10"))
+    # Jobs one worker process runs at a time, and how often an idle worker polls for more
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "8"))
+    WORKER_POLL_INTERVAL_SECONDS = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "0.5"))
+    # /metrics and /health of a worker process (0 disables)
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+    # Stemming language for conversation search when a message's own language is unclear (dutch|english|german|french|none)
+    SEARCH_DEFAULT_LANGUAGE = os.getenv("SEARCH_DEFAULT_LANGUAGE", "dutch")
+    SEARCH_MAX_TIME_MS = int(os.getenv("SEARCH_MAX_TIME_MS", "2000"))
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+
+def per_worker(total: int) -> int:
+    """Share of an instance-wide connection budget for one worker process"""
+    return max(1, total // settings.WEB_CONCURRENCY)
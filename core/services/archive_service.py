@@ -0,0 +1,140 @@
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import bson
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from core.services.rollup_service import ROLLUP_FIELDS, openai_failed
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:  # zlib keeps archival working where the wheel is unavailable
+    zstandard = None
+
+# Fields an archived conversation keeps in the hot collection: what the
+# duplicate checks (event_id, message_id + dixa_message_sent), listings and rollup rebuilds need
+STUB_FIELDS = ("_id", "conversation_id", "event_id", "message_id", "user_id", "skip_category") + ROLLUP_FIELDS
+DUPLICATE_KEY = 11000
+
+
+def compress(data: bytes) -> Dict[str, Any]:
+    if zstandard is not None:
+        return {"codec": "zstd", "body": bson.Binary(zstandard.ZstdCompressor(level=9).compress(data))}
+    return {"codec": "zlib", "body": bson.Binary(zlib.compress(data, 9))}
+
+
+def decompress(codec: str, body: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed archives")
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+
+class ConversationArchiveService:
+    """
+    Moves old conversation logs out of the hot collection
+    A conversation older than the cutoff is copied, whole and compressed, to
+    the archive collection (indexed by conversation_id) and then cut down in
+    place to a stub holding only the fields duplicate detection needs. Both
+    steps are idempotent, so an interrupted run is finished by the next one.
+    """
+
+    def __init__(self, conversations, archive):
+        self.conversations = conversations
+        self.archive = archive
+
+    def ensure_indexes(self) -> None:
+        self.archive.create_index([("conversation_id", ASCENDING), ("logged_at", ASCENDING)])
+        self.archive.create_index("event_id")
+
+    @staticmethod
+    def archive_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Archive entry: lookup fields in the clear, the full document as compressed BSON"""
+        raw = bson.encode(doc)
+        return {
+            "_id": doc["_id"],
+            "conversation_id": doc.get("conversation_id"),
+            "event_id": doc.get("event_id"),
+            "message_id": doc.get("message_id"),
+            "logged_at": doc.get("logged_at"),
+            "archived_at": datetime.utcnow(),
+            "raw_bytes": len(raw),
+            **compress(raw),
+        }
+
+    @staticmethod
+    def stub_update(doc: Dict[str, Any]) -> UpdateOne:
+        dropped = {field: "" for field in doc if field not in STUB_FIELDS}
+        # Logs older than the openai_failed flag carry the failure in ai_response, which the stub drops
+        kept = {"archived": True, "openai_failed": openai_failed(doc)}
+        return UpdateOne({"_id": doc["_id"]}, {"$unset": dropped, "$set": kept})
+
+    def _insert_archive(self, entries: List[Dict[str, Any]]) -> None:
+        try:
+            self.archive.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            # Entries archived by an interrupted earlier run are already there
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+    def archive_older_than(self, days: float, batch_size: int = 500, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Archive conversations logged more than `days` ago (blocking; meant for a scheduled job)"""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        query = {"logged_at": {"$lt": cutoff}, "archived": {"$ne": True}}
+        archived, raw_bytes, stored_bytes = 0, 0, 0
+        while limit is None or archived < limit:
+            size = batch_size if limit is None else min(batch_size, limit - archived)
+            batch = list(self.conversations.find(query).sort("logged_at", ASCENDING).limit(size))
+            if not batch:
+                break
+            entries = [self.archive_document(doc) for doc in batch]
+            self._insert_archive(entries)
+            self.conversations.bulk_write([self.stub_update(doc) for doc in batch], ordered=False)
+            archived += len(batch)
+            raw_bytes += sum(entry["raw_bytes"] for entry in entries)
+            stored_bytes += sum(len(entry["body"]) for entry in entries)
+            logger.info("🗄️  Archived %s conversations (up to %s)", archived, batch[-1].get("logged_at"))
+        return {
+            "success": True,
+            "archived": archived,
+            "cutoff": cutoff,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        }
+
+    def restore_stub_fields(self, batch_size: int = 500) -> int:
+        """
+        Put the rollup fields back on stubs archived before the stubs kept them
+        Those stubs have no openai_failed; their fields are read back from the
+        archive. Returns how many stubs were restored.
+        """
+        restored = 0
+        query = {"archived": True, "openai_failed": {"$exists": False}}
+        while True:
+            ids = [doc["_id"] for doc in self.conversations.find(query, {"_id": 1}).limit(batch_size)]
+            if not ids:
+                return restored
+            updates, found = [], set()
+            for entry in self.archive.find({"_id": {"$in": ids}}):
+                doc = bson.decode(decompress(entry["codec"], entry["body"]))
+                fields = {field: doc[field] for field in ROLLUP_FIELDS if field in doc}
+                updates.append(UpdateOne({"_id": entry["_id"]}, {"$set": {**fields, "openai_failed": openai_failed(doc)}}))
+                found.add(entry["_id"])
+            # A stub without an archive entry can't be restored; mark it so the scan moves on
+            updates += [UpdateOne({"_id": _id}, {"$set": {"openai_failed": False}}) for _id in ids if _id not in found]
+            self.conversations.bulk_write(updates, ordered=False)
+            restored += len(found)
+
+    def fetch(self, conversation_id: int) -> List[Dict[str, Any]]:
+        """Archived conversation logs of one conversation, decompressed, oldest first"""
+        documents = []
+        for entry in self.archive.find({"conversation_id": conversation_id}).sort("logged_at", ASCENDING):
+            doc = bson.decode(decompress(entry["codec"], entry["body"]))
+            doc["archived_at"] = entry["archived_at"]
+            documents.append(doc)
+        return documents
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in the order they complete; an event resumes after the last one it reached
+STAGES = ("burst", "claim", "context", "ai", "slack", "format", "send", "log", "transfer")
+# The 90 s TTL index reservations used before checkpoints; it would delete records mid-retention
+LEGACY_TTL_INDEX = "reserved_at_1"
+
+RESUMED_TOTAL = registry.counter(
+    "dirq_pipeline_resumed_total",
+    "Events that resumed from a checkpoint instead of starting over, by last completed stage",
+    labelnames=("stage",)
+)
+OPENAI_CALLS_SAVED_TOTAL = registry.counter(
+    "dirq_openai_calls_saved_total",
+    "OpenAI calls skipped because a resumed event already had its AI result"
+)
+RECOVERY_TOTAL = registry.counter(
+    "dirq_pipeline_recovery_total",
+    "Stalled events picked up by the recovery sweep, by outcome (resumed, shed, failed)",
+    labelnames=("outcome",)
+)
+
+
+class LeaseLost(Exception):
+    """Another worker took over the event after this worker's lease expired"""
+
+
+class EventCheckpoints:
+    """
+    Completed stages of one event, owned under a lease
+    `stages` maps a stage name to the result saved when it completed;
+    saving goes through MongoDBService.save_checkpoint.
+    """
+
+    def __init__(self, record: Dict[str, Any], owner: str):
+        self.event_id: str = record["_id"]
+        self.owner = owner
+        self.attempt: int = record.get("attempt", 1)
+        self.stages: Dict[str, Any] = dict(record.get("checkpoints") or {})
+
+    def get(self, stage: str) -> Optional[Any]:
+        return self.stages.get(stage)
+
+    @property
+    def last_stage(self) -> Optional[str]:
+        reached = [stage for stage in STAGES if stage in self.stages]
+        return reached[-1] if reached else None
+
+
+class PipelineCheckpointService:
+    """
+    Leases and stage checkpoints on the idempotency collection
+    The record keyed by event_id is both the reservation and the event's
+    progress: a worker takes a lease, saves each stage result as it
+    completes, and marks the record completed once the event is logged.
+    If the worker dies, the lease runs out and the next delivery (or the
+    recovery sweep) takes the record over and resumes after the last saved
+    stage, so a finished OpenAI call or Dixa send is never repeated.
+    """
+
+    def __init__(self, collection, lease_seconds: float = 90, retention_hours: float = 24):
+        self.collection = collection
+        self.lease = timedelta(seconds=lease_seconds)
+        self.retention = timedelta(hours=retention_hours)
+
+    def ensure_indexes(self) -> None:
+        if LEGACY_TTL_INDEX in self.collection.index_information():
+            self.collection.drop_index(LEGACY_TTL_INDEX)
+        self.collection.create_index("expire_at", expireAfterSeconds=0)
+        # Only unfinished records carry lease_until, so the recovery sweep scans just those
+        self.collection.create_index("lease_until", sparse=True)
+
+    def acquire(self, event_id: str, event: Optional[Dict[str, Any]] = None) -> Optional[EventCheckpoints]:
+        """
+        Lease the event: a new record, or one whose previous lease ran out
+        Returns None while another worker holds the lease or once the event
+        is completed. `event` is stored for the recovery sweep.
+        """
+        now = datetime.utcnow()
+        owner = uuid.uuid4().hex
+        query = {
+            "_id": event_id,
+            "completed_at": {"$exists": False},
+            "$or": [
+                {"lease_until": {"$lte": now}},
+                # Reservations written before checkpoints have no lease_until
+                {"lease_until": {"$exists": False}, "reserved_at": {"$lte": now - self.lease}},
+            ],
+        }
+        update = {
+            "$set": {"owner": owner, "leased_at": now, "lease_until": now + self.lease, "expire_at": now + self.retention},
+            "$inc": {"attempt": 1},
+            "$setOnInsert": {"event_id": event_id, "reserved_at": now, "checkpoints": {}, "event": event},
+        }
+        try:
+            record = self.collection.find_one_and_update(query, update, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            return None
+        return EventCheckpoints(record, owner)
+
+    def save(self, checkpoints: EventCheckpoints, results: Dict[str, Any]) -> None:
+        """Save stage results and extend the lease; raises LeaseLost if another worker owns the event now"""
+        now = datetime.utcnow()
+        updated = self.collection.update_one(
+            {"_id": checkpoints.event_id, "owner": checkpoints.owner},
+            {"$set": {**{f"checkpoints.{stage}": result for stage, result in results.items()},
+                      "lease_until": now + self.lease}},
+        )
+        if not updated.matched_count:
+            raise LeaseLost(f"Event {checkpoints.event_id} was taken over by another worker")
+        checkpoints.stages.update(results)
+
+    def release(self, checkpoints: EventCheckpoints) -> None:
+        """End the lease early and keep the checkpoints, so a retry resumes right away"""
+        self.collection.update_one(
+            {"_id": checkpoints.event_id, "owner": checkpoints.owner},
+            {"$set": {"lease_until": datetime.utcnow()}},
+        )
+
+    def complete(self, checkpoints: EventCheckpoints, results: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Mark the event done, saving the final stage results in the same write
+        The record stays until expire_at, so late deliveries stay duplicates.
+        """
+        results = results or {}
+        self.collection.update_one(
+            {"_id": checkpoints.event_id, "owner": checkpoints.owner},
+            {"$set": {"completed_at": datetime.utcnow(), **{f"checkpoints.{stage}": result for stage, result in results.items()}},
+             "$unset": {"lease_until": "", "event": ""}},
+        )
+        checkpoints.stages.update(results)
+
+    def state(self, event_id: str) -> str:
+        """completed, leased (a worker holds it now), stalled (lease ran out) or unknown (no record)"""
+        record = self.collection.find_one({"_id": event_id}, {"completed_at": 1, "lease_until": 1})
+        if record is None:
+            return "unknown"
+        if record.get("completed_at"):
+            return "completed"
+        if record.get("lease_until") and record["lease_until"] > datetime.utcnow():
+            return "leased"
+        return "stalled"
+
+    def stalled(self, max_attempts: int, limit: int = 20) -> List[Dict[str, Any]]:
+        """Unfinished events whose lease ran out, oldest lease first"""
+        query = {
+            "lease_until": {"$lte": datetime.utcnow()},
+            "completed_at": {"$exists": False},
+            "attempt": {"$lt": max_attempts},
+            "event": {"$type": "object"},
+        }
+        return list(self.collection.find(query, {"event": 1, "attempt": 1}).sort("lease_until", 1).limit(limit))
+
+
+class CheckpointRecovery:
+    """
+    Periodically resumes events whose worker died mid-pipeline
+    Dixa's retry of such an event may have been answered as a duplicate
+    while the dead worker's lease was still running, so nothing else would
+    pick it up. Each sweep finds the stalled events and runs them through
+    the normal webhook path; an event is given up after `max_attempts`
+    leases.
+    """
+
+    def __init__(self, interval: float, max_attempts: int):
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, sweep: Callable[[int], Awaitable[Dict[str, int]]]) -> None:
+        """Run `sweep(max_attempts)` every `interval` seconds; must be called from the running loop"""
+        if self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run(sweep))
+
+    async def _run(self, sweep: Callable[[int], Awaitable[Dict[str, int]]]) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                outcomes = await sweep(self.max_attempts)
+            except Exception as e:
+                logger.warning("⚠️  Checkpoint recovery sweep failed: %s: %s", type(e).__name__, e)
+                continue
+            for outcome, count in outcomes.items():
+                RECOVERY_TOTAL.labels(outcome).inc(count)
+            if outcomes:
+                logger.info("♻️  Checkpoint recovery sweep: %s", outcomes)
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
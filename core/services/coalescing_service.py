@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from config import settings
+from utils.timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+
+class CoalescingWindow:
+    """Messages buffered for one conversation while its debounce window is open"""
+
+    __slots__ = ("csid", "leader_event_id", "author_email", "event_ids", "message_ids",
+                 "texts", "opened_at", "closes_by", "future", "saved", "timer")
+
+    def __init__(self, csid: int, leader_event_id: str, message_id: str, author_email: str, text: str,
+                 max_wait_seconds: float):
+        self.csid = csid
+        self.leader_event_id = leader_event_id
+        self.author_email = author_email
+        self.event_ids: List[str] = [leader_event_id]
+        self.message_ids: List[str] = [message_id]
+        self.texts: List[str] = [text]
+        self.opened_at = time.monotonic()
+        self.closes_by = self.opened_at + max_wait_seconds
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # True once the leader has saved the burst (with the followers' texts) to its checkpoint
+        self.saved: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.timer = None
+
+
+class MessageCoalescer:
+    """
+    Per-conversation debounce of message bursts
+    The first processable message of a conversation opens a window and waits;
+    follow-up messages from the same author that arrive while it is open are
+    merged into it, so the burst results in one OpenAI call, one Dixa reply
+    and one Slack post. Each new message extends the window up to a maximum wait.
+    A follower only counts as handled once the leader reports the burst saved
+    (burst_saved), so a leader that dies first leaves the follower to be
+    processed on its own.
+    """
+
+    def __init__(self, window_seconds: float = None, max_wait_seconds: float = None):
+        self.window_seconds = settings.COALESCE_WINDOW_SECONDS if window_seconds is None else window_seconds
+        self.max_wait_seconds = settings.COALESCE_MAX_WAIT_SECONDS if max_wait_seconds is None else max_wait_seconds
+        self.wheel = TimerWheel()
+        self.windows: Dict[int, CoalescingWindow] = {}
+        # Closed or open windows whose burst the leader has not saved yet, by leader event_id
+        self.unsaved: Dict[str, CoalescingWindow] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    def try_join(self, csid: int, event_id: str, message_id: str, author_email: str, text: str) -> Optional[str]:
+        """
+        Add a message to the open window of its conversation
+
+        Returns:
+            The leader event_id the message was merged into, or None if no window is open
+        """
+        window = self.windows.get(csid)
+        if window is None or window.future.done() or window.author_email != author_email:
+            return None
+
+        window.event_ids.append(event_id)
+        window.message_ids.append(message_id)
+        window.texts.append(text)
+        self._schedule_close(window)
+        logger.info("🧲 Message %s merged into window of event %s (%s messages buffered)", message_id, window.leader_event_id, len(window.texts))
+        return window.leader_event_id
+
+    async def wait_for_burst(self, csid: int, event_id: str, message_id: str, author_email: str, text: str) -> Dict[str, Any]:
+        """
+        Open a window for this conversation and wait until it closes
+
+        Returns:
+            Dict with the buffered event_ids, message_ids and texts (leader first)
+        """
+        window = CoalescingWindow(csid, event_id, message_id, author_email, text, self.max_wait_seconds)
+        self.windows[csid] = window
+        self.unsaved[event_id] = window
+        self._schedule_close(window)
+        try:
+            await window.future
+        except BaseException:
+            self.burst_saved(event_id, False)
+            raise
+        finally:
+            if window.timer:
+                window.timer.cancel()
+            if self.windows.get(csid) is window:
+                del self.windows[csid]
+
+        waited_ms = (time.monotonic() - window.opened_at) * 1000
+        logger.info("🧲 Window for conversation %s closed after %.0fms with %s message(s)", csid, waited_ms, len(window.texts))
+        return {
+            "event_ids": window.event_ids,
+            "message_ids": window.message_ids,
+            "texts": window.texts,
+            "waited_ms": waited_ms
+        }
+
+    def burst_saved(self, leader_event_id: str, saved: bool) -> None:
+        """Called by the leader once it saved the burst, or with False when it could not"""
+        window = self.unsaved.pop(leader_event_id, None)
+        if window is not None and not window.saved.done():
+            window.saved.set_result(saved)
+
+    async def wait_until_saved(self, leader_event_id: str) -> bool:
+        """
+        Wait for the leader a message was merged into to save the burst
+
+        Returns:
+            True if the follower's text is saved with the leader's burst, False if the
+            leader failed first and the follower must be processed on its own
+        """
+        window = self.unsaved.get(leader_event_id)
+        if window is None:
+            return False
+        # Shielded: a cancelled follower must not resolve the leader's future
+        return await asyncio.shield(window.saved)
+
+    def _schedule_close(self, window: CoalescingWindow) -> None:
+        if window.timer:
+            window.timer.cancel()
+        delay = min(self.window_seconds, window.closes_by - time.monotonic())
+        window.timer = self.wheel.schedule(max(0.0, delay), lambda: self._close(window))
+
+    def _close(self, window: CoalescingWindow) -> None:
+        if not window.future.done():
+            window.future.set_result(None)
+
+    @staticmethod
+    def merge_texts(texts: List[str]) -> str:
+        """Join buffered messages into a single prompt body, oldest first"""
+        return "\n\n".join(text.strip() for text in texts if text and text.strip())
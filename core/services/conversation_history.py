@@ -0,0 +1,128 @@
+import base64
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+import orjson
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from core.services.rollup_service import skip_reason_key
+
+# Newest first; _id breaks ties between conversations logged in the same millisecond
+SORT = [("logged_at", DESCENDING), ("_id", DESCENDING)]
+
+# Fields returned when the caller does not pick any: enough to browse, without the message bodies
+SUMMARY_FIELDS = (
+    "logged_at", "conversation_id", "message_id", "event_id", "user_id", "is_initial_message",
+    "handoff_required", "dixa_message_sent", "slack_notification_sent", "skipped_reason", "archived",
+)
+MAX_PAGE_SIZE = 500
+# Rollup category of skipped_reason (coalesced, not_initial_message, ...); skipped_reason itself
+# carries event ids and addresses, so only the category can be an equality prefix of an index
+SKIP_CATEGORY_FIELD = "skip_category"
+# Documents serialized per response chunk
+CHUNK_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    """Raised for a pagination cursor that was not produced by this API"""
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = orjson.dumps([doc["logged_at"].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        logged_at, object_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(logged_at), ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId, orjson.JSONDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def _after(position: Tuple[datetime, ObjectId]) -> Dict[str, Any]:
+    """Keyset condition: strictly after `position` in SORT order"""
+    logged_at, object_id = position
+    return {"$or": [{"logged_at": {"$lt": logged_at}}, {"logged_at": logged_at, "_id": {"$lt": object_id}}]}
+
+
+class ConversationHistoryService:
+    """
+    Pages through logged conversations, newest first
+    Pagination is keyset-based on (logged_at, _id): each page starts with an
+    index seek just past the previous page's last document, so page 1000 costs
+    the same as page 1, unlike skip/limit which walks every skipped entry.
+    Compound indexes put each filter ahead of the sort keys, so every filter
+    the listing offers is an equality (or a few) on an index prefix.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index(SORT)
+        for prefix in ("conversation_id", "user_id", "handoff_required", "dixa_message_sent", SKIP_CATEGORY_FIELD):
+            self.collection.create_index([(prefix, ASCENDING)] + SORT)
+
+    @staticmethod
+    def annotate(conversation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Set the skip category of a conversation about to be logged"""
+        if conversation_data.get("skipped_reason"):
+            conversation_data[SKIP_CATEGORY_FIELD] = skip_reason_key(conversation_data["skipped_reason"])
+        return conversation_data
+
+    def backfill_skip_categories(self, batch_size: int = 1000) -> int:
+        """Categorize skipped conversations logged before skip_category existed; returns how many were set"""
+        updated = 0
+        query = {"skipped_reason": {"$exists": True, "$ne": None}, SKIP_CATEGORY_FIELD: {"$exists": False}}
+        while True:
+            batch = list(self.collection.find(query, {"skipped_reason": 1}).limit(batch_size))
+            if not batch:
+                return updated
+            self.collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {SKIP_CATEGORY_FIELD: skip_reason_key(doc["skipped_reason"])}})
+                for doc in batch
+            ], ordered=False)
+            updated += len(batch)
+
+    def exists(self, conversation_id: int) -> bool:
+        return self.collection.find_one({"conversation_id": conversation_id}, {"_id": 1}) is not None
+
+    def page(self, query: Dict[str, Any], fields: Optional[Sequence[str]], limit: int,
+             after: Optional[str] = None) -> Iterator[bytes]:
+        """
+        One page as a JSON document, streamed in chunks as the cursor is read
+        {"items": [...], "count": n, "next_cursor": "..." or null}; pass
+        next_cursor back as `after` for the following page. A bad cursor
+        raises InvalidCursor here, before anything is read.
+        """
+        if after:
+            query = {"$and": [query, _after(decode_cursor(after))]} if query else _after(decode_cursor(after))
+        projection = {field: 1 for field in (fields or SUMMARY_FIELDS)}
+        projection["logged_at"] = 1
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        cursor = self.collection.find(query, projection).sort(SORT).limit(limit + 1).batch_size(limit + 1)
+        return self._stream(cursor, limit)
+
+    @staticmethod
+    def _stream(cursor, limit: int) -> Iterator[bytes]:
+        count, last, has_more = 0, None, False
+        chunk = [b'{"items":[']
+        try:
+            for doc in cursor:
+                if count == limit:
+                    has_more = True
+                    break
+                chunk.append((b"," if count else b"") + orjson.dumps(
+                    {**doc, "_id": str(doc["_id"])}, default=str, option=orjson.OPT_NAIVE_UTC
+                ))
+                last = doc
+                count += 1
+                if len(chunk) >= CHUNK_SIZE:
+                    yield b"".join(chunk)
+                    chunk = []
+        finally:
+            cursor.close()
+        chunk.append(b'],"count":' + str(count).encode() + b',"next_cursor":' +
+                     orjson.dumps(encode_cursor(last) if has_more else None) + b"}")
+        yield b"".join(chunk)
@@ -2,6 +2,8 @@ import logging
 import httpx
 from typing import Optional, Dict, Any
 from config import settings
+from utils.deadline import Deadline, timeout_for
+from utils.http_pool import pooled_async_client, warm_connection
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +20,25 @@ class DashboardAPIService:
             "Authorization": f"Token {self.api_token}",
             "Content-Type": "application/json"
         }
+        self._http_client: Optional[httpx.AsyncClient] = None
 
-    async def get_user_context(self, email: str, orders_limit: int = 10, threads_limit: int = 10) -> Optional[Dict[str, Any]]:
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled client shared by all Dashboard calls"""
+        if self._http_client is None:
+            self._http_client = pooled_async_client(10.0)
+        return self._http_client
+
+    async def warm_up(self) -> dict:
+        """Open a pooled connection to the Dashboard API ahead of the first webhook"""
+        return await warm_connection(self.http_client, self.api_url)
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    async def get_user_context(self, email: str, orders_limit: int = 10, threads_limit: int = 10, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
         """
         Fetch user context data from Dashboard API
 
@@ -27,12 +46,13 @@ class DashboardAPIService:
             email: User's email address
             orders_limit: Maximum number of orders to return (default: 10)
             threads_limit: Maximum number of message threads to return (default: 10)
+            deadline: Optional webhook deadline; the remaining budget caps the 10s timeout
 
         Returns:
             Dictionary containing user profile, orders, threads, and stats, or None if error
         """
         try:
-            logger.info(f"📊 DASHBOARD API - Fetching user context for {email}")
+            logger.info("📊 DASHBOARD API - Fetching user context for %s", email)
 
             params = {
                 "email": email,
@@ -40,30 +60,30 @@ class DashboardAPIService:
                 "threads_limit": threads_limit
             }
 
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    self.api_url,
-                    headers=self.headers,
-                    params=params
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info(f"   ✅ Successfully fetched user context")
-                    logger.info(f"   Orders: {data.get('stats', {}).get('total_orders', 0)}, Threads: {data.get('stats', {}).get('total_threads', 0)}")
-                    return data
-                elif response.status_code == 404:
-                    logger.warning(f"   ⚠️  User not found in Dashboard API: {email}")
-                    return None
-                else:
-                    logger.error(f"   ❌ Dashboard API error: {response.status_code} - {response.text}")
-                    return None
+            response = await self.http_client.get(
+                self.api_url,
+                timeout=timeout_for(deadline, 10.0),
+                headers=self.headers,
+                params=params
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                logger.info("   ✅ Successfully fetched user context")
+                logger.info("   Orders: %s, Threads: %s", data.get('stats', {}).get('total_orders', 0), data.get('stats', {}).get('total_threads', 0))
+                return data
+            elif response.status_code == 404:
+                logger.warning("   ⚠️  User not found in Dashboard API: %s", email)
+                return None
+            else:
+                logger.error("   ❌ Dashboard API error: %s - %s", response.status_code, response.text)
+                return None
 
         except httpx.TimeoutException:
-            logger.error(f"   ❌ Dashboard API timeout for email: {email}")
+            logger.error("   ❌ Dashboard API timeout for email: %s", email)
             return None
         except Exception as e:
-            logger.error(f"   ❌ Error fetching user context from Dashboard API: {str(e)}")
+            logger.error("   ❌ Error fetching user context from Dashboard API: %s", e)
             return None
 
     def format_user_context(self, context: Dict[str, Any]) -> str:
@@ -1,17 +1,88 @@
 import logging
+import os
+import time
 from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
-from config import settings
+from typing import Any, Dict, List, Optional
+import pymongo
+from pymongo import MongoClient, monitoring
+from config import settings, per_worker
+from utils.deadline import Deadline, timeout_for
+from utils.tracing import MongoTracingListener
+from core.services.rollup_service import ConversationRollupService
+from core.services.archive_service import ConversationArchiveService
+from core.services.export_service import ConversationExportService
+from core.services.conversation_history import ConversationHistoryService
+from core.services.search_service import ConversationSearchService
+from core.services.checkpoint_service import EventCheckpoints, LeaseLost, PipelineCheckpointService
+from core.services.job_queue import JobQueue
 import threading
 
 logger = logging.getLogger(__name__)
 
+# Per-operation cap under a webhook deadline; idempotency bookkeeping always
+# gets at least MIN_TIMEOUT_SECONDS so it still runs after the budget is spent
+OPERATION_TIMEOUT_SECONDS = 5.0
+MIN_TIMEOUT_SECONDS = 1.0
+
+def _operation_timeout(deadline: Optional[Deadline]):
+    """pymongo client-side operation timeout context for an optional deadline"""
+    return pymongo.timeout(timeout_for(deadline, OPERATION_TIMEOUT_SECONDS, floor=MIN_TIMEOUT_SECONDS))
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Counts open, checked-out and waiting connections across the client's pools"""
+
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, amount: int) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def connection_created(self, event):
+        self._add("open", 1)
+
+    def connection_closed(self, event):
+        self._add("open", -1)
+
+    def connection_check_out_started(self, event):
+        self._add("waiting", 1)
+
+    def connection_check_out_failed(self, event):
+        self._add("waiting", -1)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+
+    def connection_checked_in(self, event):
+        self._add("in_use", -1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
 class MongoDBService:
     """
     Service for MongoDB operations
     Minimal implementation for conversation logging as per n8n Postgres node
     Uses thread-safe singleton pattern to ensure only one connection is established
+    per process: a forked worker drops the inherited client and connects anew.
     """
 
     _instance = None
@@ -27,14 +98,28 @@ class MongoDBService:
                     cls._instance._init_connection()
         return cls._instance
 
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        """
+        MongoClient is not fork-safe: its sockets and monitor threads belong to the
+        parent. The child forgets the inherited instance (and the lock, which another
+        thread may have held at fork time) and connects on first use.
+        """
+        cls._instance = None
+        cls._lock = threading.Lock()
+
     def _init_connection(self):
         """Initialize MongoDB connection - called only once"""
+        self.max_pool_size = per_worker(settings.MONGO_MAX_POOL_SIZE)
+        self.pool_listener = MongoPoolListener()
         try:
-            logger.info(f"🔌 Initializing MongoDB connection: {settings.MONGODB_URL[:50]}...")
+            logger.info("🔌 Initializing MongoDB connection: %s...", settings.MONGODB_URL[:50])
             self.client = MongoClient(
                 settings.MONGODB_URL,
                 serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=5000
+                connectTimeoutMS=5000,
+                maxPoolSize=self.max_pool_size,
+                event_listeners=[MongoTracingListener(), self.pool_listener]
             )
             # Test the connection
             self.client.admin.command('ping')
@@ -51,24 +136,93 @@ class MongoDBService:
 
             self.conversations_collection = self.db.conversations
             self.idempotency_collection = self.db.idempotency
+            self.checkpoints = PipelineCheckpointService(
+                self.idempotency_collection, settings.CHECKPOINT_LEASE_SECONDS, settings.CHECKPOINT_RETENTION_HOURS
+            )
+            self.rollups = ConversationRollupService(self.db.conversation_rollups)
+            self.archive = ConversationArchiveService(self.conversations_collection, self.db.conversations_archive)
+            self.export = ConversationExportService(self.conversations_collection, self.db.conversations_archive)
+            self.history = ConversationHistoryService(self.conversations_collection)
+            self.search = ConversationSearchService(
+                self.conversations_collection, settings.SEARCH_DEFAULT_LANGUAGE, settings.SEARCH_MAX_TIME_MS
+            )
+            self.jobs = JobQueue(
+                self.db.jobs, self.db.job_dead_letters, self.db.job_conversation_leases,
+                visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                retry_backoff=settings.JOB_RETRY_BACKOFF_SECONDS
+            )
+
+            # Idempotency records hold the pipeline checkpoints and expire after CHECKPOINT_RETENTION_HOURS
+            try:
+                self.checkpoints.ensure_indexes()
+                logger.info("✅ TTL index created on idempotency collection (%sh expiry)", settings.CHECKPOINT_RETENTION_HOURS)
+            except Exception as idx_err:
+                logger.warning("⚠️  TTL index creation warning: %s", idx_err)
+
+            try:
+                self.rollups.ensure_indexes()
+            except Exception as idx_err:
+                logger.warning("⚠️  Rollup index creation warning: %s", idx_err)
+
+            # The duplicate checks look up event_id / message_id on every webhook; history and
+            # archival walk (logged_at, _id)
+            try:
+                self.conversations_collection.create_index("event_id")
+                self.conversations_collection.create_index("message_id")
+                self.history.ensure_indexes()
+                self.archive.ensure_indexes()
+            except Exception as idx_err:
+                logger.warning("⚠️  Conversation index creation warning: %s", idx_err)
 
-            # Create TTL index on idempotency collection
+            # A collection has one text index; changing its fields or weights means dropping it first
             try:
-                self.idempotency_collection.create_index(
-                    "reserved_at",
-                    expireAfterSeconds=90
-                )
-                logger.info("✅ TTL index created on idempotency collection (90 sec expiry)")
+                self.search.ensure_indexes()
             except Exception as idx_err:
-                logger.warning(f"⚠️  TTL index creation warning: {idx_err}")
+                logger.warning("⚠️  Search index creation warning: %s", idx_err)
 
-            logger.info(f"✅ MongoDB connected successfully to database: {self.db.name}")
+            try:
+                self.jobs.ensure_indexes()
+            except Exception as idx_err:
+                logger.warning("⚠️  Job queue index creation warning: %s", idx_err)
+
+            logger.info("✅ MongoDB connected successfully to database: %s", self.db.name)
         except Exception as e:
-            logger.error(f"❌ Failed to connect to MongoDB: {str(e)}")
+            logger.error("❌ Failed to connect to MongoDB: %s", e)
             self.client = None
             self.db = None
+            self.checkpoints = None
+            self.rollups = None
+            self.archive = None
+            self.export = None
+            self.history = None
+            self.search = None
+            self.jobs = None
     
-    async def log_conversation(self, conversation_data: dict) -> dict:
+    def ping(self, timeout: float) -> dict:
+        """Round-trip a ping to the server (blocking; run it in a worker thread)"""
+        if self.client is None:
+            return {"success": False, "error": "MongoDB not connected"}
+        started = time.perf_counter()
+        try:
+            with pymongo.timeout(timeout):
+                self.client.admin.command("ping")
+            return {"success": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"success": False, "error": f"{type(e).__name__}: {e}"}
+
+    def pool_stats(self) -> dict:
+        """Connection pool usage from the CMAP listener; no I/O"""
+        listener = self.pool_listener
+        return {
+            "open": listener.open,
+            "in_use": listener.in_use,
+            "waiting": listener.waiting,
+            "max": self.max_pool_size,
+            "saturation": round(listener.in_use / self.max_pool_size, 3),
+        }
+
+    async def log_conversation(self, conversation_data: dict, deadline: Optional[Deadline] = None) -> dict:
         """
         Log conversation data to MongoDB
         Minimal implementation matching n8n Postgres node functionality
@@ -79,23 +233,35 @@ class MongoDBService:
             
             # Add timestamp
             conversation_data["logged_at"] = datetime.utcnow()
-            
+            self.search.annotate(conversation_data)
+            self.history.annotate(conversation_data)
+
             # Insert the document
-            result = self.conversations_collection.insert_one(conversation_data)
+            with _operation_timeout(deadline):
+                result = self.conversations_collection.insert_one(conversation_data)
             
-            logger.info(f"Logged conversation {conversation_data.get('conversation_id')} to MongoDB")
+            logger.info("Logged conversation %s to MongoDB", conversation_data.get('conversation_id'))
+            self._record_rollups(conversation_data, deadline)
             return {
                 "success": True,
                 "inserted_id": str(result.inserted_id)
             }
             
         except Exception as e:
-            logger.error(f"Error logging to MongoDB: {str(e)}")
+            logger.error("Error logging to MongoDB: %s", e)
             return {
                 "success": False,
                 "error": str(e)
             }
 
+    def _record_rollups(self, conversation_data: dict, deadline: Optional[Deadline]) -> None:
+        """Count the logged conversation into its rollup buckets; a failure only costs analytics"""
+        try:
+            with _operation_timeout(deadline):
+                self.rollups.record(conversation_data)
+        except Exception as e:
+            logger.warning("⚠️  Rollup update failed for conversation %s: %s", conversation_data.get('conversation_id'), e)
+
     async def has_message_been_sent(self, message_id: str) -> bool:
         """
         Check if a message with the given message_id has already resulted
@@ -109,52 +275,116 @@ class MongoDBService:
             doc = self.conversations_collection.find_one({
                 "message_id": message_id,
                 "dixa_message_sent": True
-            })
+            }, {"_id": 1})
             return doc is not None
         except Exception as e:
-            logger.error(f"Error checking if message was already sent: {str(e)}")
+            logger.error("Error checking if message was already sent: %s", e)
             return False
 
-    async def try_reserve_message(self, event_id: str) -> bool:
+    async def try_reserve_message(self, event_id: str, deadline: Optional[Deadline] = None,
+                                  event: Optional[Dict[str, Any]] = None) -> Optional[EventCheckpoints]:
         """
-        Attempt to reserve processing for a given event_id. Returns True if
-        reservation acquired, False if already reserved elsewhere.
-        CRITICAL: If MongoDB is unavailable, we BLOCK (return False) to prevent duplicates.
+        Attempt to lease processing of a given event_id. Returns the event's
+        checkpoints (empty for a new event, the completed stages when resuming
+        after a crashed worker) or None if another worker holds the lease.
+        CRITICAL: If MongoDB is unavailable, we BLOCK (return None) to prevent duplicates.
         """
         try:
             if not self.client:
                 logger.error("MongoDB not connected - blocking webhook to prevent duplicate sends")
-                return False
-            # Use _id for uniqueness so we don't rely on create_index permissions
-            self.idempotency_collection.insert_one({
-                "_id": event_id,
-                "event_id": event_id,
-                "reserved_at": datetime.utcnow()
-            })
-            logger.info(f"✅ Reservation acquired for event {event_id}")
-            return True
-        except DuplicateKeyError:
-            # Already reserved by another concurrent process
-            logger.warning(f"⚠️ Duplicate detected: Event {event_id} already reserved")
-            return False
+                return None
+            with _operation_timeout(deadline):
+                checkpoints = self.checkpoints.acquire(event_id, event)
+            if checkpoints is None:
+                logger.warning("⚠️ Duplicate detected: Event %s already reserved", event_id)
+                return None
+            logger.info("✅ Reservation acquired for event %s (attempt %s)", event_id, checkpoints.attempt)
+            return checkpoints
         except Exception as e:
-            logger.error(f"❌ Error reserving event idempotency token: {str(e)}")
+            logger.error("❌ Error reserving event idempotency token: %s", e)
             # Fail-closed to prevent duplicate sends when DB has issues
+            return None
+
+    async def save_checkpoint(self, checkpoints: EventCheckpoints, results: Dict[str, Any],
+                              deadline: Optional[Deadline] = None) -> bool:
+        """
+        Record completed pipeline stages ({stage: result}) on the event's idempotency record
+        Raises LeaseLost if another worker has taken the event over; any other
+        failure only costs resumability, so it is logged, False is returned and
+        processing goes on.
+        """
+        try:
+            with _operation_timeout(deadline):
+                self.checkpoints.save(checkpoints, results)
+            return True
+        except LeaseLost:
+            raise
+        except Exception as e:
+            logger.warning("⚠️  Checkpoint %s not saved for event %s: %s", ", ".join(results), checkpoints.event_id, e)
             return False
 
-    async def release_reservation(self, event_id: str) -> None:
+    async def release_reservation(self, checkpoints: EventCheckpoints, deadline: Optional[Deadline] = None) -> None:
         """
-        Release a previously acquired reservation. Safe to call even if no token
-        exists or DB is unavailable.
+        Release a previously acquired reservation, keeping its checkpoints so a
+        retry resumes where this attempt stopped. Safe to call even if the
+        lease was lost or DB is unavailable.
         """
         try:
             if not self.client:
                 return
-            self.idempotency_collection.delete_one({"_id": event_id})
+            with _operation_timeout(deadline):
+                self.checkpoints.release(checkpoints)
+        except Exception as e:
+            logger.warning("Error releasing idempotency reservation: %s", e)
+
+    async def complete_reservation(self, checkpoints: EventCheckpoints, results: Optional[Dict[str, Any]] = None,
+                                   deadline: Optional[Deadline] = None) -> None:
+        """Mark the event fully handled, with its final stage results; until then the recovery sweep may resume it"""
+        try:
+            with _operation_timeout(deadline):
+                self.checkpoints.complete(checkpoints, results)
+        except Exception as e:
+            logger.warning("Error completing idempotency reservation: %s", e)
+
+    async def enqueue_job(self, event_id: str, payload: Dict[str, Any], priority: int,
+                          traceparent: Optional[str] = None, deadline: Optional[Deadline] = None) -> dict:
+        """
+        Queue an event for the worker tier (PROCESSING_MODE=queue)
+        Returns {"success": True, "queued": False} for an event already queued.
+        """
+        try:
+            if not self.client:
+                return {"success": False, "error": "MongoDB not connected"}
+            with _operation_timeout(deadline):
+                queued = self.jobs.enqueue(event_id, payload, priority, traceparent)
+            return {"success": True, "queued": queued}
         except Exception as e:
-            logger.warning(f"Error releasing idempotency reservation: {str(e)}")
+            logger.error("❌ Error enqueueing event %s: %s", event_id, e)
+            return {"success": False, "error": str(e)}
 
-    async def has_event_been_processed(self, event_id: str) -> bool:
+    def job_stats(self) -> Optional[Dict[str, Any]]:
+        """Job queue depth, lag and dead letters, None when unavailable (blocking)"""
+        if self.jobs is None:
+            return None
+        try:
+            return self.jobs.stats()
+        except Exception as e:
+            logger.warning("⚠️  Could not read job queue stats: %s", e)
+            return None
+
+    def event_state(self, event_id: str) -> str:
+        """Checkpoint state of an event: completed, leased, stalled or unknown (blocking)"""
+        if self.checkpoints is None:
+            return "unknown"
+        return self.checkpoints.state(event_id)
+
+    def stalled_events(self, max_attempts: int) -> List[Dict[str, Any]]:
+        """Unfinished events whose worker stopped renewing the lease (blocking; run it in a worker thread)"""
+        if self.checkpoints is None:
+            return []
+        return self.checkpoints.stalled(max_attempts)
+
+    async def has_event_been_processed(self, event_id: str, deadline: Optional[Deadline] = None) -> bool:
         """
         Check if an event_id has already been processed (logged to conversations).
         Returns True if the event exists in conversations collection, regardless of
@@ -163,10 +393,14 @@ class MongoDBService:
         try:
             if not self.client:
                 return False
-            doc = self.conversations_collection.find_one({
-                "event_id": event_id
-            })
+            with _operation_timeout(deadline):
+                doc = self.conversations_collection.find_one({
+                    "event_id": event_id
+                }, {"_id": 1})
             return doc is not None
         except Exception as e:
-            logger.error(f"Error checking if event was already processed: {str(e)}")
-            return False
\ No newline at end of file
+            logger.error("Error checking if event was already processed: %s", e)
+            return False
+
+
+os.register_at_fork(after_in_child=MongoDBService._reset_after_fork)
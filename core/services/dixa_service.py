@@ -1,9 +1,21 @@
-import httpx
 import logging
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
 from config import settings
+from utils.deadline import Deadline, timeout_for
+from utils.http_pool import pooled_async_client, warm_connection
 
 logger = logging.getLogger(__name__)
 
+# httpx default; used when a call does not run under a webhook deadline
+DEFAULT_TIMEOUT_SECONDS = 5.0
+# A handoff transfer still gets this much time after the webhook budget is spent,
+# otherwise the conversation would stay with the bot agent
+TRANSFER_MIN_TIMEOUT_SECONDS = 2.0
+# Likewise the AI reply: once OpenAI has answered, dropping the send leaves the customer with nothing
+SEND_MIN_TIMEOUT_SECONDS = 2.0
+
 class DixaAPIService:
     """
     Service for interacting with Dixa API
@@ -17,17 +29,34 @@ class DixaAPIService:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """Pooled client shared by all Dixa calls"""
+        if self._http_client is None:
+            self._http_client = pooled_async_client(DEFAULT_TIMEOUT_SECONDS)
+        return self._http_client
+
+    async def warm_up(self) -> dict:
+        """Open a pooled connection to Dixa ahead of the first webhook"""
+        return await warm_connection(self.http_client, self.base_url)
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
-    async def claim_conversation(self, conversation_id: int, agent_id: str, force: bool = False) -> dict:
+    async def claim_conversation(self, conversation_id: int, agent_id: str, force: bool = False, deadline: Optional[Deadline] = None) -> dict:
         """
         Claim a conversation for an agent before sending messages
         Required to avoid EndUserNotFound errors
         """
         try:
             logger.info("🔒 DIXA SERVICE - Claiming conversation for agent")
-            logger.info(f"   Conversation ID: {conversation_id}")
-            logger.info(f"   Agent ID: {agent_id}")
-            logger.info(f"   Force claim: {force}")
+            logger.info("   Conversation ID: %s", conversation_id)
+            logger.debug("   Agent ID: %s", agent_id)
+            logger.info("   Force claim: %s", force)
             
             url = f"{self.base_url}/conversations/{conversation_id}/claim"
             payload = {
@@ -35,153 +64,193 @@ class DixaAPIService:
                 "force": force
             }
             
-            logger.info(f"   Full URL: {url}")
-            logger.info("   Making HTTP POST request...")
+            logger.debug("   Full URL: %s", url)
+            logger.debug("   Making HTTP POST request...")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=payload
-                )
+            response = await self.http_client.post(
+                url,
+                timeout=timeout_for(deadline, DEFAULT_TIMEOUT_SECONDS),
+                headers=self.headers,
+                json=payload
+            )
                 
-                logger.info(f"   ✅ HTTP Response received: {response.status_code}")
+            logger.info("   ✅ HTTP Response received: %s", response.status_code)
                 
-                if response.status_code == 200:
-                    logger.info(f"   ✅ Successfully claimed conversation {conversation_id}")
-                    return {
-                        "success": True,
-                        "status_code": response.status_code
-                    }
-                else:
-                    logger.error(f"   ❌ Claim conversation error: {response.status_code}")
-                    logger.error(f"   Response text: {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}: {response.text}",
-                        "status_code": response.status_code
-                    }
+            if response.status_code == 200:
+                logger.info("   ✅ Successfully claimed conversation %s", conversation_id)
+                return {
+                    "success": True,
+                    "status_code": response.status_code
+                }
+            else:
+                logger.error("   ❌ Claim conversation error: %s", response.status_code)
+                logger.error("   Response text: %s", response.text)
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}: {response.text}",
+                    "status_code": response.status_code
+                }
                     
         except Exception as e:
-            logger.error(f"   ❌ Exception claiming conversation: {type(e).__name__}: {str(e)}")
+            logger.error("   ❌ Exception claiming conversation: %s: %s", type(e).__name__, e)
             return {
                 "success": False,
                 "error": str(e)
             }
 
-    async def send_message(self, conversation_id: int, dixa_payload: dict) -> dict:
+    async def send_message(self, conversation_id: int, dixa_payload: dict, deadline: Optional[Deadline] = None) -> dict:
         """
         Send message to Dixa conversation
         Matches exact HTTP POST from n8n "Send Email with webhook included" node
         """
         try:
             logger.info("📤 DIXA SERVICE - Sending message to conversation")
-            logger.info(f"   Conversation ID: {conversation_id}")
-            logger.info(f"   Base URL: {self.base_url}")
-            logger.info(f"   Agent ID: {dixa_payload.get('agentId', 'Not specified')}")
-            logger.info(f"   Content Type: {dixa_payload.get('content', {}).get('contentType', 'Unknown')}")
-            logger.info(f"   Message Type: {dixa_payload.get('_type', 'Unknown')}")
+            logger.info("   Conversation ID: %s", conversation_id)
+            logger.debug("   Base URL: %s", self.base_url)
+            logger.debug("   Agent ID: %s", dixa_payload.get('agentId', 'Not specified'))
+            logger.debug("   Content Type: %s", dixa_payload.get('content', {}).get('contentType', 'Unknown'))
+            logger.debug("   Message Type: %s", dixa_payload.get('_type', 'Unknown'))
             
             url = f"{self.base_url}/conversations/{conversation_id}/messages"
-            logger.info(f"   Full URL: {url}")
+            logger.debug("   Full URL: %s", url)
             
             # Log payload structure (without full content for brevity)
-            content_preview = dixa_payload.get('content', {}).get('value', '')[:200]
-            logger.info(f"   Content preview: {content_preview}{'...' if len(content_preview) >= 200 else ''}")
-            logger.info(f"   Payload size: {len(str(dixa_payload))} chars")
+            if logger.isEnabledFor(logging.DEBUG):
+                content_preview = dixa_payload.get('content', {}).get('value', '')[:200]
+                logger.debug("   Content preview: %s%s", content_preview, '...' if len(content_preview) >= 200 else '')
+                logger.debug("   Payload size: %s chars", len(str(dixa_payload)))
             
-            logger.info("   Making HTTP POST request...")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=dixa_payload
-                )
+            logger.debug("   Making HTTP POST request...")
+            response = await self.http_client.post(
+                url,
+                timeout=timeout_for(deadline, DEFAULT_TIMEOUT_SECONDS, floor=SEND_MIN_TIMEOUT_SECONDS),
+                headers=self.headers,
+                json=dixa_payload
+            )
                 
-                logger.info(f"   ✅ HTTP Response received: {response.status_code}")
-                logger.info(f"   Response headers: {dict(response.headers)}")
+            logger.info("   ✅ HTTP Response received: %s", response.status_code)
+            logger.debug("   Response headers: %s", response.headers)
                 
-                if response.status_code == 200 or response.status_code == 201:
-                    response_data = response.json() if response.content else {}
-                    logger.info(f"   ✅ Message sent successfully to conversation {conversation_id}")
-                    logger.info(f"   Response data keys: {list(response_data.keys()) if response_data else 'Empty response'}")
-                    return {
-                        "success": True,
-                        "response": response_data,
-                        "status_code": response.status_code
-                    }
-                else:
-                    logger.error(f"   ❌ Dixa API error: {response.status_code}")
-                    logger.error(f"   Response text: {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}: {response.text}",
-                        "status_code": response.status_code
-                    }
+            if response.status_code == 200 or response.status_code == 201:
+                response_data = response.json() if response.content else {}
+                logger.info("   ✅ Message sent successfully to conversation %s", conversation_id)
+                logger.debug("   Response data keys: %s", list(response_data.keys()) if response_data else 'Empty response')
+                return {
+                    "success": True,
+                    "response": response_data,
+                    "status_code": response.status_code
+                }
+            else:
+                logger.error("   ❌ Dixa API error: %s", response.status_code)
+                logger.error("   Response text: %s", response.text)
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}: {response.text}",
+                    "status_code": response.status_code
+                }
                     
         except Exception as e:
-            logger.error(f"   ❌ Exception sending message to Dixa: {type(e).__name__}: {str(e)}")
+            logger.error("   ❌ Exception sending message to Dixa: %s: %s", type(e).__name__, e)
             return {
                 "success": False,
                 "error": str(e)
             }
     
-    async def transfer_to_queue(self, conversation_id: int, user_id: str) -> dict:
+    async def transfer_to_queue(self, conversation_id: int, user_id: str, deadline: Optional[Deadline] = None) -> dict:
         """
         Transfer conversation to queue
         Matches exact HTTP PUT from n8n "Transfer Queue" node
         """
         try:
             logger.info("🔄 DIXA SERVICE - Transferring conversation to queue")
-            logger.info(f"   Conversation ID: {conversation_id}")
-            logger.info(f"   User ID: {user_id}")
-            logger.info(f"   Queue ID: {settings.QUEUE_ID}")
-            logger.info(f"   Base URL: {self.base_url}")
+            logger.info("   Conversation ID: %s", conversation_id)
+            logger.info("   User ID: %s", user_id)
+            logger.info("   Queue ID: %s", settings.QUEUE_ID)
+            logger.debug("   Base URL: %s", self.base_url)
             
             url = f"{self.base_url}/conversations/{conversation_id}/transfer/queue"
-            logger.info(f"   Full URL: {url}")
+            logger.debug("   Full URL: %s", url)
             
             payload = {
                 "queueId": settings.QUEUE_ID,
                 "userId": user_id
             }
             
-            logger.info(f"   Transfer payload: {payload}")
-            logger.info("   Making HTTP PUT request...")
+            logger.debug("   Transfer payload: %s", payload)
+            logger.debug("   Making HTTP PUT request...")
             
-            async with httpx.AsyncClient() as client:
-                response = await client.put(
-                    url,
-                    headers=self.headers,
-                    json=payload
-                )
+            response = await self.http_client.put(
+                url,
+                timeout=timeout_for(deadline, DEFAULT_TIMEOUT_SECONDS, floor=TRANSFER_MIN_TIMEOUT_SECONDS),
+                headers=self.headers,
+                json=payload
+            )
                 
-                logger.info(f"   ✅ HTTP Response received: {response.status_code}")
-                logger.info(f"   Response headers: {dict(response.headers)}")
+            logger.info("   ✅ HTTP Response received: %s", response.status_code)
+            logger.debug("   Response headers: %s", response.headers)
 
-                if response.status_code == 204 or response.status_code == 200:
-                    # 204 No Content is the success status for transfer/queue endpoint
-                    response_data = response.json() if response.content else {}
-                    logger.info(f"   ✅ Successfully transferred conversation {conversation_id} to queue")
-                    if response_data:
-                        logger.info(f"   Response data: {response_data}")
-                    return {
-                        "success": True,
-                        "response": response_data,
-                        "status_code": response.status_code
-                    }
-                else:
-                    logger.error(f"   ❌ Queue transfer error: {response.status_code}")
-                    logger.error(f"   Response text: {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"HTTP {response.status_code}: {response.text}",
-                        "status_code": response.status_code
-                    }
+            if response.status_code == 204 or response.status_code == 200:
+                # 204 No Content is the success status for transfer/queue endpoint
+                response_data = response.json() if response.content else {}
+                logger.info("   ✅ Successfully transferred conversation %s to queue", conversation_id)
+                if response_data:
+                    logger.debug("   Response data: %s", response_data)
+                return {
+                    "success": True,
+                    "response": response_data,
+                    "status_code": response.status_code
+                }
+            else:
+                logger.error("   ❌ Queue transfer error: %s", response.status_code)
+                logger.error("   Response text: %s", response.text)
+                return {
+                    "success": False,
+                    "error": f"HTTP {response.status_code}: {response.text}",
+                    "status_code": response.status_code
+                }
                     
         except Exception as e:
-            logger.error(f"   ❌ Exception transferring to queue: {type(e).__name__}: {str(e)}")
+            logger.error("   ❌ Exception transferring to queue: %s: %s", type(e).__name__, e)
             return {
                 "success": False,
                 "error": str(e)
-            }
\ No newline at end of file
+            }
+    async def fetch_processed_content(self, content_url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """
+        Fetch the processed (HTML) body of an email message
+        Relative content URLs are resolved against DIXA_CONTENT_BASE_URL;
+        returns None when fetching is not configured or fails
+        """
+        content_url = self._resolve_content_url(content_url)
+        if content_url is None:
+            return None
+
+        try:
+            response = await self.http_client.get(content_url, headers={"Authorization": self.headers["Authorization"]}, timeout=timeout_for(deadline, DEFAULT_TIMEOUT_SECONDS))
+            if response.status_code == 200:
+                return response.text
+            logger.warning("   ⚠️  Processed content fetch failed: HTTP %s", response.status_code)
+            return None
+        except Exception as e:
+            logger.warning("   ⚠️  Exception fetching processed content: %s: %s", type(e).__name__, e)
+            return None
+
+    @staticmethod
+    def _resolve_content_url(content_url: str) -> Optional[str]:
+        """
+        Full URL for a content path from the webhook body, or None if it may not be fetched
+        The URL comes from the unauthenticated webhook and the request carries the
+        Dixa token, so absolute URLs are only accepted on DIXA_CONTENT_BASE_URL's
+        scheme and host.
+        """
+        base_url = settings.DIXA_CONTENT_BASE_URL
+        if not content_url or not base_url:
+            return None
+        url = urlsplit(content_url)
+        if not url.scheme and not url.netloc:
+            return f"{base_url.rstrip('/')}/{content_url.lstrip('/')}"
+        base = urlsplit(base_url)
+        if (url.scheme.lower(), url.netloc.lower()) != (base.scheme.lower(), base.netloc.lower()):
+            logger.warning("   ⚠️  Not fetching processed content from foreign host %s", url.netloc or "(none)")
+            return None
+        return content_url
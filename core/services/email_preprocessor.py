@@ -0,0 +1,321 @@
+import html
+import logging
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rough chars-per-token ratio for the mixed NL/EN/DE/FR/IT traffic we see.
+# Only used for reporting, so an estimate is good enough.
+CHARS_PER_TOKEN = 4
+
+# "On Thu, 4 Sep 2025 at 17:27, Sarie <x@y> wrote:" and its translations.
+# Gmail and Apple Mail often wrap this header over two lines, so the matcher
+# is applied to the current line joined with the next one.
+REPLY_HEADER_PATTERN = re.compile(
+    r"^(on|op|am|le|il)\s.{0,300}?"
+    r"(wrote|schreef|heeft .{0,80}?geschreven|schrieb|a écrit|ha scritto)\s?:\s*$",
+    re.IGNORECASE
+)
+
+# "-----Original Message-----" style separators (Outlook, Thunderbird)
+ORIGINAL_MESSAGE_PATTERN = re.compile(
+    r"^-{2,}\s*(original message|oorspronkelijk bericht|ursprüngliche nachricht|"
+    r"message d'origine|messaggio originale)\s*-{2,}$",
+    re.IGNORECASE
+)
+
+FORWARD_MARKER_PATTERN = re.compile(
+    r"^(-{2,}\s*)?(forwarded message|begin forwarded message|doorgestuurd bericht|"
+    r"begin doorgestuurd bericht|weitergeleitete nachricht|anfang der weitergeleiteten nachricht|"
+    r"message transféré|début du message réexpédié|messaggio inoltrato|"
+    r"inizio messaggio inoltrato)\s*:?\s*(-{2,})?$",
+    re.IGNORECASE
+)
+
+# Outlook-style quoted header block: "From: ..." followed by "Sent:"/"Subject:" lines
+HEADER_FROM_PATTERN = re.compile(r"^\*?(from|van|von|de|da)\s?:\*?\s", re.IGNORECASE)
+HEADER_FIELD_PATTERN = re.compile(
+    r"^\*?(from|van|von|de|da|sent|date|verzonden|datum|gesendet|envoyé|inviato|"
+    r"to|aan|an|à|a|cc|subject|onderwerp|betreff|objet|oggetto)\s?:\*?\s?",
+    re.IGNORECASE
+)
+HEADER_SUBJECT_PATTERN = re.compile(
+    r"^\*?(subject|onderwerp|betreff|objet|oggetto|sent|verzonden|gesendet|envoyé|inviato|date|datum)\s?:",
+    re.IGNORECASE
+)
+
+SIGNATURE_DELIMITER_PATTERN = re.compile(r"^(--|__+|—)\s*$")
+
+MOBILE_SIGNATURE_PATTERN = re.compile(
+    r"^(sent from my|verstuurd vanaf mijn|verzonden vanaf mijn|von meinem .{0,30} gesendet|"
+    r"gesendet von meinem|envoyé de mon|inviato da|get outlook for|outlook voor)",
+    re.IGNORECASE
+)
+
+SIGN_OFF_PATTERN = re.compile(
+    r"^(kind regards|best regards|regards|best wishes|many thanks|thanks in advance|"
+    r"met vriendelijke groet(en)?|vriendelijke groet(en)?|groet(en|jes)?|hartelijke groet(en)?|"
+    r"mit freundlichen grüßen|freundliche grüße|viele grüße|beste grüße|liebe grüße|"
+    r"cordialement|bien cordialement|bien à vous|salutations|"
+    r"cordiali saluti|distinti saluti|saluti|un saluto)[\s,.!]*$",
+    re.IGNORECASE
+)
+
+BOILERPLATE_PATTERN = re.compile(
+    r"(this (e-?mail|message) (and any attachments )?(is|are|may be) confidential|"
+    r"deze e-?mail is (uitsluitend|alleen) bestemd|"
+    r"diese e-?mail (enthält|kann) vertrauliche|"
+    r"ce message (et toutes les pièces jointes )?(est|sont) confidentiel|"
+    r"questa e-?mail (è|e') (riservata|confidenziale)|"
+    r"please consider the environment before printing|"
+    r"denk aan het milieu voordat u)",
+    re.IGNORECASE
+)
+
+# Names/short titles kept after a sign-off ("Kind regards,\nGiusy")
+MAX_SIGN_OFF_TAIL_LINES = 2
+MAX_SIGN_OFF_TAIL_CHARS = 40
+
+# Contact details that start the signature block proper: phone/fax, company and VAT numbers, links, addresses
+CONTACT_LINE_PATTERN = re.compile(
+    r"^(tel|telefoon|telefon|téléphone|telefono|phone|mobile|mobiel|mobil|mob|cell|fax|gsm)\.?\s*(:|\+|\d)|"
+    r"^[tmfew]\s*:\s*\S|"
+    r"^\+?[\d\s().\-/]{8,}$|"
+    r"\b(kvk|btw|vat|ust-?id(nr)?|siret|siren|iban|p\.?\s?iva)\b|"
+    r"https?://|www\.|[\w.+-]+@[\w-]+\.\w+",
+    re.IGNORECASE
+)
+
+# Tags whose whole subtree is quoted history or noise in Gmail/Outlook/Apple Mail HTML
+HTML_SKIP_TAGS = {"blockquote", "style", "script", "head", "title"}
+HTML_SKIP_MARKERS = ("gmail_quote", "divrplyfwdmsg", "appendonsend", "moz-cite-prefix", "yahoo_quoted")
+HTML_BLOCK_TAGS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "hr"}
+# Elements that never have an end tag (HTML living standard)
+HTML_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+                  "source", "track", "wbr"}
+
+
+class _EmailHTMLExtractor(HTMLParser):
+    """
+    Single-pass HTML to text converter that drops quoted history blocks
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        # Open elements as (tag, skip); an end tag closes everything opened after its start tag,
+        # so unclosed <p>/<li> inside a quote cannot leave the quote open or close it early
+        self._stack: List[Tuple[str, bool]] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_BLOCK_TAGS and not self._skip_depth:
+            self.parts.append("\n")
+        if tag in HTML_VOID_TAGS:
+            return
+        markers = " ".join(value or "" for name, value in attrs if name in ("class", "id")).lower()
+        skip = tag in HTML_SKIP_TAGS or any(marker in markers for marker in HTML_SKIP_MARKERS)
+        self._stack.append((tag, skip))
+        if skip:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in HTML_VOID_TAGS:
+            return
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                self._skip_depth -= sum(skip for _, skip in self._stack[index:])
+                del self._stack[index:]
+                break
+        # An end tag that was never opened is ignored
+        if tag in HTML_BLOCK_TAGS and not self._skip_depth:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+class EmailPreprocessor:
+    """
+    Extracts the new content of a customer email before it is sent to OpenAI
+    Strips quoted replies, forwarded headers, signatures and legal boilerplate
+    in NL/EN/DE/FR/IT. Every line is inspected at most twice, so the cost is
+    linear in the size of the email.
+    """
+
+    def html_to_text(self, html_content: str) -> str:
+        """Convert an HTML email body to plain text, dropping quoted blocks"""
+        parser = _EmailHTMLExtractor()
+        try:
+            parser.feed(html_content)
+            parser.close()
+        except Exception as e:
+            logger.warning("HTML email parsing failed, falling back to tag stripping: %s", e)
+            return html.unescape(re.sub(r"<[^>]+>", " ", html_content))
+        return parser.text()
+
+    def looks_like_html(self, text: Optional[str], content_type: Optional[str] = None) -> bool:
+        if not text:
+            return False
+        if content_type and "html" in content_type.lower():
+            return True
+        head = text.lstrip()[:200].lower()
+        return head.startswith("<") and ("<div" in head or "<p" in head or "<html" in head or "<body" in head)
+
+    def extract_new_content(self, text: str) -> Dict[str, Any]:
+        """
+        Strip quoted history and signatures from a plain text email
+
+        Returns:
+            Dict with the extracted text and the list of removed section kinds
+        """
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        kept: List[str] = []
+        removed: List[str] = []
+        in_forward_header = False
+        sign_off_tail = -1
+
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            stripped = line.strip()
+
+            if in_forward_header:
+                # Drop the From/Date/Subject/To block of a forwarded message
+                if not stripped or HEADER_FIELD_PATTERN.match(stripped):
+                    i += 1
+                    continue
+                in_forward_header = False
+
+            if not stripped:
+                kept.append("")
+                i += 1
+                continue
+
+            if sign_off_tail >= 0:
+                if sign_off_tail < MAX_SIGN_OFF_TAIL_LINES and len(stripped) <= MAX_SIGN_OFF_TAIL_CHARS \
+                        and not MOBILE_SIGNATURE_PATTERN.match(stripped) and not CONTACT_LINE_PATTERN.search(stripped):
+                    kept.append(line)
+                    sign_off_tail += 1
+                    i += 1
+                    continue
+                removed.append("signature")
+                break
+
+            if stripped.startswith(">"):
+                if "quoted_lines" not in removed:
+                    removed.append("quoted_lines")
+                i += 1
+                continue
+
+            if FORWARD_MARKER_PATTERN.match(stripped):
+                removed.append("forward_header")
+                in_forward_header = True
+                i += 1
+                continue
+
+            next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
+            if ORIGINAL_MESSAGE_PATTERN.match(stripped) or REPLY_HEADER_PATTERN.match(stripped) \
+                    or (next_line and REPLY_HEADER_PATTERN.match(f"{stripped} {next_line}")):
+                removed.append("quoted_reply")
+                break
+
+            if HEADER_FROM_PATTERN.match(stripped) and kept:
+                # Outlook quoted header: "From:" followed by "Sent:"/"Subject:" within a few lines
+                lookahead = lines[i + 1:i + 5]
+                if any(HEADER_SUBJECT_PATTERN.match(candidate.strip()) for candidate in lookahead):
+                    removed.append("quoted_reply")
+                    break
+
+            if SIGNATURE_DELIMITER_PATTERN.match(stripped) or MOBILE_SIGNATURE_PATTERN.match(stripped):
+                removed.append("signature")
+                break
+
+            if BOILERPLATE_PATTERN.search(stripped):
+                removed.append("boilerplate")
+                break
+
+            kept.append(line)
+            if SIGN_OFF_PATTERN.match(stripped) and len(kept) > 1:
+                sign_off_tail = 0
+            i += 1
+
+        extracted = "\n".join(kept)
+        extracted = re.sub(r"[ \t]+", " ", extracted)
+        extracted = re.sub(r"\n\s*\n+", "\n\n", extracted).strip()
+        return {"text": extracted, "removed": removed}
+
+    def preprocess(self, text: Optional[str], html_content: Optional[str] = None, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extract the new content of an email for prompting
+
+        Args:
+            text: Plain text body from the webhook (data.text)
+            html_content: Optional HTML body (inline content or fetched processed content)
+            content_type: Content type reported by Dixa for the message content
+
+        Returns:
+            Dict with the processed text, the untouched original and size statistics
+        """
+        original = text or ""
+        candidates = []
+
+        if original:
+            source_text = self.html_to_text(original) if self.looks_like_html(original, content_type) else original
+            candidates.append(("text", self.extract_new_content(source_text)))
+        if html_content:
+            candidates.append(("html", self.extract_new_content(self.html_to_text(html_content))))
+
+        # Prefer the plain text body; fall back to HTML when text produced nothing usable
+        source, result = "text", {"text": original.strip(), "removed": []}
+        for candidate_source, candidate in candidates:
+            if candidate["text"]:
+                source, result = candidate_source, candidate
+                break
+
+        processed = result["text"] or original.strip()
+        original_tokens = self.estimate_tokens(original)
+        processed_tokens = self.estimate_tokens(processed)
+        reduction_pct = round((1 - processed_tokens / original_tokens) * 100, 1) if original_tokens else 0.0
+
+        return {
+            "text": processed,
+            "original_text": original,
+            "source": source,
+            "removed": result["removed"],
+            "original_chars": len(original),
+            "processed_chars": len(processed),
+            "original_tokens_est": original_tokens,
+            "processed_tokens_est": processed_tokens,
+            "token_reduction_pct": reduction_pct
+        }
+
+    def merge_results(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine the results of several preprocessed messages (coalesced bursts)"""
+        if len(results) == 1:
+            return results[0]
+        original_tokens = sum(result["original_tokens_est"] for result in results)
+        processed_tokens = sum(result["processed_tokens_est"] for result in results)
+        return {
+            "text": "\n\n".join(result["text"] for result in results if result["text"]),
+            "original_text": "\n\n".join(result["original_text"] for result in results),
+            "source": results[0]["source"],
+            "removed": [kind for result in results for kind in result["removed"]],
+            "original_chars": sum(result["original_chars"] for result in results),
+            "processed_chars": sum(result["processed_chars"] for result in results),
+            "original_tokens_est": original_tokens,
+            "processed_tokens_est": processed_tokens,
+            "token_reduction_pct": round((1 - processed_tokens / original_tokens) * 100, 1) if original_tokens else 0.0
+        }
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        if not text:
+            return 0
+        return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
@@ -0,0 +1,260 @@
+import csv
+import io
+import logging
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+import bson
+import orjson
+from pymongo import ASCENDING, ReadPreference
+from core.services.archive_service import decompress
+from core.services.conversation_history import SKIP_CATEGORY_FIELD
+from core.services.rollup_service import SKIP_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATS = ("jsonl", "csv", "parquet")
+COMPRESSIONS = ("none", "gzip", "zstd")
+FILE_EXTENSIONS = {"jsonl": "jsonl", "csv": "csv", "parquet": "parquet"}
+COMPRESSION_EXTENSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# Columns exported by default: what prompt review needs, without the large debug fields
+DEFAULT_FIELDS = (
+    "logged_at", "conversation_id", "message_id", "event_id", "user_id", "is_initial_message",
+    "original_text", "processed_text", "ai_response", "handoff_required", "dixa_message_sent",
+    "slack_notification_sent", "skipped_reason", "time_diff_ms", "openai_usage", "deadline", "trace_id",
+)
+
+# Parquet column types; every other field is exported as a string
+PARQUET_TYPES = {
+    "logged_at": "timestamp", "conversation_id": "int", "time_diff_ms": "float", "is_initial_message": "bool",
+    "handoff_required": "bool", "dixa_message_sent": "bool", "slack_notification_sent": "bool",
+}
+
+
+class ExportError(Exception):
+    """Raised for export options that cannot be served (unknown format, missing optional package)"""
+
+
+class InvalidFilter(ValueError):
+    """Raised for a combination of conversation filters that can match nothing"""
+
+
+def build_query(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                conversation_id: Optional[int] = None, user_id: Optional[str] = None,
+                handoff: Optional[bool] = None, sent: Optional[bool] = None,
+                skipped: Optional[bool] = None, skipped_reason: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Conversation filter; skipped_reason is a rollup category (not_initial_message, coalesced, ...)
+
+    Raises:
+        InvalidFilter: for skipped=False together with a skipped_reason
+    """
+    if skipped is False and skipped_reason:
+        raise InvalidFilter("skipped=false contradicts skipped_reason; drop one of them")
+    query: Dict[str, Any] = {}
+    if start or end:
+        query["logged_at"] = {**({"$gte": start} if start else {}), **({"$lt": end} if end else {})}
+    if conversation_id is not None:
+        query["conversation_id"] = conversation_id
+    if user_id:
+        query["user_id"] = user_id
+    if handoff is not None:
+        query["handoff_required"] = True if handoff else {"$ne": True}
+    if sent is not None:
+        query["dixa_message_sent"] = True if sent else {"$ne": True}
+    # Equalities on the stored category (not ranges or regexes on skipped_reason), so the
+    # (skip_category, logged_at, _id) index serves pages in order
+    if skipped_reason:
+        # Implies skipped=true, which only widens it
+        query[SKIP_CATEGORY_FIELD] = skipped_reason
+    elif skipped is not None:
+        query[SKIP_CATEGORY_FIELD] = {"$in": list(SKIP_CATEGORIES)} if skipped else None
+    return query
+
+
+class _Compressor:
+    """Streaming gzip/zstd compression of the export chunks"""
+
+    def __init__(self, compression: str):
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ExportError("zstd compression requires the zstandard package")
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        elif compression == "none":
+            self._compressor = None
+        else:
+            raise ExportError(f"compression must be one of {', '.join(COMPRESSIONS)}")
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) if self._compressor else data
+
+    def flush(self) -> bytes:
+        return self._compressor.flush() if self._compressor else b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object collecting what the Parquet writer produces until it is drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _cell(value: Any) -> Any:
+    """Flat CSV/Parquet value: nested documents and lists become JSON text"""
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=str).decode()
+    if isinstance(value, bson.ObjectId):
+        return str(value)
+    return value
+
+
+class ConversationExportService:
+    """
+    Streams conversation logs as JSONL, CSV or Parquet
+    Reads go to a secondary when the deployment has one, through a batched
+    cursor with a projection, so at most one batch is in memory and webhook
+    traffic on the primary is left alone. export() is a generator: the next
+    batch is only fetched when the consumer asks for more bytes, which gives
+    a slow client (or disk) natural backpressure. Archived conversations are
+    read back from the archive so the export covers the whole range.
+    """
+
+    def __init__(self, conversations, archive=None):
+        self.conversations = conversations.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        self.archive = archive.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED) if archive is not None else None
+
+    @staticmethod
+    def filename(fmt: str, compression: str) -> str:
+        return f"conversations-{datetime.utcnow():%Y%m%dT%H%M%S}.{FILE_EXTENSIONS[fmt]}{COMPRESSION_EXTENSIONS[compression]}"
+
+    def _batches(self, query: Dict[str, Any], fields: Sequence[str], batch_size: int,
+                 max_docs_per_second: Optional[float]) -> Iterator[List[Dict[str, Any]]]:
+        projection = {field: 1 for field in fields}
+        projection["archived"] = 1
+        cursor = self.conversations.find(query, projection, batch_size=batch_size).sort("logged_at", ASCENDING)
+        try:
+            batch: List[Dict[str, Any]] = []
+            started = time.monotonic()
+            exported = 0
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    yield self._with_archived_bodies(batch, fields)
+                    exported += len(batch)
+                    batch = []
+                    if max_docs_per_second:
+                        # Spread a large export out instead of reading as fast as Mongo allows
+                        time.sleep(max(0.0, started + exported / max_docs_per_second - time.monotonic()))
+            if batch:
+                yield self._with_archived_bodies(batch, fields)
+        finally:
+            cursor.close()
+
+    def _with_archived_bodies(self, batch: List[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+        archived = {doc["_id"]: index for index, doc in enumerate(batch) if doc.get("archived")}
+        if archived and self.archive is not None:
+            for entry in self.archive.find({"_id": {"$in": list(archived)}}):
+                full = bson.decode(decompress(entry["codec"], entry["body"]))
+                batch[archived[entry["_id"]]] = {field: full.get(field) for field in fields}
+        return [{field: doc.get(field) for field in fields} for doc in batch]
+
+    def export(self, fmt: str, query: Dict[str, Any], fields: Sequence[str] = DEFAULT_FIELDS,
+               compression: str = "none", batch_size: int = 1000,
+               max_docs_per_second: Optional[float] = None) -> Iterator[bytes]:
+        """
+        The export as an iterator of byte chunks, one per cursor batch
+        Options are validated here, before anything is read; iterating blocks,
+        so run it off the event loop.
+        """
+        if fmt not in FORMATS:
+            raise ExportError(f"format must be one of {', '.join(FORMATS)}")
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ExportError("Parquet export requires pyarrow (pip install pyarrow)")
+        return self._stream(fmt, query, list(fields), _Compressor(compression), batch_size, max_docs_per_second)
+
+    def _stream(self, fmt: str, query: Dict[str, Any], fields: List[str], compressor: "_Compressor",
+                batch_size: int, max_docs_per_second: Optional[float]) -> Iterator[bytes]:
+        batches = self._batches(query, fields, batch_size, max_docs_per_second)
+        if fmt == "jsonl":
+            rows = self._jsonl(batches)
+        elif fmt == "csv":
+            rows = self._csv(batches, fields)
+        else:
+            rows = self._parquet(batches, fields)
+        for chunk in rows:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        tail = compressor.flush()
+        if tail:
+            yield tail
+
+    @staticmethod
+    def _jsonl(batches: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+        for batch in batches:
+            yield b"".join(orjson.dumps(doc, default=str) + b"\n" for doc in batch)
+
+    @staticmethod
+    def _csv(batches: Iterator[List[Dict[str, Any]]], fields: List[str]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields)
+        writer.writeheader()
+        for batch in batches:
+            writer.writerows({field: _cell(value) for field, value in doc.items()} for doc in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def _parquet(batches: Iterator[List[Dict[str, Any]]], fields: List[str]) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        # Nested documents are stored as JSON text so every batch has the same schema
+        types = {"timestamp": pa.timestamp("ms"), "bool": pa.bool_(), "float": pa.float64(), "int": pa.int64()}
+        schema = pa.schema([(field, types.get(PARQUET_TYPES.get(field), pa.string())) for field in fields])
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        try:
+            for batch in batches:
+                columns = {}
+                for field in schema:
+                    values = [doc.get(field.name) for doc in batch]
+                    if pa.types.is_string(field.type):
+                        values = [None if value is None else value if isinstance(value, str) else str(_cell(value))
+                                  for value in values]
+                    columns[field.name] = values
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
@@ -58,16 +58,16 @@ class MessageFormatter:
         """
         try:
             logger.info("🎨 FORMATTER SERVICE - Formatting response as plain text")
-            logger.info(f"   AI Response length: {len(ai_response)} chars")
-            logger.info(f"   AI Response preview: {ai_response[:150]}{'...' if len(ai_response) > 150 else ''}")
+            logger.debug("   AI Response length: %s chars", len(ai_response))
+            logger.debug("   AI Response preview: %.150s%s", ai_response, '...' if len(ai_response) > 150 else '')
 
             # Just use plain text - no HTML formatting
-            logger.info("   Using plain text format (no HTML)...")
+            logger.debug("   Using plain text format (no HTML)...")
             cleaned_response = self.clean_text_for_json(ai_response)
-            logger.info(f"   Cleaned response length: {len(cleaned_response)} chars")
+            logger.debug("   Cleaned response length: %s chars", len(cleaned_response))
             
             # Prepare Dixa API payload - don't include userId for outbound agent messages
-            logger.info("   Building Dixa API payload...")
+            logger.debug("   Building Dixa API payload...")
             payload = {
                 "agentId": settings.AGENT_ID,
                 "content": {
@@ -78,13 +78,14 @@ class MessageFormatter:
                 "_type": "Outbound"
             }
             
-            logger.info("   Outbound message from agent - no userId needed")
+            logger.debug("   Outbound message from agent - no userId needed")
             
-            logger.info(f"   ✅ Payload created successfully:")
-            logger.info(f"      Agent ID: {settings.AGENT_ID}")
-            logger.info(f"      Content Type: text/html")
-            logger.info(f"      Message Type: Outbound")
-            logger.info(f"      Final payload size: {len(str(payload))} chars")
+            logger.info("   ✅ Payload created successfully:")
+            logger.debug("      Agent ID: %s", settings.AGENT_ID)
+            logger.debug("      Content Type: text/html")
+            logger.debug("      Message Type: Outbound")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("      Final payload size: %s chars", len(str(payload)))
             
             return {
                 "cleaned_response": cleaned_response,
@@ -93,7 +94,7 @@ class MessageFormatter:
             }
             
         except Exception as e:
-            logger.error(f"   ❌ Error formatting response: {type(e).__name__}: {str(e)}")
+            logger.error("   ❌ Error formatting response: %s: %s", type(e).__name__, e)
             return {
                 "error": str(e),
                 "success": False
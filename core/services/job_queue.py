@@ -0,0 +1,242 @@
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Messages that go to OpenAI are leased before the ones that are only logged
+PRIORITY_AI = 10
+PRIORITY_LOG_ONLY = 0
+
+QUEUE_DEPTH = registry.gauge("dirq_job_queue_depth", "Jobs ready to be leased")
+QUEUE_IN_FLIGHT = registry.gauge("dirq_job_queue_in_flight", "Jobs leased by a worker and not yet acknowledged")
+QUEUE_DELAYED = registry.gauge("dirq_job_queue_delayed", "Failed jobs waiting out their retry backoff")
+QUEUE_LAG_SECONDS = registry.gauge("dirq_job_queue_lag_seconds", "How long the oldest ready job has been waiting")
+DEAD_LETTERS = registry.gauge("dirq_job_dead_letters", "Jobs in the dead-letter collection")
+JOBS_TOTAL = registry.counter(
+    "dirq_jobs_total",
+    "Jobs finished by a worker, by outcome (acked, retried, deferred, dead_lettered)",
+    labelnames=("outcome",)
+)
+JOB_WAIT_SECONDS = registry.histogram(
+    "dirq_job_wait_seconds",
+    "Time from enqueue to a worker's first lease",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def publish_queue_metrics(stats: Dict[str, Any]) -> None:
+    QUEUE_DEPTH.set(stats["ready"])
+    QUEUE_IN_FLIGHT.set(stats["in_flight"])
+    QUEUE_DELAYED.set(stats["delayed"])
+    QUEUE_LAG_SECONDS.set(stats["lag_seconds"])
+    DEAD_LETTERS.set(stats["dead_letters"])
+
+
+class JobQueue:
+    """
+    Durable job queue on a MongoDB collection
+    A job is leased with one findOneAndUpdate that pushes its available_at
+    past the visibility timeout, so two workers can never lease the same job
+    and a job whose worker dies becomes visible again on its own. Ready jobs
+    are leased by priority, then oldest first. The jobs of one conversation
+    all go to the worker process already running one of them, oldest first,
+    so the pipeline's per-conversation lock and the message coalescer see
+    the whole conversation; that hold is tracked in `conversation_leases`
+    and expires with the visibility timeout. A job that fails is retried
+    with exponential backoff; after max_attempts leases it is moved to the
+    dead-letter collection with its last error. Jobs are keyed by event_id,
+    so duplicate deliveries enqueue once.
+    """
+
+    def __init__(self, jobs, dead_letters, conversation_leases, visibility_timeout: float = 120,
+                 max_attempts: int = 5, retry_backoff: float = 10):
+        self.jobs = jobs
+        self.dead_letters = dead_letters
+        self.conversation_leases = conversation_leases
+        self.visibility_timeout = timedelta(seconds=visibility_timeout)
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+    def ensure_indexes(self) -> None:
+        self.jobs.create_index([("priority", DESCENDING), ("available_at", ASCENDING)])
+        self.jobs.create_index("available_at")
+        self.jobs.create_index([("conversation_id", ASCENDING), ("enqueued_at", ASCENDING)])
+        self.dead_letters.create_index("dead_lettered_at")
+        # An expired hold is free to take anyway; the TTL only keeps the collection small
+        self.conversation_leases.create_index("until", expireAfterSeconds=0)
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority: int = PRIORITY_LOG_ONLY,
+                traceparent: Optional[str] = None) -> bool:
+        """Add a job; False if a job with this id is already queued. `traceparent` links the worker's trace to the enqueuer's"""
+        now = datetime.utcnow()
+        try:
+            self.jobs.insert_one({
+                "_id": job_id,
+                "conversation_id": payload.get("conversation_id"),
+                "payload": payload,
+                "priority": priority,
+                "enqueued_at": now,
+                "available_at": now,
+                "attempts": 0,
+                "leased_by": None,
+                "traceparent": traceparent,
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def lease(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next ready job, or None when there is none
+        Jobs of conversations another worker is running are skipped; for the
+        conversation picked, its oldest ready job is leased. Jobs that have
+        used up their attempts are dead-lettered on the way.
+        """
+        busy: List[Any] = []
+        while True:
+            now = datetime.utcnow()
+            candidate = self.jobs.find_one(
+                {"available_at": {"$lte": now}, "conversation_id": {"$nin": busy}},
+                {"conversation_id": 1},
+                sort=[("priority", DESCENDING), ("available_at", ASCENDING)],
+            )
+            if candidate is None:
+                return None
+            conversation_id = candidate.get("conversation_id")
+            if conversation_id is None:
+                # Queued before jobs carried their conversation
+                query = {"_id": candidate["_id"], "available_at": {"$lte": now}}
+            elif self._hold_conversation(conversation_id, worker, now):
+                query = {"conversation_id": conversation_id, "available_at": {"$lte": now}}
+            else:
+                busy.append(conversation_id)
+                continue
+            job = self.jobs.find_one_and_update(
+                query,
+                {"$set": {"available_at": now + self.visibility_timeout, "leased_by": worker, "leased_at": now},
+                 "$inc": {"attempts": 1}},
+                sort=[("enqueued_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if job is None:
+                # Leased by another worker (or this one) in the meantime
+                if conversation_id is not None:
+                    self._release_conversation(conversation_id, worker)
+                continue
+            if job["attempts"] > self.max_attempts:
+                # Its last worker died without failing it, so the attempt was never counted against it
+                self.dead_letter(job, "Visibility timeout expired on the last attempt")
+                continue
+            if job["attempts"] == 1:
+                JOB_WAIT_SECONDS.observe((now - job["enqueued_at"]).total_seconds())
+            return job
+
+    def _hold_conversation(self, conversation_id: Any, worker: str, now: datetime) -> bool:
+        """Count one more job of the conversation against `worker`; False while another worker holds it"""
+        until = now + self.visibility_timeout
+        if self.conversation_leases.find_one_and_update(
+                {"_id": conversation_id, "worker": worker},
+                {"$inc": {"jobs": 1}, "$max": {"until": until}}) is not None:
+            return True
+        try:
+            self.conversation_leases.find_one_and_update(
+                {"_id": conversation_id, "until": {"$lte": now}},
+                {"$set": {"worker": worker, "jobs": 1, "until": until}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def _release_conversation(self, conversation_id: Any, worker: str) -> None:
+        """One job of the conversation finished on `worker`; the hold ends with its last job"""
+        self.conversation_leases.update_one({"_id": conversation_id, "worker": worker}, {"$inc": {"jobs": -1}})
+        self.conversation_leases.delete_one({"_id": conversation_id, "worker": worker, "jobs": {"$lte": 0}})
+
+    def _finished(self, job: Dict[str, Any]) -> None:
+        if job.get("conversation_id") is not None and job.get("leased_by"):
+            self._release_conversation(job["conversation_id"], job["leased_by"])
+
+    def ack(self, job: Dict[str, Any]) -> None:
+        """The job is done; it leaves the queue"""
+        self.jobs.delete_one({"_id": job["_id"], "leased_by": job["leased_by"], "attempts": job["attempts"]})
+        self._finished(job)
+        JOBS_TOTAL.labels("acked").inc()
+
+    def fail(self, job: Dict[str, Any], error: str, delay: Optional[float] = None) -> str:
+        """
+        Return a failed job to the queue after a backoff, or dead-letter it
+        once its attempts are used up. Returns "retried" or "dead_lettered".
+        """
+        if job["attempts"] >= self.max_attempts:
+            self.dead_letter(job, error)
+            return "dead_lettered"
+        if delay is None:
+            delay = self.retry_backoff * 2 ** (job["attempts"] - 1)
+        self.jobs.update_one(
+            {"_id": job["_id"], "leased_by": job["leased_by"], "attempts": job["attempts"]},
+            {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=delay), "leased_by": None,
+                      "last_error": error}},
+        )
+        self._finished(job)
+        JOBS_TOTAL.labels("retried").inc()
+        return "retried"
+
+    def defer(self, job: Dict[str, Any], delay: float, reason: str) -> None:
+        """
+        Put a job back after `delay` seconds without counting this lease as an attempt
+        For a job that could not run yet (its event is leased by another worker),
+        so waiting never moves it towards the dead letters.
+        """
+        self.jobs.update_one(
+            {"_id": job["_id"], "leased_by": job["leased_by"], "attempts": job["attempts"]},
+            {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=delay), "leased_by": None,
+                      "last_error": reason},
+             "$inc": {"attempts": -1}},
+        )
+        self._finished(job)
+        JOBS_TOTAL.labels("deferred").inc()
+
+    def dead_letter(self, job: Dict[str, Any], error: str) -> None:
+        # Written before the job is removed, so a crash in between leaves a copy in both, never in neither
+        self.dead_letters.replace_one(
+            {"_id": job["_id"]},
+            {**job, "last_error": error, "dead_lettered_at": datetime.utcnow()},
+            upsert=True,
+        )
+        self.jobs.delete_one({"_id": job["_id"], "attempts": job["attempts"]})
+        self._finished(job)
+        JOBS_TOTAL.labels("dead_lettered").inc()
+        logger.error("☠️  Job %s dead-lettered after %s attempts: %s", job["_id"], job["attempts"], error)
+
+    def requeue_dead_letters(self, job_id: Optional[str] = None, limit: int = 100) -> int:
+        """Move dead-lettered jobs back to the queue with fresh attempts; returns how many"""
+        query = {"_id": job_id} if job_id else {}
+        requeued = 0
+        for job in self.dead_letters.find(query).sort("dead_lettered_at", ASCENDING).limit(limit):
+            if self.enqueue(job["_id"], job["payload"], job.get("priority", PRIORITY_LOG_ONLY), job.get("traceparent")):
+                requeued += 1
+            self.dead_letters.delete_one({"_id": job["_id"]})
+        return requeued
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, in-flight and delayed counts, lag of the oldest ready job and dead letters"""
+        now = datetime.utcnow()
+        oldest = self.jobs.find_one({"available_at": {"$lte": now}}, {"available_at": 1}, sort=[("available_at", ASCENDING)])
+        return {
+            "ready": self.jobs.count_documents({"available_at": {"$lte": now}}),
+            "in_flight": self.jobs.count_documents({"available_at": {"$gt": now}, "leased_by": {"$ne": None}}),
+            "delayed": self.jobs.count_documents({"available_at": {"$gt": now}, "leased_by": None}),
+            "lag_seconds": round((now - oldest["available_at"]).total_seconds(), 3) if oldest else 0.0,
+            "dead_letters": self.dead_letters.estimated_document_count(),
+        }
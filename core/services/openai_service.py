@@ -1,31 +1,92 @@
 import logging
 import json
-from openai import AsyncOpenAI
+import time
+from typing import Optional
 from config import settings
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.http_pool import warm_connection
+from utils.tracing import TracingTransport
+from core.services.openai_usage import MODEL_PRICING, extract_usage, parse_pricing_overrides
 
 logger = logging.getLogger(__name__)
 
+# Shaped like a real reply so parsing it builds the same models a webhook needs
+WARMUP_RESPONSE = {
+    "id": "resp_warmup",
+    "object": "response",
+    "created_at": 0,
+    "status": "completed",
+    "model": "warmup",
+    "output": [{
+        "type": "message",
+        "id": "msg_warmup",
+        "status": "completed",
+        "role": "assistant",
+        "content": [{"type": "output_text", "text": "", "annotations": []}],
+    }],
+    "usage": {
+        "input_tokens": 0,
+        "input_tokens_details": {"cached_tokens": 0},
+        "output_tokens": 0,
+        "output_tokens_details": {"reasoning_tokens": 0},
+        "total_tokens": 0,
+    },
+}
+
 class OpenAIService:
     def __init__(self):
+        # The SDK takes about a second to import; importing it here instead of at
+        # module level lets the server bind its port before the SDK is loaded
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        self.http_client = DefaultAsyncHttpxClient(transport=TracingTransport())
         self.client = AsyncOpenAI(
             api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL or None,
+            http_client=self.http_client
         )
         self.prompt_id = settings.OPENAI_PROMPT_ID
+        self.prompt_version = settings.OPENAI_PROMPT_VERSION
+        self.pricing = {**MODEL_PRICING, **parse_pricing_overrides(settings.OPENAI_PRICING)}
+
+    def load_resources(self) -> None:
+        """
+        Do the SDK's lazy first-call work up front (blocking; run it in a thread)
+        The Responses API modules are imported on first access and the pydantic
+        models of a response are built the first time one is parsed, which
+        otherwise stalls the event loop for a few hundred ms on the first webhook.
+        """
+        from openai.types.responses import Response
+
+        self.client.responses
+        Response.construct(**WARMUP_RESPONSE)
+
+    async def warm_up(self) -> dict:
+        """Open a pooled connection to the OpenAI API ahead of the first webhook"""
+        return await warm_connection(self.http_client, str(self.client.base_url))
+
+    async def close(self) -> None:
+        await self.client.close()
     
-    async def process_message(self, user_text: str, customer_name: str = None, conversation_id: int = None, user_context: str = None) -> dict:
+    async def process_message(self, user_text: str, customer_name: str = None, conversation_id: int = None, user_context: str = None, deadline: Optional[Deadline] = None) -> dict:
         """
         Process user message using OpenAI Prompts API
         Uses prompt templates with email, customer_first_name, and user_context variables
         Note: conversation_id parameter accepted but not used (prompt doesn't support it)
+        Under a deadline the call gets the remaining budget as timeout and no SDK
+        retries, so it can never outlive the webhook budget.
+        The result carries a "usage" record (tokens, model, prompt version, wall
+        time, estimated cost) for accounting, also on failure.
         """
+        started = time.perf_counter()
         try:
             logger.info("🤖 OPENAI SERVICE - Starting message processing with prompts")
-            logger.info(f"   Prompt ID: {self.prompt_id}")
-            logger.info(f"   Customer Name: {customer_name}")
-            logger.info(f"   Conversation ID: {conversation_id}")
-            logger.info(f"   Has User Context: {bool(user_context)}")
-            logger.info(f"   Input text length: {len(user_text)} chars")
-            logger.info(f"   Input preview: {user_text[:100]}{'...' if len(user_text) > 100 else ''}")
+            logger.info("   Prompt ID: %s (version %s)", self.prompt_id, self.prompt_version)
+            logger.info("   Customer Name: %s", customer_name)
+            logger.info("   Conversation ID: %s", conversation_id)
+            logger.info("   Has User Context: %s", bool(user_context))
+            logger.debug("   Input text length: %s chars", len(user_text))
+            logger.debug("   Input preview: %.100s%s", user_text, '...' if len(user_text) > 100 else '')
 
             # Prepare prompt variables
             prompt_variables = {
@@ -35,30 +96,36 @@ class OpenAIService:
             # Add customer name if available
             if customer_name:
                 prompt_variables["customer_first_name"] = customer_name
-                logger.info(f"   Added customer_first_name variable: {customer_name}")
+                logger.debug("   Added customer_first_name variable: %s", customer_name)
 
             # Add user context if available (only if prompt supports it)
             # NOTE: If you get "Missing prompt variables: user_context" error,
             # you need to add user_context as a variable in your OpenAI prompt first
             if user_context:
                 prompt_variables["user_context"] = user_context
-                logger.info(f"   Added user_context variable ({len(user_context)} chars)")
+                logger.debug("   Added user_context variable (%s chars)", len(user_context))
             else:
-                logger.info(f"   No user_context provided - prompt must handle missing user_context gracefully")
+                logger.info("   No user_context provided - prompt must handle missing user_context gracefully")
 
-            logger.info(f"   Prompt variables: {list(prompt_variables.keys())}")
+            logger.debug("   Prompt variables: %s", list(prompt_variables.keys()))
 
             # Call OpenAI Prompts API
-            logger.info("   Calling OpenAI Prompts API...")
-            response = await self.client.responses.create(
+            logger.debug("   Calling OpenAI Prompts API...")
+            client = self.client
+            if deadline is not None:
+                client = self.client.with_options(timeout=deadline.timeout(), max_retries=0)
+            response = await client.responses.create(
                 prompt={
                     "id": self.prompt_id,
-                    "version": "12",
+                    "version": self.prompt_version,
                     "variables": prompt_variables
                 }
             )
             
-            logger.info("   ✅ OpenAI Prompts response received")
+            usage = extract_usage(response, self.prompt_id, self.prompt_version,
+                                  time.perf_counter() - started, self.pricing)
+            logger.info("   ✅ OpenAI Prompts response received (%s, %s in / %s out tokens, %sms)",
+                        usage["model"], usage["input_tokens"], usage["output_tokens"], usage["wall_ms"])
             
             # Extract response content (prefer the new Responses API output_text)
             ai_response = None
@@ -71,7 +138,8 @@ class OpenAIService:
                 logger.error("   ❌ No content in OpenAI response")
                 return {
                     "email": "Error: No response content received from OpenAI",
-                    "handoff": False
+                    "handoff": False,
+                    "usage": usage
                 }
 
             # Try to parse JSON response
@@ -83,37 +151,42 @@ class OpenAIService:
                 if isinstance(parsed, dict):
                     # Extract email field
                     if "email" in parsed:
-                        logger.info("   Detected JSON response with 'email' field")
+                        logger.debug("   Detected JSON response with 'email' field")
                         email_content = parsed["email"]
 
                     # Check for handoff flag
                     if "handoff" in parsed:
                         handoff_required = parsed["handoff"]
-                        logger.info(f"   Handoff flag detected: {handoff_required}")
+                        logger.info("   Handoff flag detected: %s", handoff_required)
                     else:
                         # Fallback: detect handoff from email content
                         handoff_required = self._detect_handoff_in_content(email_content)
-                        logger.info(f"   Handoff detected from content: {handoff_required}")
+                        logger.info("   Handoff detected from content: %s", handoff_required)
             except json.JSONDecodeError:
                 # Not JSON; keep the raw text and detect handoff from content
-                logger.info("   Response is not JSON, using raw text")
+                logger.debug("   Response is not JSON, using raw text")
                 handoff_required = self._detect_handoff_in_content(email_content)
-                logger.info(f"   Handoff detected from content: {handoff_required}")
+                logger.info("   Handoff detected from content: %s", handoff_required)
 
-            logger.info(f"   Response length: {len(email_content)} chars")
-            logger.info(f"   Response preview: {email_content[:200]}{'...' if len(email_content) > 200 else ''}")
+            logger.debug("   Response length: %s chars", len(email_content))
+            logger.debug("   Response preview: %.200s%s", email_content, '...' if len(email_content) > 200 else '')
 
             return {
                 "email": email_content,
-                "handoff": handoff_required
+                "handoff": handoff_required,
+                "usage": usage
             }
             
         except Exception as e:
-            logger.error(f"   ❌ OpenAI Prompts API error: {type(e).__name__}: {str(e)}")
-            return {
+            logger.error("   ❌ OpenAI Prompts API error: %s: %s", type(e).__name__, e)
+            result = {
                 "email": f"Error: {str(e)}",
-                "handoff": False
+                "handoff": False,
+                "usage": extract_usage(None, self.prompt_id, self.prompt_version, time.perf_counter() - started)
             }
+            if deadline is not None and (isinstance(e, DeadlineExceeded) or deadline.expired):
+                result["deadline_exceeded"] = True
+            return result
 
     def _detect_handoff_in_content(self, email_content: str) -> bool:
         """
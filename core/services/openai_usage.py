@@ -0,0 +1,176 @@
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional, Tuple
+from utils.metrics import registry
+
+OPENAI_TOKENS_TOTAL = registry.counter(
+    "dirq_openai_tokens_total",
+    "OpenAI tokens used, by prompt version and kind (input, cached_input, output, reasoning)",
+    labelnames=("prompt_version", "kind")
+)
+OPENAI_COST_USD_TOTAL = registry.counter(
+    "dirq_openai_cost_usd_total",
+    "Estimated OpenAI spend in USD, by model",
+    labelnames=("model",)
+)
+OPENAI_CALL_SECONDS = registry.histogram(
+    "dirq_openai_call_seconds",
+    "Wall time of OpenAI calls, by prompt version",
+    labelnames=("prompt_version",)
+)
+
+# USD per 1M tokens: (input, cached input, output). Matched on the longest model-name prefix,
+# so dated snapshots like "gpt-4o-2024-08-06" use their family price.
+MODEL_PRICING: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "o4-mini": (1.10, 0.275, 4.40),
+    "gpt-5": (1.25, 0.125, 10.00),
+    "gpt-5-mini": (0.25, 0.025, 2.00),
+    "gpt-5-nano": (0.05, 0.005, 0.40),
+}
+
+
+def parse_pricing_overrides(spec: str) -> Dict[str, Tuple[float, float, float]]:
+    """Parse "model:input:cached:output;model:..." (USD per 1M tokens), skipping malformed entries"""
+    pricing = {}
+    for item in spec.split(";"):
+        parts = item.strip().split(":")
+        if len(parts) != 4:
+            continue
+        try:
+            pricing[parts[0]] = (float(parts[1]), float(parts[2]), float(parts[3]))
+        except ValueError:
+            continue
+    return pricing
+
+
+def _price_for(model: Optional[str], pricing: Dict[str, Tuple[float, float, float]]) -> Optional[Tuple[float, float, float]]:
+    if not model:
+        return None
+    matches = [name for name in pricing if model == name or model.startswith(name + "-")]
+    return pricing[max(matches, key=len)] if matches else None
+
+
+def extract_usage(response: Any, prompt_id: str, prompt_version: str, wall_seconds: float,
+                  pricing: Optional[Dict[str, Tuple[float, float, float]]] = None) -> Dict[str, Any]:
+    """
+    Build the usage record for one Responses API call
+    Cached input tokens are a subset of input tokens and reasoning tokens a
+    subset of output tokens, so cost is computed on the uncached remainder.
+    """
+    usage = getattr(response, "usage", None)
+    input_details = getattr(usage, "input_tokens_details", None)
+    output_details = getattr(usage, "output_tokens_details", None)
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    cached_tokens = getattr(input_details, "cached_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    reasoning_tokens = getattr(output_details, "reasoning_tokens", 0) or 0
+    model = getattr(response, "model", None)
+
+    cost = None
+    price = _price_for(model, pricing if pricing is not None else MODEL_PRICING)
+    if price is not None:
+        cost = round(
+            ((input_tokens - cached_tokens) * price[0] + cached_tokens * price[1] + output_tokens * price[2]) / 1_000_000,
+            6
+        )
+
+    return {
+        "model": model,
+        "prompt_id": prompt_id,
+        "prompt_version": prompt_version,
+        "response_id": getattr(response, "id", None),
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached_tokens,
+        "output_tokens": output_tokens,
+        "reasoning_tokens": reasoning_tokens,
+        "total_tokens": getattr(usage, "total_tokens", input_tokens + output_tokens) or 0,
+        "wall_ms": round(wall_seconds * 1000, 1),
+        "cost_usd": cost,
+    }
+
+
+def _percentile(sorted_values, quantile: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * quantile))]
+
+
+class OpenAIUsageTracker:
+    """
+    In-memory rolling aggregates of OpenAI usage per prompt version
+    Keeps the most recent calls per prompt version (for latency and token
+    percentiles) and daily totals for cost; both are bounded so memory stays
+    flat however long the process runs.
+    """
+
+    def __init__(self, window: int = 1000, days: int = 30):
+        self.window = window
+        self.days = days
+        self._recent: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._daily: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, usage: Dict[str, Any], error: bool = False) -> None:
+        version_key = f"{usage.get('prompt_id')}@{usage.get('prompt_version')}"
+        self._recent.setdefault(version_key, deque(maxlen=self.window)).append({**usage, "error": error})
+
+        day = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        totals = self._daily.get(day)
+        if totals is None:
+            totals = self._daily[day] = {"calls": 0, "errors": 0, "input_tokens": 0, "cached_input_tokens": 0,
+                                         "output_tokens": 0, "reasoning_tokens": 0, "cost_usd": 0.0,
+                                         "unpriced_calls": 0}
+            for stale in sorted(self._daily)[:-self.days]:
+                del self._daily[stale]
+        totals["calls"] += 1
+        totals["errors"] += int(error)
+        for key in ("input_tokens", "cached_input_tokens", "output_tokens", "reasoning_tokens"):
+            totals[key] += usage.get(key, 0)
+        if usage.get("cost_usd") is not None:
+            totals["cost_usd"] = round(totals["cost_usd"] + usage["cost_usd"], 6)
+        elif not error:
+            totals["unpriced_calls"] += 1
+
+        prompt_version = str(usage.get("prompt_version"))
+        OPENAI_CALL_SECONDS.labels(prompt_version).observe(usage.get("wall_ms", 0) / 1000)
+        for kind in ("input", "cached_input", "output", "reasoning"):
+            OPENAI_TOKENS_TOTAL.labels(prompt_version, kind).inc(usage.get(f"{kind}_tokens", 0))
+        if usage.get("cost_usd"):
+            OPENAI_COST_USD_TOTAL.labels(usage.get("model") or "unknown").inc(usage["cost_usd"])
+
+    def summary(self) -> Dict[str, Any]:
+        """Per prompt version percentiles over the recent window, plus daily totals"""
+        versions = {}
+        for version_key, calls in self._recent.items():
+            succeeded = [call for call in calls if not call["error"]]
+            latencies = sorted(call["wall_ms"] for call in calls)
+            input_tokens = sorted(call["input_tokens"] for call in succeeded)
+            output_tokens = sorted(call["output_tokens"] for call in succeeded)
+            costs = [call["cost_usd"] for call in succeeded if call["cost_usd"] is not None]
+            cached = sum(call["cached_input_tokens"] for call in succeeded)
+            versions[version_key] = {
+                "calls": len(calls),
+                "errors": len(calls) - len(succeeded),
+                "models": sorted({call["model"] for call in succeeded if call["model"]}),
+                "latency_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95)},
+                "input_tokens_per_message": {
+                    "mean": round(sum(input_tokens) / len(input_tokens), 1) if input_tokens else None,
+                    "p50": _percentile(input_tokens, 0.5),
+                    "p95": _percentile(input_tokens, 0.95),
+                },
+                "output_tokens_per_message": {
+                    "mean": round(sum(output_tokens) / len(output_tokens), 1) if output_tokens else None,
+                    "p95": _percentile(output_tokens, 0.95),
+                },
+                "cache_hit_ratio": round(cached / sum(input_tokens), 3) if input_tokens and sum(input_tokens) else None,
+                "cost_per_message_usd": round(sum(costs) / len(costs), 6) if costs else None,
+            }
+        return {
+            "window_per_version": self.window,
+            "prompt_versions": versions,
+            "daily": dict(sorted(self._daily.items(), reverse=True)),
+        }
@@ -0,0 +1,249 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import ASCENDING, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Bucket sizes, and how long each is kept (None: forever) via the TTL index on expire_at
+GRANULARITIES = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+RETENTION = {"minute": timedelta(days=7), "hour": timedelta(days=400), "day": None}
+# A query returns at most this many buckets; use a coarser granularity for longer ranges
+MAX_QUERY_BUCKETS = 2000
+
+# Every conversation field rollup_increments() reads; archived stubs keep them so rebuild() still counts them
+ROLLUP_FIELDS = ("logged_at", "coalesced_into", "skipped_reason", "handoff_required", "dixa_message_sent",
+                 "is_initial_message", "slack_notification_sent", "openai_failed", "deadline", "openai_usage")
+
+# Upper bounds (ms) of the webhook latency histogram buckets; counts are per bucket, not cumulative
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000)
+
+# Skipped reasons are free text (some include the email); rollups count them by category
+SKIP_REASON_CATEGORIES = (
+    ("Coalesced into", "coalesced"),
+    ("Not an initial message", "not_initial_message"),
+    ("Domain validation failed: Invalid email", "invalid_email"),
+    ("Domain validation failed", "domain_not_allowed"),
+)
+# Every category skip_reason_key() can return
+SKIP_CATEGORIES = tuple(key for _, key in SKIP_REASON_CATEGORIES) + ("other",)
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    """logged_at is stored as naive UTC; aware datetimes are converted to match"""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    """Start of the UTC bucket containing `moment`"""
+    moment = _naive_utc(moment)
+    if granularity == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def skip_reason_key(reason: str) -> str:
+    for prefix, key in SKIP_REASON_CATEGORIES:
+        if reason.startswith(prefix):
+            return key
+    return "other"
+
+
+def latency_bucket_key(elapsed_ms: float) -> str:
+    for bound in LATENCY_BUCKETS_MS:
+        if elapsed_ms <= bound:
+            return f"le_{bound}"
+    return "le_inf"
+
+
+def conversation_outcome(doc: Dict[str, Any]) -> str:
+    """Final status of a logged conversation: coalesced, skipped, handoff, sent or send_failed"""
+    if doc.get("coalesced_into"):
+        return "coalesced"
+    if doc.get("skipped_reason"):
+        return "skipped"
+    if doc.get("handoff_required"):
+        return "handoff"
+    return "sent" if doc.get("dixa_message_sent") else "send_failed"
+
+
+def openai_failed(doc: Dict[str, Any]) -> bool:
+    """Whether the OpenAI call of a processed conversation failed"""
+    if "openai_failed" in doc:
+        return bool(doc["openai_failed"])
+    # Logged before the flag existed: failures were stored as the "Error: ..." reply
+    return isinstance(doc.get("ai_response"), str) and doc["ai_response"].startswith("Error:")
+
+
+def rollup_increments(doc: Dict[str, Any]) -> Dict[str, float]:
+    """The $inc fields one logged conversation adds to each of its buckets"""
+    outcome = conversation_outcome(doc)
+    increments: Dict[str, float] = {"total": 1, f"status.{outcome}": 1}
+    if doc.get("skipped_reason"):
+        increments[f"skipped_reason.{skip_reason_key(doc['skipped_reason'])}"] = 1
+    else:
+        if doc.get("is_initial_message"):
+            increments["initial_messages"] = 1
+        if doc.get("handoff_required"):
+            increments["handoff"] = 1
+        if openai_failed(doc):
+            increments["failures.openai"] = 1
+        if outcome == "send_failed":
+            increments["failures.dixa_send"] = 1
+        if doc.get("slack_notification_sent") is False:
+            increments["failures.slack"] = 1
+    deadline = doc.get("deadline") or {}
+    if deadline.get("exceeded"):
+        increments["failures.deadline_exceeded"] = 1
+    if deadline.get("elapsed_ms") is not None:
+        increments[f"latency_ms.{latency_bucket_key(deadline['elapsed_ms'])}"] = 1
+        increments["latency_ms.sum"] = deadline["elapsed_ms"]
+        increments["latency_ms.count"] = 1
+    usage = doc.get("openai_usage")
+    if usage:
+        increments["openai.calls"] = 1
+        for field in ("input_tokens", "cached_input_tokens", "output_tokens"):
+            increments[f"openai.{field}"] = usage.get(field) or 0
+        if usage.get("cost_usd") is not None:
+            increments["openai.cost_usd"] = usage["cost_usd"]
+    return increments
+
+
+def _add_into(total: Dict[str, Any], values: Dict[str, Any]) -> None:
+    for key, value in values.items():
+        if isinstance(value, dict):
+            _add_into(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def latency_quantile(histogram: Dict[str, float], quantile: float) -> Optional[float]:
+    """Upper bound (ms) of the latency bucket holding the quantile; None above the last bound"""
+    count = histogram.get("count", 0)
+    if not count:
+        return None
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += histogram.get(f"le_{bound}", 0)
+        if seen >= quantile * count:
+            return float(bound)
+    return None
+
+
+def derived_rates(counts: Dict[str, Any]) -> Dict[str, Any]:
+    """Dashboard figures computed from one bucket's (or a range's) counters"""
+    status = counts.get("status", {})
+    failures = counts.get("failures", {})
+    answered = status.get("sent", 0) + status.get("send_failed", 0)
+    processed = answered + status.get("handoff", 0)
+    latency = counts.get("latency_ms", {})
+    return {
+        "processed": processed,
+        "handoff_rate": _ratio(counts.get("handoff", 0), processed),
+        "dixa_send_failure_rate": _ratio(failures.get("dixa_send", 0), answered),
+        "openai_failure_rate": _ratio(failures.get("openai", 0), processed),
+        "skip_rate": _ratio(status.get("skipped", 0), counts.get("total", 0)),
+        "latency_avg_ms": _ratio(latency.get("sum", 0), latency.get("count", 0)),
+        "latency_p50_ms": latency_quantile(latency, 0.5),
+        "latency_p95_ms": latency_quantile(latency, 0.95),
+    }
+
+
+class ConversationRollupService:
+    """
+    Time-bucketed counters of logged conversations (per minute, hour and day)
+    Every logged conversation adds to its three buckets with $inc upserts, so
+    dashboard questions ("handoff rate today", "send failures per hour") read a
+    handful of small documents instead of scanning `conversations`.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("granularity", ASCENDING), ("bucket_start", ASCENDING)], unique=True)
+        self.collection.create_index("expire_at", expireAfterSeconds=0)
+
+    def _updates(self, docs: Iterable[Dict[str, Any]]) -> List[UpdateOne]:
+        """One $inc upsert per touched bucket, with the increments of all docs in it summed"""
+        merged: Dict[Tuple[str, datetime], Dict[str, float]] = {}
+        for doc in docs:
+            logged_at = doc.get("logged_at") or datetime.utcnow()
+            increments = rollup_increments(doc)
+            for granularity in GRANULARITIES:
+                bucket = merged.setdefault((granularity, bucket_start(logged_at, granularity)), {})
+                for field, amount in increments.items():
+                    bucket[field] = bucket.get(field, 0) + amount
+        updates = []
+        for (granularity, start), increments in merged.items():
+            update: Dict[str, Any] = {"$inc": increments}
+            if RETENTION[granularity] is not None:
+                update["$setOnInsert"] = {"expire_at": start + GRANULARITIES[granularity] + RETENTION[granularity]}
+            updates.append(UpdateOne({"granularity": granularity, "bucket_start": start}, update, upsert=True))
+        return updates
+
+    def record(self, doc: Dict[str, Any]) -> None:
+        """Add one logged conversation to its minute, hour and day buckets (blocking)"""
+        self.collection.bulk_write(self._updates([doc]), ordered=False)
+
+    def query(self, granularity: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Buckets of one granularity starting in [start, end), with totals and derived rates"""
+        if granularity not in GRANULARITIES:
+            return {"success": False, "error": f"granularity must be one of {', '.join(GRANULARITIES)}"}
+        start, end = bucket_start(start, granularity), _naive_utc(end)
+        if end <= start:
+            return {"success": False, "error": "end must be after start"}
+        if (end - start) / GRANULARITIES[granularity] > MAX_QUERY_BUCKETS:
+            return {"success": False, "error": f"range covers more than {MAX_QUERY_BUCKETS} {granularity} buckets"}
+
+        cursor = self.collection.find(
+            {"granularity": granularity, "bucket_start": {"$gte": start, "$lt": end}},
+            {"_id": 0, "granularity": 0, "expire_at": 0}
+        ).sort("bucket_start", ASCENDING)
+        buckets, totals = [], {}
+        for bucket in cursor:
+            _add_into(totals, bucket)
+            bucket["rates"] = derived_rates(bucket)
+            buckets.append(bucket)
+        totals["rates"] = derived_rates(totals)
+        return {
+            "success": True,
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "buckets": buckets,
+            "totals": totals,
+        }
+
+    def rebuild(self, conversations, start: datetime, end: datetime, batch_size: int = 500) -> Dict[str, Any]:
+        """
+        Recompute the buckets covering [start, end) from `conversations`
+        A one-off scan for backfilling history or repairing counts: the day
+        buckets touching the range are dropped and rebuilt from whole days.
+        """
+        start = bucket_start(start, "day")
+        end = bucket_start(_naive_utc(end) - timedelta(microseconds=1), "day") + GRANULARITIES["day"]
+        self.collection.delete_many({"bucket_start": {"$gte": start, "$lt": end}})
+        processed = 0
+        batch: List[Dict[str, Any]] = []
+        cursor = conversations.find({"logged_at": {"$gte": start, "$lt": end}},
+                                    {"original_text": 0, "coalesced_text": 0, "processed_text": 0})
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                self.collection.bulk_write(self._updates(batch), ordered=False)
+                processed += len(batch)
+                batch = []
+        if batch:
+            self.collection.bulk_write(self._updates(batch), ordered=False)
+            processed += len(batch)
+        logger.info("📊 Rebuilt rollups for %s conversations between %s and %s", processed, start, end)
+        return {"success": True, "conversations": processed, "start": start, "end": end}
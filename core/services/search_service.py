@@ -0,0 +1,177 @@
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from pymongo import ASCENDING, TEXT, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_NAME = "conversation_text"
+# Field on each conversation naming the stemming language of its text (MongoDB's language_override)
+LANGUAGE_FIELD = "search_language"
+# Customer text outranks the AI's answer for the same word
+TEXT_WEIGHTS = {"original_text": 2, "ai_response": 1}
+SEARCH_FIELDS = {"all": tuple(TEXT_WEIGHTS), "customer": ("original_text",), "ai": ("ai_response",)}
+RESULT_FIELDS = (
+    "logged_at", "conversation_id", "message_id", "user_id", "handoff_required",
+    "dixa_message_sent", "skipped_reason", LANGUAGE_FIELD,
+)
+MAX_PAGE_SIZE = 100
+# Relevance ranking scores every match, so deep offsets buy nothing; refine the query instead
+MAX_RESULTS = 1000
+SNIPPET_CHARS = 160
+
+# Languages MongoDB can stem that customers write in; "none" indexes words as written
+LANGUAGES = ("dutch", "english", "german", "french", "none")
+STOPWORDS = {
+    "dutch": {"de", "het", "een", "en", "ik", "je", "niet", "is", "van", "dat", "wat", "op", "mijn", "voor",
+              "met", "zijn", "maar", "nog", "wel", "graag", "bestelling", "hoe", "kan", "u", "jullie"},
+    "english": {"the", "a", "and", "i", "you", "not", "is", "of", "that", "what", "on", "my", "for", "with",
+                "have", "but", "can", "please", "order", "how", "it", "was", "to", "your", "would"},
+    "german": {"der", "die", "das", "und", "ich", "nicht", "ist", "von", "mit", "mein", "meine", "für", "auf",
+               "aber", "noch", "bitte", "bestellung", "wie", "kann", "sie", "ein", "eine", "wir", "haben"},
+    "french": {"le", "la", "les", "et", "je", "ne", "pas", "est", "de", "du", "que", "mon", "ma", "pour",
+               "avec", "mais", "vous", "commande", "comment", "une", "un", "merci", "nous", "bonjour"},
+}
+# A message has to show at least this many stopwords of one language to be stemmed as it
+MIN_STOPWORD_HITS = 2
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def detect_language(*texts: Optional[str], default: str = "none") -> str:
+    """
+    Best-guess stemming language from stopword counts
+    Cheap enough to run on every logged message; short or mixed text falls
+    back to `default`, which still indexes every word, just unstemmed.
+    """
+    words = [word for text in texts if text for word in _WORD.findall(text.lower())]
+    if not words:
+        return default
+    hits = {language: sum(word in stopwords for word in words) for language, stopwords in STOPWORDS.items()}
+    language, count = max(hits.items(), key=lambda item: item[1])
+    if count < MIN_STOPWORD_HITS or list(hits.values()).count(count) > 1:
+        return default
+    return language
+
+
+def _terms(query: str) -> List[str]:
+    """Words and quoted phrases of a $text query, without negated terms"""
+    phrases = re.findall(r'"([^"]+)"', query)
+    words = [word for word in re.sub(r'"[^"]*"', " ", query).split() if not word.startswith("-")]
+    return [term.lower() for term in phrases + words if term.strip()]
+
+
+def snippet(text: Optional[str], terms: Iterable[str], width: int = SNIPPET_CHARS) -> Optional[str]:
+    """The stretch of `text` around the first query term, or its start when no term appears verbatim"""
+    if not text:
+        return None
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(term) for term in terms) if position >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    fragment = text[start:start + width].strip()
+    return ("…" if start else "") + fragment + ("…" if start + width < len(text) else "")
+
+
+class ConversationSearchService:
+    """
+    Full-text search over customer messages and AI responses
+    Backed by one MongoDB text index on original_text and ai_response. Each
+    conversation names its stemming language in `search_language`, set when
+    it is logged, so Dutch, English, German and French messages are stemmed
+    by their own rules in the same index. Filters run against the documents
+    the index matched, and results are ranked by text score.
+    """
+
+    def __init__(self, collection, default_language: str = "dutch", max_time_ms: int = 2000):
+        if default_language not in LANGUAGES:
+            logger.warning("⚠️  Unknown search language %r, indexing unstemmed", default_language)
+            default_language = "none"
+        self.collection = collection
+        self.default_language = default_language
+        self.max_time_ms = max_time_ms
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index(
+            [(field, TEXT) for field in TEXT_WEIGHTS],
+            name=TEXT_INDEX_NAME,
+            weights=TEXT_WEIGHTS,
+            default_language=self.default_language,
+            language_override=LANGUAGE_FIELD,
+        )
+
+    def annotate(self, conversation_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Set the stemming language of a conversation about to be logged"""
+        conversation_data[LANGUAGE_FIELD] = detect_language(
+            conversation_data.get("original_text"), conversation_data.get("ai_response"),
+            default=self.default_language,
+        )
+        return conversation_data
+
+    def search(self, text: str, filters: Optional[Dict[str, Any]] = None, field: str = "all",
+               language: Optional[str] = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """
+        One page of matches, best first (blocking; run it in a worker thread)
+        `text` uses MongoDB $text syntax: words match any stemmed form,
+        "quoted phrases" must appear as written, -word excludes. `field`
+        narrows matches to the customer's message or the AI response.
+        """
+        if not text or not text.strip():
+            return {"success": False, "error": "Search text is required"}
+        if field not in SEARCH_FIELDS:
+            return {"success": False, "error": f"field must be one of {', '.join(SEARCH_FIELDS)}"}
+        language = language or self.default_language
+        if language not in LANGUAGES:
+            return {"success": False, "error": f"language must be one of {', '.join(LANGUAGES)}"}
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        if offset + limit > MAX_RESULTS:
+            return {"success": False, "error": f"Only the first {MAX_RESULTS} matches can be paged; narrow the search"}
+
+        terms = _terms(text)
+        query: Dict[str, Any] = {"$text": {"$search": text, "$language": language}, **(filters or {})}
+        if field != "all" and terms:
+            # The text index covers both fields; keep the documents where a term is in the one asked for
+            query[SEARCH_FIELDS[field][0]] = {"$regex": "|".join(re.escape(term) for term in terms), "$options": "i"}
+        projection = {name: 1 for name in RESULT_FIELDS + tuple(TEXT_WEIGHTS)}
+        projection["score"] = {"$meta": "textScore"}
+
+        cursor = (
+            self.collection.find(query, projection)
+            .sort([("score", {"$meta": "textScore"}), ("_id", ASCENDING)])
+            .skip(offset)
+            .limit(limit + 1)
+            .max_time_ms(self.max_time_ms)
+        )
+        docs = list(cursor)
+        has_more = len(docs) > limit
+        results = []
+        for doc in docs[:limit]:
+            result = {name: doc.get(name) for name in RESULT_FIELDS}
+            result["_id"] = str(doc["_id"])
+            result["score"] = round(doc["score"], 4)
+            for name in TEXT_WEIGHTS:
+                result[name] = snippet(doc.get(name), terms)
+            results.append(result)
+        return {
+            "success": True,
+            "query": text,
+            "language": language,
+            "results": results,
+            "count": len(results),
+            "offset": offset,
+            "next_offset": offset + limit if has_more and offset + limit < MAX_RESULTS else None,
+        }
+
+    def backfill_languages(self, batch_size: int = 1000) -> int:
+        """Detect the language of conversations logged before search existed; returns how many were set"""
+        updated = 0
+        query = {LANGUAGE_FIELD: {"$exists": False}, "archived": {"$ne": True}}
+        while True:
+            batch = list(self.collection.find(query, {"original_text": 1, "ai_response": 1}).limit(batch_size))
+            if not batch:
+                return updated
+            self.collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {LANGUAGE_FIELD: detect_language(
+                    doc.get("original_text"), doc.get("ai_response"), default=self.default_language)}})
+                for doc in batch
+            ], ordered=False)
+            updated += len(batch)
+            logger.info("🔤 Detected search language for %s conversations", updated)
@@ -1,8 +1,11 @@
+import asyncio
 import logging
 from typing import Dict, Any, Optional
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from config import settings
+from utils.deadline import Deadline, timeout_for
+from utils.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +15,7 @@ class SlackService:
     """
     
     def __init__(self):
-        self.client = WebClient(token=settings.SLACK_BOT_TOKEN)
+        self.client = WebClient(token=settings.SLACK_BOT_TOKEN, base_url=settings.SLACK_API_URL)
         self.channel_id = settings.SLACK_CHANNEL_ID
     
     async def send_notification(
@@ -21,7 +24,8 @@ class SlackService:
         user_message: str,
         ai_response: str,
         conversation_id: str,
-        additional_context: Optional[Dict[str, Any]] = None
+        additional_context: Optional[Dict[str, Any]] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Send a notification to Slack with user email and AI response
@@ -32,6 +36,7 @@ class SlackService:
             ai_response: AI-generated response
             conversation_id: Dixa conversation ID
             additional_context: Optional additional context to include
+            deadline: Optional webhook deadline bounding how long we wait for Slack
             
         Returns:
             Dict with success status and response/error
@@ -104,36 +109,41 @@ class SlackService:
                     }
                 })
             
-            logger.info(f"Sending Slack notification for conversation {conversation_id}")
+            logger.info("Sending Slack notification for conversation %s", conversation_id)
             
-            # Send message using Slack SDK
-            response = self.client.chat_postMessage(
-                channel=self.channel_id,
-                blocks=blocks,
-                text=f"AI Response for {user_email}"  # Fallback text for notifications
-            )
+            # Send message using Slack SDK (sync client, so run it off the event loop)
+            with span("slack chat.postMessage", "client", **{"server.address": "slack.com"}):
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        self.client.chat_postMessage,
+                        channel=self.channel_id,
+                        blocks=blocks,
+                        text=f"AI Response for {user_email}"  # Fallback text for notifications
+                    ),
+                    timeout=timeout_for(deadline, None)
+                )
             
             if response["ok"]:
-                logger.info(f"✅ Slack notification sent successfully for {user_email}")
+                logger.info("✅ Slack notification sent successfully for %s", user_email)
                 return {
                     "success": True,
                     "response": response
                 }
             else:
-                logger.error(f"❌ Slack API error: {response}")
+                logger.error("❌ Slack API error: %s", response)
                 return {
                     "success": False,
                     "error": f"Slack API returned error: {response}"
                 }
                     
         except SlackApiError as e:
-            logger.error(f"Slack API error: {e.response['error']}")
+            logger.error("Slack API error: %s", e.response['error'])
             return {
                 "success": False,
                 "error": f"Slack API error: {e.response['error']}"
             }
         except Exception as e:
-            logger.error(f"Error sending Slack notification: {type(e).__name__}: {str(e)}")
+            logger.error("Error sending Slack notification: %s: %s", type(e).__name__, e)
             return {
                 "success": False,
                 "error": f"Slack error: {str(e)}"
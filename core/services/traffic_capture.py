@@ -0,0 +1,227 @@
+import atexit
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import zlib
+from typing import Any, Dict, Optional
+import orjson
+from core.services.email_preprocessor import (
+    FORWARD_MARKER_PATTERN,
+    HEADER_FIELD_PATTERN,
+    MOBILE_SIGNATURE_PATTERN,
+    ORIGINAL_MESSAGE_PATTERN,
+    REPLY_HEADER_PATTERN,
+    SIGN_OFF_PATTERN,
+    SIGNATURE_DELIMITER_PATTERN,
+)
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_CAPTURED_TOTAL = registry.counter(
+    "dirq_traffic_captured_total",
+    "Webhook deliveries written to the traffic journal"
+)
+TRAFFIC_CAPTURE_DROPPED_TOTAL = registry.counter(
+    "dirq_traffic_capture_dropped_total",
+    "Webhook deliveries not journaled because the capture queue was full"
+)
+
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@([\w-]+\.)+[\w-]+")
+
+# Free-text fields: masked, keeping length, line breaks, quoting and email structure
+TEXT_KEYS = {"text", "subject", "body", "html"}
+# Person names: replaced by a stable pseudonym
+NAME_KEYS = {"name", "first_name", "last_name", "display_name", "filename"}
+# Dropped outright
+DROP_KEYS = {"phone", "phone_number"}
+# Links to Dixa content/attachments: pseudonymized and made relative, so a replay fetches them from the stubs
+URL_KEYS = {"original_content_url", "processed_content_url", "url"}
+
+# Lines the email preprocessor keys on; the matched keywords survive masking so replays strip the same quotes
+STRUCTURE_PATTERNS = (
+    REPLY_HEADER_PATTERN,
+    ORIGINAL_MESSAGE_PATTERN,
+    FORWARD_MARKER_PATTERN,
+    HEADER_FIELD_PATTERN,
+    SIGNATURE_DELIMITER_PATTERN,
+    MOBILE_SIGNATURE_PATTERN,
+    SIGN_OFF_PATTERN,
+)
+
+
+def _mask(text: str) -> str:
+    return "".join(
+        "0" if char.isdigit() else "X" if char.isupper() else "x" if char.isalpha() else char
+        for char in text
+    )
+
+
+def _keep_spans(line: str):
+    """Character spans of a line that are structural keywords rather than content"""
+    stripped = line.lstrip("> ").strip()
+    offset = line.find(stripped) if stripped else 0
+    match = REPLY_HEADER_PATTERN.match(stripped)
+    if match:
+        return [(offset + match.start(1), offset + match.end(1)), (offset + match.start(2), len(line))]
+    for pattern in STRUCTURE_PATTERNS[1:]:
+        match = pattern.match(stripped)
+        if match:
+            return [(offset + match.start(), offset + match.end())]
+    return []
+
+
+class TrafficSanitizer:
+    """
+    Removes personal data from webhook payloads while keeping their shape
+    Emails keep their domain (validation keys on it) with a keyed-hash local
+    part, names become stable pseudonyms, phones are dropped and free text is
+    masked character by character, so sizes, line structure, quoted replies and
+    signatures still look the same to the email preprocessor. IDs, enums and
+    timestamps are kept as-is: they carry no personal data and replay needs them.
+    """
+
+    def __init__(self, salt: str = ""):
+        self._key = (salt or secrets.token_hex(16)).encode()
+
+    def pseudonym(self, value: str) -> str:
+        return hmac.new(self._key, value.lower().encode(), hashlib.sha256).hexdigest()[:10]
+
+    def email(self, value: str) -> str:
+        local, _, domain = value.rpartition("@")
+        return f"user-{self.pseudonym(local)}@{domain}" if local else value
+
+    def text(self, value: str) -> str:
+        value = EMAIL_PATTERN.sub(lambda match: self.email(match.group(0)), value)
+        lines = []
+        for line in value.split("\n"):
+            kept = _keep_spans(line)
+            masked, position = [], 0
+            for start, end in kept:
+                masked.append(self._mask_outside_emails(line[position:start]))
+                masked.append(line[start:end])
+                position = end
+            masked.append(self._mask_outside_emails(line[position:]))
+            lines.append("".join(masked))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _mask_outside_emails(text: str) -> str:
+        # Pseudonymized emails are already safe and must keep their "@domain"
+        parts, position = [], 0
+        for match in EMAIL_PATTERN.finditer(text):
+            parts.append(_mask(text[position:match.start()]))
+            parts.append(match.group(0))
+            position = match.end()
+        parts.append(_mask(text[position:]))
+        return "".join(parts)
+
+    def sanitize(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            return {item_key: self.sanitize(item, item_key) for item_key, item in value.items()
+                    if item_key not in DROP_KEYS}
+        if isinstance(value, list):
+            return [self.sanitize(item, key) for item in value]
+        if not isinstance(value, str) or not value:
+            return value
+        if key in NAME_KEYS:
+            return f"Person {self.pseudonym(value)}"
+        if key in URL_KEYS:
+            return self.pseudonym(value)
+        if key in TEXT_KEYS:
+            return self.text(value)
+        if key == "email" or EMAIL_PATTERN.fullmatch(value):
+            return self.email(value)
+        return value
+
+
+class TrafficRecorder:
+    """
+    Append-only JSONL journal of webhook deliveries, for replay with bench/replay.py
+    One line per delivery: arrival time, outcome, latency and the sanitized
+    payload. Sampling is decided per event_id, so every retry of a sampled event
+    is journaled and duplicate patterns replay faithfully. Sanitizing and
+    writing happen on a background thread; when the queue is full deliveries
+    are dropped rather than slowing the webhook down.
+    """
+
+    def __init__(self, enabled: bool, path: str, sample_rate: float = 1.0, salt: str = "", max_queue: int = 10000):
+        self.enabled = enabled
+        self.path = path
+        self.sample_rate = sample_rate
+        self.sanitizer = TrafficSanitizer(salt)
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _sampled(self, body: bytes) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        match = re.search(rb'"event_id"\s*:\s*"([^"]*)"', body)
+        key = match.group(1) if match else body
+        return zlib.crc32(key) / 0xFFFFFFFF < self.sample_rate
+
+    def capture(self, body: Optional[bytes], arrived_at: float, status: str, duration: float, http_status: int) -> None:
+        """Queue one delivery for the journal; never blocks the caller"""
+        if not self.enabled or body is None or not self._sampled(body):
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait({
+                "arrived_at": arrived_at,
+                "status": status,
+                "http_status": http_status,
+                "duration_ms": round(duration * 1000, 1),
+                "body": body,
+            })
+        except queue.Full:
+            TRAFFIC_CAPTURE_DROPPED_TOTAL.inc()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._worker = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                self._worker.start()
+                atexit.register(self.close)
+                logger.info("🎙️  Capturing webhook traffic to %s (sample rate %s)", self.path, self.sample_rate)
+
+    def _entry(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        body = record.pop("body")
+        try:
+            payload = self.sanitizer.sanitize(orjson.loads(body))
+        except orjson.JSONDecodeError:
+            payload = None
+        record["size_bytes"] = len(body)
+        record["payload"] = payload
+        return record
+
+    def _run(self) -> None:
+        # Unbuffered append: each entry is a single write(), so several worker
+        # processes can share one journal without interleaving partial lines
+        with open(self.path, "ab", buffering=0) as journal:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                try:
+                    journal.write(orjson.dumps(self._entry(record)) + b"\n")
+                    TRAFFIC_CAPTURED_TOTAL.inc()
+                except Exception as e:
+                    logger.warning("⚠️  Traffic capture write failed: %s", e)
+
+    def close(self) -> None:
+        """Write everything still queued before the process exits"""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+            self._worker = None
@@ -37,7 +37,7 @@ class ValidationService:
             email_lower = email.lower().strip()
             
             # PRODUCTION TESTING: Accept all emails for benchmarking
-            logger.info(f"✅ Email accepted (PRODUCTION TESTING MODE): {email_lower}")
+            logger.info("✅ Email accepted (PRODUCTION TESTING MODE): %s", email_lower)
             return True, f"Production testing mode - all emails accepted: {email_lower}"
             
             # ORIGINAL VALIDATION LOGIC (COMMENTED OUT FOR PRODUCTION TESTING)
@@ -75,7 +75,7 @@ class ValidationService:
             # return False, f"Domain not allowed: {domain}"
                 
         except Exception as e:
-            logger.error(f"Error validating email domain: {str(e)}")
+            logger.error("Error validating email domain: %s", e)
             return False, f"Validation error: {str(e)}"
     
     def should_process_message(self, author_email: str, is_initial_message: bool) -> Tuple[bool, str]:
@@ -0,0 +1,93 @@
+"""
+Gunicorn configuration for the multi-worker deployment mode
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Each worker is a separate process running the app on a uvicorn event loop, so
+CPU-bound work (validation, formatting, logging) spreads across cores. The
+worker count is WEB_CONCURRENCY, 1 when unset. WEB_CONCURRENCY=auto runs one
+worker per available core, capped by how many WORKER_MEMORY_MB-sized workers
+fit in the memory limit.
+
+One worker is the default because message coalescing and the per-conversation
+locks live in process memory: with several workers, a burst of opening
+messages split across them is no longer coalesced and can get two AI replies.
+Only raise it once that state is shared, or with PROCESSING_MODE=queue where
+the webhook does no pipeline work.
+
+Workers never share clients: MongoDB and HTTP connections are opened after
+fork, and their pool limits (MONGO_MAX_POOL_SIZE, HTTP_POOL_*) are divided
+between the workers. Admission limits, coalescing windows, conversation locks
+and /metrics are per worker.
+"""
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+
+def _available_cpus() -> int:
+    """Cores this process may use: CPU affinity, capped by a cgroup v2 CPU quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as handle:
+            quota, period = handle.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def _available_memory_mb() -> int:
+    """Memory limit of the container (cgroup v2 or v1), falling back to physical memory"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as handle:
+                value = handle.read().strip()
+            # cgroup v1 reports "unlimited" as a huge number
+            if value != "max" and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+def auto_workers() -> int:
+    """One worker per available core, capped by the memory limit"""
+    cpus = _available_cpus()
+    memory_mb = _available_memory_mb()
+    worker_memory_mb = int(os.getenv("WORKER_MEMORY_MB") or "300")
+    if memory_mb and worker_memory_mb > 0:
+        return max(1, min(cpus, memory_mb // worker_memory_mb))
+    return cpus
+
+
+_concurrency = (os.getenv("WEB_CONCURRENCY") or "1").strip().lower()
+workers = auto_workers() if _concurrency == "auto" else max(1, int(_concurrency))
+# Read by config.py in every worker to split the connection pools
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Importing before fork shares the app's memory pages between workers; services
+# still connect per worker (see the fork hooks in api/dependencies.py)
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+# A webhook may legitimately run up to its 60s deadline
+timeout = int(os.getenv("GUNICORN_TIMEOUT") or "90")
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT") or "30")
+keepalive = 5
+# The app writes its own structured logs; gunicorn only reports worker lifecycle
+accesslog = None
+
+
+def when_ready(server):
+    logger.info("🚀 Serving with %s worker(s) (%s cores, %s MB available)",
+                workers, _available_cpus(), _available_memory_mb() or "unknown")
+
+
+def post_fork(server, worker):
+    logger.info("👷 Worker %s started (pid %s)", worker.age, worker.pid)
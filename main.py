@@ -1,20 +1,54 @@
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from dotenv import load_dotenv
-from utils.logging import setup_logging, get_logger
-from api.routes import webhook, health
+from utils.logging import setup_logging, get_logger, CorrelationIdMiddleware
+from utils.tracing import setup_tracing, TracingMiddleware
+from api.routes import webhook, health, metrics, admin, analytics, conversations
+from api.dependencies import services
+from config import settings
 
 load_dotenv()
 
 # Configure logging
 setup_logging()
+setup_tracing()
 logger = get_logger(__name__)
 
+# Import time is most of a cold start, so keep it visible in /health and /metrics
+_import_seconds = time.perf_counter() - _import_started
+services.warmup.record_phase("imports", _import_seconds)
+logger.info("⏱️  Application imports took %.2fs", _import_seconds)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background monitors, warm-up, readiness checks and checkpoint recovery on startup; stop them and close pools on shutdown"""
+    if settings.LOOP_WATCHDOG_ENABLED:
+        services.loop_watchdog.start()
+    if settings.WARMUP_ENABLED:
+        services.start_warm_up()
+    else:
+        services.warmup.mark_ready()
+    services.readiness.start(health.collect_readiness)
+    if settings.PROCESSING_MODE == "inline":
+        # In queue mode a stalled job's visibility timeout hands it to another worker instead
+        services.checkpoint_recovery.start(webhook.recover_stalled_events)
+    yield
+    await services.close()
+    if settings.LOOP_WATCHDOG_ENABLED:
+        await services.loop_watchdog.stop()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="Dixa Workflow API",
     description="FastAPI backend that replicates n8n Dixa automation workflow",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -23,11 +57,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Correlation-ID"],
 )
+# Middleware added last runs first: the correlation ID must be bound before the trace tags the logs
+app.add_middleware(TracingMiddleware)
+app.add_middleware(CorrelationIdMiddleware)
 
 # Include routes
 app.include_router(webhook.router, tags=["webhook"])
 app.include_router(health.router, tags=["health"])
+app.include_router(metrics.router, tags=["metrics"])
+app.include_router(admin.router, tags=["admin"])
+app.include_router(analytics.router, tags=["analytics"])
+app.include_router(conversations.router, tags=["conversations"])
 
 if __name__ == "__main__":
     import os
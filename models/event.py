@@ -0,0 +1,51 @@
+from dataclasses import dataclass
+from typing import Optional
+from pydantic import TypeAdapter
+from .webhook import WebhookPayload
+
+# Built once at import so each webhook only pays for validation, not schema compilation
+WEBHOOK_PAYLOAD_ADAPTER = TypeAdapter(WebhookPayload)
+
+@dataclass(frozen=True, slots=True)
+class WebhookEvent:
+    """
+    Slim internal view of a validated Dixa webhook
+    Carries only the fields the processing pipeline uses
+    """
+    event_id: str
+    conversation_id: int
+    conversation_created_at: str
+    message_id: str
+    message_created_at: str
+    text: str
+    author_id: str
+    author_email: str
+    author_name: Optional[str] = None
+    content_type: Optional[str] = None
+    processed_content_url: Optional[str] = None
+
+    @classmethod
+    def from_payload(cls, payload: WebhookPayload) -> "WebhookEvent":
+        data = payload.data
+        return cls(
+            event_id=payload.event_id,
+            conversation_id=data.conversation.csid,
+            conversation_created_at=data.conversation.created_at,
+            message_id=data.message_id,
+            message_created_at=data.created_at,
+            text=data.text,
+            author_id=data.author.id,
+            author_email=data.author.email,
+            author_name=data.author.name,
+            content_type=data.content.content_type,
+            processed_content_url=data.content.processed_content_url
+        )
+
+def parse_webhook_event(raw: dict) -> WebhookEvent:
+    """
+    Validate a decoded webhook body and convert it to a WebhookEvent
+
+    Raises:
+        pydantic.ValidationError: if the body does not match WebhookPayload
+    """
+    return WebhookEvent.from_payload(WEBHOOK_PAYLOAD_ADAPTER.validate_python(raw))
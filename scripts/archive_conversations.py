@@ -0,0 +1,37 @@
+"""
+Move old conversation logs to the compressed archive
+
+Copies conversations logged more than ARCHIVE_AFTER_DAYS ago to
+`conversations_archive` (zstd-compressed BSON, indexed by conversation_id)
+and shrinks them in `conversations` to the fields duplicate detection needs.
+Run it from a scheduler (e.g. a daily cron job) rather than inside the web
+workers; an interrupted run is completed by the next one.
+
+    python -m scripts.archive_conversations
+    python -m scripts.archive_conversations --days 60 --limit 10000
+"""
+import argparse
+import sys
+from config import settings
+from core.services.database_service import MongoDBService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Archive conversation logs older than N days")
+    parser.add_argument("--days", type=float, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, help="Stop after this many conversations")
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.archive is None:
+        print("❌ MongoDB not connected")
+        return 1
+    result = service.archive.archive_older_than(args.days, args.batch_size, args.limit)
+    print(f"✅ Archived {result['archived']} conversations logged before {result['cutoff']:%Y-%m-%d %H:%M} "
+          f"({result['raw_bytes']} bytes -> {result['stored_bytes']} bytes, ratio {result['compression_ratio']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
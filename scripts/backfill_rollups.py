@@ -0,0 +1,39 @@
+"""
+Rebuild the conversation rollups from the `conversations` collection
+
+Rollups are maintained as conversations are logged; run this once to cover
+history logged before they existed, or to repair a range. Whole UTC days
+are rebuilt, so rerunning over the same range is safe; conversations logged
+while the rebuild runs may be counted twice, so prefer a quiet period.
+Archived conversations are counted from their stubs; stubs archived before
+they kept the rollup fields get them back from the archive first.
+
+    python -m scripts.backfill_rollups --since 2025-09-01
+    python -m scripts.backfill_rollups --since 2025-10-01 --until 2025-10-08
+"""
+import argparse
+import sys
+from datetime import datetime
+from core.services.database_service import MongoDBService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rebuild conversation rollups from the conversations collection")
+    parser.add_argument("--since", required=True, type=datetime.fromisoformat, help="UTC date or datetime (ISO 8601)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="UTC date or datetime (default: now)")
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.rollups is None:
+        print("❌ MongoDB not connected")
+        return 1
+    restored = service.archive.restore_stub_fields()
+    if restored:
+        print(f"🗄️  Restored rollup fields on {restored} conversations archived before stubs kept them")
+    result = service.rollups.rebuild(service.conversations_collection, args.since, args.until or datetime.utcnow())
+    print(f"✅ Rebuilt rollups from {result['conversations']} conversations ({result['start']} .. {result['end']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Set the search stemming language on conversations logged before search existed
+
+Those conversations are already in the text index, stemmed with
+SEARCH_DEFAULT_LANGUAGE; this detects each one's own language so English,
+German and French messages match stemmed queries too. Safe to rerun: only
+conversations without a language are touched.
+
+    python -m scripts.backfill_search_language
+"""
+import argparse
+import sys
+from core.services.database_service import MongoDBService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Detect the search language of conversations logged without one")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.search is None:
+        print("❌ MongoDB not connected")
+        return 1
+    updated = service.search.backfill_languages(args.batch_size)
+    print(f"✅ Set the search language on {updated} conversations")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""
+Set skip_category on skipped conversations logged before it existed
+
+The skipped / skipped_reason filters of the conversation listing, search
+and export match on skip_category, so older skipped conversations (and
+archive stubs) are only found once this has run. Safe to rerun: only
+conversations without a category are touched.
+
+    python -m scripts.backfill_skip_category
+"""
+import argparse
+import sys
+from core.services.database_service import MongoDBService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Categorize skipped conversations logged without skip_category")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.history is None:
+        print("❌ MongoDB not connected")
+        return 1
+    updated = service.history.backfill_skip_categories(args.batch_size)
+    print(f"✅ Set the skip category on {updated} conversations")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
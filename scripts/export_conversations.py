@@ -0,0 +1,63 @@
+"""
+Export conversation logs for analysis (JSONL, CSV or Parquet)
+
+Streams `conversations` in batches from a secondary when one is available,
+compressing on the fly, so memory stays flat and webhook traffic on the
+primary is unaffected. Archived conversations are included in full.
+
+    python -m scripts.export_conversations --start 2025-10-01 --end 2025-10-08
+    python -m scripts.export_conversations --format parquet --compression none --handoff -o handoffs.parquet
+    python -m scripts.export_conversations --format csv --fields logged_at,conversation_id,ai_response -o - | head
+"""
+import argparse
+import sys
+from datetime import datetime
+from core.services.database_service import MongoDBService
+from core.services.export_service import COMPRESSIONS, DEFAULT_FIELDS, FORMATS, ExportError, build_query
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stream conversation logs to a file")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="gzip")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="UTC, inclusive")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="UTC, exclusive")
+    parser.add_argument("--conversation-id", type=int)
+    parser.add_argument("--user-id")
+    parser.add_argument("--handoff", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--sent", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--skipped", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--fields", help=f"Comma-separated fields (default: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-rate", type=float, help="Documents per second, to limit load on the database")
+    parser.add_argument("-o", "--output", help="Output file, or - for stdout (default: a timestamped file name)")
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.export is None:
+        print("❌ MongoDB not connected", file=sys.stderr)
+        return 1
+    query = build_query(args.start, args.end, args.conversation_id, args.user_id, args.handoff, args.sent, args.skipped)
+    fields = args.fields.split(",") if args.fields else DEFAULT_FIELDS
+    try:
+        chunks = service.export.export(args.format, query, fields, args.compression, args.batch_size, args.max_rate)
+    except ExportError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    output = args.output or service.export.filename(args.format, args.compression)
+    written = 0
+    handle = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        for chunk in chunks:
+            handle.write(chunk)
+            written += len(chunk)
+    finally:
+        if handle is not sys.stdout.buffer:
+            handle.close()
+    print(f"✅ Exported {written} bytes to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Return dead-lettered jobs to the job queue (PROCESSING_MODE=queue)
+
+A job is dead-lettered after JOB_MAX_ATTEMPTS failures and kept with its
+last error. Once the cause is fixed, requeue it with fresh attempts; the
+event resumes from its pipeline checkpoints if those have not expired.
+
+    python -m scripts.requeue_dead_letters [--event-id EVENT_ID] [--limit 100]
+"""
+import argparse
+import sys
+from core.services.database_service import MongoDBService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Move dead-lettered jobs back to the job queue")
+    parser.add_argument("--event-id", help="Requeue only this event")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--list", action="store_true", help="Show the dead letters and their errors, requeue nothing")
+    args = parser.parse_args()
+
+    service = MongoDBService()
+    if service.jobs is None:
+        print("❌ MongoDB not connected")
+        return 1
+    if args.list:
+        query = {"_id": args.event_id} if args.event_id else {}
+        for job in service.jobs.dead_letters.find(query).sort("dead_lettered_at", 1).limit(args.limit):
+            print(f"{job['_id']}  {job['dead_lettered_at']:%Y-%m-%d %H:%M:%S}  attempts={job['attempts']}  {job.get('last_error')}")
+        return 0
+    requeued = service.jobs.requeue_dead_letters(args.event_id, args.limit)
+    print(f"✅ Requeued {requeued} dead-lettered jobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
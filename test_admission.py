@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for webhook admission control and load shedding
+"""
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from api.routes import webhook
+from utils.admission import AdmissionController, AdmissionRejected
+
+def test_requests_within_limit_are_admitted():
+    async def run():
+        admission = AdmissionController(max_in_flight=2, max_queue=0, max_queue_wait=0.05, retry_after=5)
+        async with admission.admit():
+            async with admission.admit():
+                peak = admission.in_flight
+        return admission, peak
+
+    admission, peak = asyncio.run(run())
+    assert peak == 2
+    assert admission.in_flight == 0
+
+def test_full_queue_is_rejected_immediately():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=0, max_queue_wait=5.0, retry_after=5)
+        async with admission.admit():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with admission.admit():
+                    pass
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after == 5
+
+def test_queued_request_times_out():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, max_queue_wait=0.05, retry_after=3)
+        async with admission.admit():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with admission.admit():
+                    pass
+            queued_after = admission.queued
+        return admission, rejected.value, queued_after
+
+    admission, rejected, queued_after = asyncio.run(run())
+    assert rejected.reason == "queue_timeout"
+    assert rejected.retry_after == 3
+    assert queued_after == 0
+    assert admission.in_flight == 0
+
+def test_queued_request_gets_the_released_slot():
+    async def run():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, max_queue_wait=1.0, retry_after=3)
+        order = []
+
+        async def first():
+            async with admission.admit():
+                await asyncio.sleep(0.02)
+                order.append("first")
+
+        async def second():
+            await asyncio.sleep(0)
+            async with admission.admit():
+                order.append("second")
+
+        await asyncio.gather(first(), second())
+        return order
+
+    assert asyncio.run(run()) == ["first", "second"]
+
+def test_zero_max_in_flight_disables_admission_control():
+    async def run():
+        admission = AdmissionController(max_in_flight=0, max_queue=0, max_queue_wait=0.0, retry_after=5)
+        async with admission.admit():
+            async with admission.admit():
+                return admission.in_flight
+
+    assert asyncio.run(run()) == 2
+
+def test_webhook_is_shed_with_503_and_retry_after(monkeypatch):
+    admission = AdmissionController(max_in_flight=1, max_queue=0, max_queue_wait=0.05, retry_after=7)
+    monkeypatch.setattr(webhook, "admission", admission)
+    app = FastAPI()
+    app.include_router(webhook.router)
+
+    async def run():
+        async with admission.admit():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/dixa_conversation_started", json={})
+
+    response = asyncio.run(run())
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert "queue_full" in response.json()["detail"]
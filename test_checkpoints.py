@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Test script for pipeline checkpoints: leases, saved stages and resuming an interrupted event
+"""
+import asyncio
+import dataclasses
+from datetime import datetime, timedelta
+import mongomock
+import pytest
+from api.dependencies import services
+from api.routes import webhook
+from config import settings
+from core.services import database_service
+from core.services.checkpoint_service import LeaseLost, PipelineCheckpointService
+from core.services.coalescing_service import MessageCoalescer
+from models.event import WebhookEvent
+from utils.deadline import Deadline
+
+def checkpoint_service(lease_seconds=90):
+    return PipelineCheckpointService(mongomock.MongoClient().dirq.idempotency, lease_seconds=lease_seconds)
+
+def expire_lease(service, event_id):
+    service.collection.update_one({"_id": event_id}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}})
+
+def test_second_acquire_is_refused_while_the_lease_is_held():
+    service = checkpoint_service()
+    first = service.acquire("evt-1", {"event_id": "evt-1"})
+    assert first is not None
+    assert first.attempt == 1
+    assert first.stages == {}
+    assert service.acquire("evt-1") is None
+    assert service.state("evt-1") == "leased"
+    assert service.state("evt-unknown") == "unknown"
+
+def test_save_extends_the_lease_and_keeps_results():
+    service = checkpoint_service(lease_seconds=60)
+    checkpoints = service.acquire("evt-1")
+    service.collection.update_one({"_id": "evt-1"}, {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=1)}})
+    service.save(checkpoints, {"claim": {"success": True}})
+    record = service.collection.find_one({"_id": "evt-1"})
+    assert record["lease_until"] > datetime.utcnow() + timedelta(seconds=30)
+    assert record["checkpoints"] == {"claim": {"success": True}}
+    assert checkpoints.last_stage == "claim"
+
+def test_save_after_takeover_raises_lease_lost():
+    service = checkpoint_service()
+    stale = service.acquire("evt-1")
+    service.save(stale, {"claim": {"success": True}})
+    expire_lease(service, "evt-1")
+    assert service.state("evt-1") == "stalled"
+
+    resumed = service.acquire("evt-1")
+    assert resumed.attempt == 2
+    assert resumed.get("claim") == {"success": True}
+    with pytest.raises(LeaseLost):
+        service.save(stale, {"context": {}})
+    service.save(resumed, {"context": {}})
+    assert resumed.last_stage == "context"
+
+def test_release_allows_immediate_retry_with_saved_stages():
+    service = checkpoint_service()
+    checkpoints = service.acquire("evt-1")
+    service.save(checkpoints, {"ai": {"email": "Hallo", "handoff": False, "usage": None}})
+    service.release(checkpoints)
+    retry = service.acquire("evt-1")
+    assert retry is not None
+    assert retry.get("ai")["email"] == "Hallo"
+
+def test_completed_event_is_never_leased_again():
+    service = checkpoint_service()
+    checkpoints = service.acquire("evt-1", {"event_id": "evt-1"})
+    service.complete(checkpoints, {"log": {"success": True}})
+    expire_lease(service, "evt-1")
+    assert service.acquire("evt-1") is None
+    assert service.state("evt-1") == "completed"
+    record = service.collection.find_one({"_id": "evt-1"})
+    assert "event" not in record
+    assert record["checkpoints"]["log"] == {"success": True}
+
+def test_stalled_lists_expired_unfinished_events_below_max_attempts():
+    service = checkpoint_service()
+    for event_id in ("evt-1", "evt-2", "evt-3"):
+        service.acquire(event_id, {"event_id": event_id})
+    service.complete(service.acquire("evt-4", {"event_id": "evt-4"}))
+    expire_lease(service, "evt-1")
+    expire_lease(service, "evt-2")
+    service.collection.update_one({"_id": "evt-2"}, {"$set": {"attempt": 3}})
+    assert [record["_id"] for record in service.stalled(max_attempts=3)] == ["evt-1"]
+
+
+class RecordingDixaService:
+    """Stands in for Dixa; a resumed event must not send a second reply"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, conversation_id, payload, deadline=None):
+        self.sent.append(conversation_id)
+        return {"success": True}
+
+@pytest.fixture
+def mongodb_service(monkeypatch):
+    monkeypatch.setattr(database_service, "MongoClient", mongomock.MongoClient)
+    monkeypatch.setattr(settings, "MONGODB_URL", "mongodb://localhost/dirq")
+    monkeypatch.setattr(database_service.MongoDBService, "_instance", None)
+    service = database_service.MongoDBService()
+    assert service.client is not None
+    monkeypatch.setattr(services, "_mongodb_service", service)
+    yield service
+    database_service.MongoDBService._instance = None
+
+def webhook_event(event_id="evt-1", message_created_at="2025-09-04T16:11:44.500Z", text="Waar is mijn bestelling?"):
+    return WebhookEvent(
+        event_id=event_id, conversation_id=4242,
+        conversation_created_at="2025-09-04T16:11:44.000Z", message_id=f"msg-{event_id}",
+        message_created_at=message_created_at, text=text,
+        author_id="user-1", author_email="klant@example.com"
+    )
+
+def test_interrupted_send_is_not_repeated_on_resume(mongodb_service, monkeypatch):
+    dixa = RecordingDixaService()
+    monkeypatch.setattr(services, "_dixa_service", dixa)
+    event = webhook_event()
+
+    # An earlier attempt got as far as marking the send pending, then died
+    checkpoints = mongodb_service.checkpoints.acquire(event.event_id, dataclasses.asdict(event))
+    mongodb_service.checkpoints.save(checkpoints, {
+        "burst": {"texts": [event.text], "event_ids": []},
+        "claim": {"success": True},
+        "context": {"user_context": None, "prompt_text": event.text, "preprocessing": None},
+        "ai": {"email": "Uw bestelling is onderweg.", "handoff": False, "usage": None},
+        "slack": {"success": True},
+        "format": {"success": True, "dixa_payload": {}},
+        "send": {"pending": True},
+    })
+    expire_lease(mongodb_service.checkpoints, event.event_id)
+
+    result = asyncio.run(webhook._handle_webhook(event, Deadline(30)))
+
+    assert dixa.sent == []
+    assert result["status"] == "processed_and_sent"
+    assert result["dixa_message_sent"] is False
+    logged = mongodb_service.conversations_collection.find_one({"event_id": event.event_id})
+    assert logged["dixa_send_unconfirmed"] is True
+    assert mongodb_service.event_state(event.event_id) == "completed"
+    # A late redelivery of the finished event is a duplicate
+    again = asyncio.run(webhook._handle_webhook(event, Deadline(30)))
+    assert again["status"] == "duplicate_ignored"
+    assert dixa.sent == []
+
+def follower_while_leader_waits(mongodb_service, monkeypatch, leader_saves: bool):
+    """Join a follower to an open window, then let its leader save the burst or fail"""
+    coalescer = MessageCoalescer(window_seconds=0.02, max_wait_seconds=1.0)
+    coalescer.wheel.tick_seconds = 0.01
+    monkeypatch.setattr(services, "_message_coalescer", coalescer)
+    # A follow-up well after the conversation opened: on its own it is only logged
+    follower = webhook_event("evt-2", message_created_at="2025-09-04T16:20:00.000Z", text="Ordernummer 123")
+
+    async def run():
+        leader = asyncio.create_task(coalescer.wait_for_burst(4242, "evt-1", "msg-evt-1", "klant@example.com", "Hallo"))
+        await asyncio.sleep(0)
+        handled = asyncio.create_task(webhook._handle_webhook(follower, Deadline(30)))
+        burst = await leader
+        await asyncio.sleep(0.05)
+        # The leader closed its window but has not saved the burst: the follower must stay unfinished
+        before = (handled.done(), mongodb_service.event_state("evt-2"),
+                  mongodb_service.conversations_collection.count_documents({"event_id": "evt-2"}))
+        coalescer.burst_saved("evt-1", leader_saves)
+        return burst, before, await handled
+
+    return asyncio.run(run())
+
+def test_coalesced_follower_completes_only_after_the_burst_is_saved(mongodb_service, monkeypatch):
+    burst, before, result = follower_while_leader_waits(mongodb_service, monkeypatch, leader_saves=True)
+    assert burst["texts"] == ["Hallo", "Ordernummer 123"]
+    assert before == (False, "leased", 0)
+    assert result["status"] == "coalesced"
+    assert mongodb_service.event_state("evt-2") == "completed"
+    logged = mongodb_service.conversations_collection.find_one({"event_id": "evt-2"})
+    assert logged["coalesced_into"] == "evt-1"
+
+def test_follower_is_processed_on_its_own_when_the_leader_fails(mongodb_service, monkeypatch):
+    _, before, result = follower_while_leader_waits(mongodb_service, monkeypatch, leader_saves=False)
+    assert before == (False, "leased", 0)
+    assert result["status"] == "ignored"
+    logged = mongodb_service.conversations_collection.find_one({"event_id": "evt-2"})
+    assert "coalesced_into" not in logged
+    assert logged["original_text"] == "Ordernummer 123"
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for the timer wheel and the per-conversation message coalescer
+"""
+import asyncio
+import time
+from core.services.coalescing_service import MessageCoalescer
+from utils.timer_wheel import TimerWheel
+
+def test_timer_fires_after_delay_and_never_early():
+    async def run():
+        wheel = TimerWheel(tick_seconds=0.01, slots=8)
+        fired = []
+        started = time.monotonic()
+        wheel.schedule(0.05, lambda: fired.append(time.monotonic() - started))
+        await asyncio.sleep(0.15)
+        return wheel, fired
+
+    wheel, fired = asyncio.run(run())
+    assert len(fired) == 1
+    assert fired[0] >= 0.05
+    assert wheel.pending == 0
+
+def test_timer_beyond_one_revolution_waits_extra_rounds():
+    async def run():
+        # 8 slots of 10ms: a 120ms timer needs a second pass over the wheel
+        wheel = TimerWheel(tick_seconds=0.01, slots=8)
+        fired = []
+        wheel.schedule(0.12, lambda: fired.append("late"))
+        await asyncio.sleep(0.09)
+        early = list(fired)
+        await asyncio.sleep(0.1)
+        return early, fired
+
+    early, fired = asyncio.run(run())
+    assert early == []
+    assert fired == ["late"]
+
+def test_cancelled_timer_does_not_fire():
+    async def run():
+        wheel = TimerWheel(tick_seconds=0.01, slots=8)
+        fired = []
+        handle = wheel.schedule(0.03, lambda: fired.append("cancelled"))
+        wheel.schedule(0.03, lambda: fired.append("kept"))
+        handle.cancel()
+        await asyncio.sleep(0.1)
+        return wheel, handle, fired
+
+    wheel, handle, fired = asyncio.run(run())
+    assert fired == ["kept"]
+    assert not handle.fired
+    assert wheel.pending == 0
+
+def test_failing_callback_does_not_stop_the_wheel():
+    async def run():
+        wheel = TimerWheel(tick_seconds=0.01, slots=8)
+        fired = []
+        wheel.schedule(0.02, lambda: 1 / 0)
+        wheel.schedule(0.02, lambda: fired.append("after"))
+        await asyncio.sleep(0.08)
+        return fired
+
+    assert asyncio.run(run()) == ["after"]
+
+def test_follow_up_messages_join_the_leader_window():
+    async def run():
+        coalescer = MessageCoalescer(window_seconds=0.05, max_wait_seconds=1.0)
+        coalescer.wheel.tick_seconds = 0.01
+        leader = asyncio.create_task(coalescer.wait_for_burst(7, "evt-1", "msg-1", "klant@example.com", "Hallo"))
+        await asyncio.sleep(0)
+        joined = coalescer.try_join(7, "evt-2", "msg-2", "klant@example.com", "mijn bestelling")
+        burst = await leader
+        return coalescer, joined, burst
+
+    coalescer, joined, burst = asyncio.run(run())
+    assert joined == "evt-1"
+    assert burst["event_ids"] == ["evt-1", "evt-2"]
+    assert burst["message_ids"] == ["msg-1", "msg-2"]
+    assert MessageCoalescer.merge_texts(burst["texts"]) == "Hallo\n\nmijn bestelling"
+    assert coalescer.windows == {}
+
+def test_join_is_refused_without_window_or_for_another_author():
+    async def run():
+        coalescer = MessageCoalescer(window_seconds=0.05, max_wait_seconds=1.0)
+        coalescer.wheel.tick_seconds = 0.01
+        without_window = coalescer.try_join(7, "evt-0", "msg-0", "klant@example.com", "eerder")
+        leader = asyncio.create_task(coalescer.wait_for_burst(7, "evt-1", "msg-1", "klant@example.com", "Hallo"))
+        await asyncio.sleep(0)
+        other_author = coalescer.try_join(7, "evt-2", "msg-2", "agent@example.com", "antwoord")
+        other_conversation = coalescer.try_join(8, "evt-3", "msg-3", "klant@example.com", "Hallo")
+        burst = await leader
+        after_close = coalescer.try_join(7, "evt-4", "msg-4", "klant@example.com", "te laat")
+        return without_window, other_author, other_conversation, after_close, burst
+
+    without_window, other_author, other_conversation, after_close, burst = asyncio.run(run())
+    assert without_window is None
+    assert other_author is None
+    assert other_conversation is None
+    assert after_close is None
+    assert burst["event_ids"] == ["evt-1"]
+
+def test_window_extension_is_capped_by_max_wait():
+    async def run():
+        coalescer = MessageCoalescer(window_seconds=0.06, max_wait_seconds=0.15)
+        coalescer.wheel.tick_seconds = 0.01
+        leader = asyncio.create_task(coalescer.wait_for_burst(7, "evt-0", "msg-0", "klant@example.com", "0"))
+        # Keep extending the window well past max_wait
+        for i in range(1, 10):
+            await asyncio.sleep(0.04)
+            if leader.done():
+                break
+            coalescer.try_join(7, f"evt-{i}", f"msg-{i}", "klant@example.com", str(i))
+        return await leader
+
+    burst = asyncio.run(run())
+    assert 150 <= burst["waited_ms"] < 300
+    assert 1 < len(burst["event_ids"]) < 10
+
+def test_follower_waits_until_the_leader_saved_the_burst():
+    async def run():
+        coalescer = MessageCoalescer(window_seconds=0.02, max_wait_seconds=1.0)
+        coalescer.wheel.tick_seconds = 0.01
+        leader = asyncio.create_task(coalescer.wait_for_burst(7, "evt-1", "msg-1", "klant@example.com", "Hallo"))
+        await asyncio.sleep(0)
+        coalescer.try_join(7, "evt-2", "msg-2", "klant@example.com", "nog iets")
+        follower = asyncio.create_task(coalescer.wait_until_saved("evt-1"))
+        await leader
+        await asyncio.sleep(0.02)
+        waiting_after_close = not follower.done()
+        coalescer.burst_saved("evt-1", True)
+        return waiting_after_close, await follower, coalescer
+
+    waiting_after_close, saved, coalescer = asyncio.run(run())
+    assert waiting_after_close
+    assert saved is True
+    assert coalescer.unsaved == {}
+
+def test_follower_is_released_when_the_leader_fails():
+    async def run():
+        coalescer = MessageCoalescer(window_seconds=1.0, max_wait_seconds=1.0)
+        coalescer.wheel.tick_seconds = 0.01
+        leader = asyncio.create_task(coalescer.wait_for_burst(7, "evt-1", "msg-1", "klant@example.com", "Hallo"))
+        await asyncio.sleep(0)
+        coalescer.try_join(7, "evt-2", "msg-2", "klant@example.com", "nog iets")
+        follower = asyncio.create_task(coalescer.wait_until_saved("evt-1"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        return await follower, coalescer
+
+    saved, coalescer = asyncio.run(run())
+    assert saved is False
+    assert coalescer.unsaved == {} and coalescer.windows == {}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for keyset pagination and filters of the conversation listing
+"""
+from datetime import datetime, timedelta
+import mongomock
+import orjson
+import pytest
+from bson import ObjectId
+from core.services.conversation_history import (
+    ConversationHistoryService, InvalidCursor, SKIP_CATEGORY_FIELD, decode_cursor, encode_cursor
+)
+from core.services.export_service import InvalidFilter, build_query
+
+STARTED = datetime(2025, 9, 4, 12, 0, 0)
+
+def history_with(docs):
+    collection = mongomock.MongoClient().dirq.conversations
+    history = ConversationHistoryService(collection)
+    history.ensure_indexes()
+    if docs:
+        collection.insert_many([ConversationHistoryService.annotate(doc) for doc in docs])
+    return history
+
+def sample_docs(count):
+    # Pairs share a logged_at, so paging has to break ties on _id
+    return [
+        {"conversation_id": i, "user_id": f"user-{i % 3}", "logged_at": STARTED - timedelta(seconds=i // 2)}
+        for i in range(count)
+    ]
+
+def read_page(history, query, limit, after=None):
+    return orjson.loads(b"".join(history.page(query, None, limit, after)))
+
+def test_cursor_round_trip():
+    doc = {"logged_at": STARTED, "_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (doc["logged_at"], doc["_id"])
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "W10", encode_cursor({"logged_at": STARTED, "_id": "x"})])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def test_keyset_pages_cover_every_document_once_newest_first():
+    history = history_with(sample_docs(23))
+    seen, after, pages = [], None, 0
+    while True:
+        page = read_page(history, {}, 5, after)
+        pages += 1
+        seen.extend(item["conversation_id"] for item in page["items"])
+        after = page["next_cursor"]
+        if after is None:
+            break
+        assert page["count"] == 5
+
+    assert pages == 5
+    assert sorted(seen) == list(range(23))
+    assert len(seen) == len(set(seen))
+    logged = [history.collection.find_one({"conversation_id": i})["logged_at"] for i in seen]
+    assert logged == sorted(logged, reverse=True)
+
+def test_paging_with_filter_and_summary_fields():
+    history = history_with(sample_docs(12))
+    page = read_page(history, build_query(user_id="user-1"), 2)
+    rest = read_page(history, build_query(user_id="user-1"), 10, page["next_cursor"])
+    items = page["items"] + rest["items"]
+    assert [item["conversation_id"] for item in items] == [1, 4, 7, 10]
+    assert rest["next_cursor"] is None
+    assert set(items[0]) == {"_id", "logged_at", "conversation_id", "user_id"}
+
+def test_last_page_has_no_cursor():
+    history = history_with(sample_docs(3))
+    page = read_page(history, {}, 3)
+    assert page["count"] == 3
+    assert page["next_cursor"] is None
+
+def test_listing_filters_each_have_an_index_prefix():
+    history = history_with([])
+    prefixes = {spec["key"][0][0] for spec in history.collection.index_information().values()}
+    for field in ("conversation_id", "user_id", "handoff_required", "dixa_message_sent", SKIP_CATEGORY_FIELD):
+        assert field in prefixes
+
+def test_skip_filters_use_the_stored_category():
+    history = history_with([
+        {"conversation_id": 1, "logged_at": STARTED, "skipped_reason": "Coalesced into event evt-1"},
+        {"conversation_id": 2, "logged_at": STARTED, "skipped_reason": "Not an initial message"},
+        {"conversation_id": 3, "logged_at": STARTED, "skipped_reason": "Something unexpected"},
+        {"conversation_id": 4, "logged_at": STARTED},
+    ])
+
+    def ids(**filters):
+        return sorted(doc["conversation_id"] for doc in history.collection.find(build_query(**filters)))
+
+    assert ids(skipped=True) == [1, 2, 3]
+    assert ids(skipped=False) == [4]
+    assert ids(skipped_reason="coalesced") == [1]
+    assert ids(skipped=True, skipped_reason="other") == [3]
+    with pytest.raises(InvalidFilter):
+        build_query(skipped=False, skipped_reason="coalesced")
+
+def test_backfill_sets_missing_categories():
+    history = history_with([])
+    history.collection.insert_many([
+        {"conversation_id": 1, "logged_at": STARTED, "skipped_reason": "Domain validation failed: Invalid email x"},
+        {"conversation_id": 2, "logged_at": STARTED, "skipped_reason": "Domain validation failed for example.com"},
+        {"conversation_id": 3, "logged_at": STARTED},
+    ])
+    assert history.backfill_skip_categories(batch_size=1) == 2
+    assert history.backfill_skip_categories() == 0
+    categories = {doc["conversation_id"]: doc.get(SKIP_CATEGORY_FIELD) for doc in history.collection.find()}
+    assert categories == {1: "invalid_email", 2: "domain_not_allowed", 3: None}
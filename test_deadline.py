@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for the webhook deadline budget and the Dixa calls that must outlive it
+"""
+import asyncio
+import httpx
+import pytest
+from core.services.dixa_service import DixaAPIService, SEND_MIN_TIMEOUT_SECONDS, TRANSFER_MIN_TIMEOUT_SECONDS
+from utils.deadline import Deadline, DeadlineExceeded, timeout_for
+
+def expired_deadline() -> Deadline:
+    deadline = Deadline(60)
+    deadline.expires_at = deadline.started_at - 1
+    return deadline
+
+def test_timeout_is_remaining_budget_capped_by_call_default():
+    deadline = Deadline(60)
+    assert deadline.timeout(5.0) == 5.0
+    assert 0 < Deadline(0.5).timeout(5.0) <= 0.5
+    assert timeout_for(None, 5.0) == 5.0
+
+def test_expired_deadline_raises_without_floor():
+    deadline = expired_deadline()
+    assert deadline.expired
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(5.0)
+    with pytest.raises(DeadlineExceeded):
+        timeout_for(deadline, 5.0)
+
+def test_floor_applies_after_expiry():
+    assert expired_deadline().timeout(5.0, floor=2.0) == 2.0
+    assert Deadline(60).timeout(5.0, floor=2.0) == 5.0
+
+def test_check_records_first_expired_stage_only():
+    deadline = expired_deadline()
+    assert deadline.check("openai")
+    assert deadline.check("dixa_send")
+    assert deadline.summary()["exceeded_at"] == "openai"
+    assert not Deadline(60).check("openai")
+
+def test_allows_skips_optional_stage_below_minimum():
+    deadline = Deadline(5)
+    assert not deadline.allows("slack", 10)
+    assert deadline.allows("dashboard", 1)
+    assert deadline.skipped_stages == ["slack"]
+
+def dixa_recording_timeouts(status_code: int):
+    timeouts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(status_code, json={})
+
+    service = DixaAPIService()
+    service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service, timeouts
+
+def test_send_still_goes_out_after_deadline_expired():
+    service, timeouts = dixa_recording_timeouts(200)
+    result = asyncio.run(service.send_message(1, {"content": {"value": "Hi"}}, deadline=expired_deadline()))
+    assert result["success"]
+    assert timeouts == [SEND_MIN_TIMEOUT_SECONDS]
+
+def test_transfer_still_goes_out_after_deadline_expired():
+    service, timeouts = dixa_recording_timeouts(204)
+    result = asyncio.run(service.transfer_to_queue(1, "user", deadline=expired_deadline()))
+    assert result["success"]
+    assert timeouts == [TRANSFER_MIN_TIMEOUT_SECONDS]
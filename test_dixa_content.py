@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for fetching the processed (HTML) body of Dixa email messages
+"""
+import asyncio
+import httpx
+import pytest
+from config import settings
+from core.services.dixa_service import DixaAPIService
+
+CONTENT_BASE_URL = "https://content.dixa.io/v1"
+
+@pytest.fixture
+def dixa(monkeypatch):
+    monkeypatch.setattr(settings, "DIXA_CONTENT_BASE_URL", CONTENT_BASE_URL)
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, text="<p>Hallo</p>")
+
+    service = DixaAPIService()
+    service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service, requests
+
+def fetch(service, content_url):
+    return asyncio.run(service.fetch_processed_content(content_url))
+
+def test_relative_url_is_resolved_against_content_base(dixa):
+    service, requests = dixa
+    assert fetch(service, "/messages/abc/content") == "<p>Hallo</p>"
+    assert str(requests[0].url) == "https://content.dixa.io/v1/messages/abc/content"
+    assert requests[0].headers["Authorization"].startswith("Bearer ")
+
+def test_absolute_url_on_content_host_is_fetched(dixa):
+    service, requests = dixa
+    assert fetch(service, "https://CONTENT.dixa.io/v1/messages/abc/content") == "<p>Hallo</p>"
+    assert len(requests) == 1
+
+@pytest.mark.parametrize("content_url", [
+    "https://attacker.example/steal",
+    "http://content.dixa.io/v1/messages/abc/content",
+    "https://content.dixa.io.attacker.example/x",
+    "https://user@attacker.example/x",
+    "//attacker.example/steal",
+])
+def test_foreign_absolute_url_is_not_requested(dixa, content_url):
+    service, requests = dixa
+    assert fetch(service, content_url) is None
+    assert requests == []
+
+def test_nothing_is_fetched_without_content_base(dixa, monkeypatch):
+    service, requests = dixa
+    monkeypatch.setattr(settings, "DIXA_CONTENT_BASE_URL", "")
+    assert fetch(service, "/messages/abc/content") is None
+    assert fetch(service, "https://content.dixa.io/v1/messages/abc/content") is None
+    assert requests == []
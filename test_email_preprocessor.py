@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the email preprocessing stage (quoted replies, signatures, HTML)
+"""
+from core.services.email_preprocessor import EmailPreprocessor
+
+preprocessor = EmailPreprocessor()
+
+def test_italian_reply_header_is_stripped():
+    text = "Grazie. Ma Marcus Vohmann non risponde alla chat. Potete intervenire voi?\nGrazie.\nGiusy.\n\nIl gio 4 set 2025, 17:27 Sarie ha scritto:"
+    result = preprocessor.preprocess(text)
+    assert result["text"] == "Grazie. Ma Marcus Vohmann non risponde alla chat. Potete intervenire voi?\nGrazie.\nGiusy."
+    assert result["removed"] == ["quoted_reply"]
+    assert result["original_text"] == text
+
+def test_dutch_signature_footer_and_wrapped_reply_header():
+    text = (
+        "Hallo,\n\nMijn bestelling is niet aangekomen.\n\nMet vriendelijke groet,\nJan Jansen\n"
+        "Tel: 0612345678\nKvK 12345678\nDeze e-mail is uitsluitend bestemd voor de geadresseerde.\n\n"
+        "Op do 4 sep 2025 om 17:27 schreef Whoppah Support <\nsupport@whoppah.com>:\n\n> Beste Jan,\n"
+    )
+    result = preprocessor.preprocess(text)
+    assert result["text"] == "Hallo,\n\nMijn bestelling is niet aangekomen.\n\nMet vriendelijke groet,\nJan Jansen"
+    assert result["removed"] == ["signature"]
+    assert result["processed_tokens_est"] < result["original_tokens_est"]
+    assert result["token_reduction_pct"] > 0
+
+def test_outlook_header_block_german():
+    result = preprocessor.preprocess("Wo ist mein Paket?\n\nVon: Whoppah\nGesendet: Montag\nAn: Max\nBetreff: Bestellung\n\nAlter Text")
+    assert result["text"] == "Wo ist mein Paket?"
+
+def test_forward_header_is_removed_but_body_kept():
+    text = "---------- Forwarded message ---------\nFrom: Shop <a@b.c>\nDate: Mon\nSubject: Order 123\nTo: me\n\nYour order 123 shipped"
+    assert preprocessor.preprocess(text)["text"] == "Your order 123 shipped"
+
+def test_html_quote_blocks_are_dropped():
+    html_body = '<div>Bonjour<br>ma commande?<div class="gmail_quote"><blockquote>ancien message</blockquote></div></div>'
+    result = preprocessor.preprocess(html_body, content_type="text/html")
+    assert result["text"] == "Bonjour\nma commande?"
+
+def test_contact_lines_after_sign_off_are_stripped():
+    for contact in ("+31 6 12345678", "www.jansen-design.nl", "jan@jansen.nl", "M: 06 1234 5678", "BTW NL123456789B01"):
+        text = f"Where is my order?\n\nKind regards,\nT. Jansen\n{contact}\nJansen Design BV"
+        assert preprocessor.preprocess(text)["text"] == "Where is my order?\n\nKind regards,\nT. Jansen", contact
+
+def test_html_unclosed_tags_inside_quote_do_not_leak_history():
+    html_body = "<div>Nieuwe vraag<blockquote><p>oud bericht<li>oude regel</blockquote></div>"
+    assert preprocessor.preprocess(html_body, content_type="text/html")["text"] == "Nieuwe vraag"
+    html_body = "<p>Nieuwe vraag</p><blockquote><p>oud<p>nog ouder</blockquote><p>Graag snel antwoord</p>"
+    assert preprocessor.preprocess(html_body, content_type="text/html")["text"] == "Nieuwe vraag\n\nGraag snel antwoord"
+
+def test_html_void_and_stray_tags_keep_content():
+    html_body = '<div>Lange<wbr>naam<table><col><col><tr><td>Order 123</td></tr></table></div></span>' \
+                '<p>Bedankt</p><div class="gmail_quote"><img src="x"><area><source>oud</div>'
+    assert preprocessor.preprocess(html_body, content_type="text/html")["text"] == "Langenaam\n\nOrder 123\n\nBedankt"
+
+def test_empty_text_falls_back_to_html():
+    result = preprocessor.preprocess("", html_content="<p>Messaggio inoltrato dal cliente</p>")
+    assert result["source"] == "html"
+    assert result["text"] == "Messaggio inoltrato dal cliente"
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
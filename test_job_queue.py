@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Test script for the MongoDB job queue: leasing, retries with backoff and dead letters
+"""
+import asyncio
+from datetime import datetime, timedelta
+import mongomock
+import worker
+from api.dependencies import services
+from config import settings
+from core.services.job_queue import JobQueue, PRIORITY_AI, PRIORITY_LOG_ONLY
+
+def job_queue(**options):
+    db = mongomock.MongoClient().dirq
+    queue = JobQueue(db.jobs, db.job_dead_letters, db.job_conversation_leases, **options)
+    queue.ensure_indexes()
+    return queue
+
+def make_visible(queue, job_id):
+    """Fast-forward past a lease or backoff"""
+    queue.jobs.update_one({"_id": job_id}, {"$set": {"available_at": datetime.utcnow() - timedelta(seconds=1)}})
+
+def expire_holds(queue):
+    queue.conversation_leases.update_many({}, {"$set": {"until": datetime.utcnow() - timedelta(seconds=1)}})
+
+def test_duplicate_enqueue_is_ignored():
+    queue = job_queue()
+    assert queue.enqueue("evt-1", {"n": 1}, traceparent="00-abc")
+    assert not queue.enqueue("evt-1", {"n": 2})
+    job = queue.jobs.find_one({"_id": "evt-1"})
+    assert job["payload"] == {"n": 1}
+    assert job["traceparent"] == "00-abc"
+
+def test_jobs_are_leased_by_priority_then_oldest_first():
+    queue = job_queue()
+    queue.enqueue("log-1", {}, PRIORITY_LOG_ONLY)
+    queue.enqueue("ai-1", {}, PRIORITY_AI)
+    queue.enqueue("ai-2", {}, PRIORITY_AI)
+    leased = [queue.lease("worker-1")["_id"] for _ in range(3)]
+    assert leased == ["ai-1", "ai-2", "log-1"]
+    assert queue.lease("worker-1") is None
+
+def test_leased_job_is_invisible_until_acked_or_expired():
+    queue = job_queue(visibility_timeout=60)
+    queue.enqueue("evt-1", {})
+    job = queue.lease("worker-1")
+    assert job["attempts"] == 1
+    assert job["leased_by"] == "worker-1"
+    assert queue.lease("worker-2") is None
+
+    # The worker died: once the visibility timeout runs out the job is leased again
+    make_visible(queue, "evt-1")
+    again = queue.lease("worker-2")
+    assert again["attempts"] == 2
+    # The first worker's late ack no longer matches the job
+    queue.ack(job)
+    assert queue.jobs.count_documents({}) == 1
+    queue.ack(again)
+    assert queue.jobs.count_documents({}) == 0
+
+def test_fail_retries_with_exponential_backoff():
+    queue = job_queue(retry_backoff=10, max_attempts=5)
+    queue.enqueue("evt-1", {})
+    delays = []
+    for _ in range(3):
+        job = queue.lease("worker-1")
+        before = datetime.utcnow()
+        assert queue.fail(job, "boom") == "retried"
+        stored = queue.jobs.find_one({"_id": "evt-1"})
+        delays.append(round((stored["available_at"] - before).total_seconds()))
+        assert stored["leased_by"] is None
+        assert stored["last_error"] == "boom"
+        assert queue.lease("worker-1") is None
+        make_visible(queue, "evt-1")
+    assert delays == [10, 20, 40]
+
+def test_fail_with_explicit_delay():
+    queue = job_queue(retry_backoff=10)
+    queue.enqueue("evt-1", {})
+    job = queue.lease("worker-1")
+    before = datetime.utcnow()
+    queue.fail(job, "Event leased by another worker", 90)
+    stored = queue.jobs.find_one({"_id": "evt-1"})
+    assert round((stored["available_at"] - before).total_seconds()) == 90
+
+def test_job_is_dead_lettered_after_max_attempts():
+    queue = job_queue(max_attempts=2, retry_backoff=1)
+    queue.enqueue("evt-1", {"n": 1})
+    assert queue.fail(queue.lease("worker-1"), "first") == "retried"
+    make_visible(queue, "evt-1")
+    assert queue.fail(queue.lease("worker-1"), "second") == "dead_lettered"
+    assert queue.jobs.count_documents({}) == 0
+    dead = queue.dead_letters.find_one({"_id": "evt-1"})
+    assert dead["last_error"] == "second"
+    assert dead["attempts"] == 2
+
+def test_expired_last_attempt_is_dead_lettered_on_lease():
+    queue = job_queue(max_attempts=1)
+    queue.enqueue("evt-1", {})
+    queue.enqueue("evt-2", {})
+    queue.lease("worker-1")
+    make_visible(queue, "evt-1")
+    # evt-1 has no attempts left; the lease moves on to the next job
+    assert queue.lease("worker-2")["_id"] == "evt-2"
+    dead = queue.dead_letters.find_one({"_id": "evt-1"})
+    assert dead["last_error"] == "Visibility timeout expired on the last attempt"
+
+def test_requeue_dead_letters_restores_fresh_jobs():
+    queue = job_queue(max_attempts=1)
+    queue.enqueue("evt-1", {"n": 1}, PRIORITY_AI, "00-abc")
+    queue.enqueue("evt-2", {"n": 2})
+    queue.fail(queue.lease("worker-1"), "boom")
+    queue.fail(queue.lease("worker-1"), "boom")
+    assert queue.requeue_dead_letters("evt-1") == 1
+    assert queue.dead_letters.count_documents({}) == 1
+    job = queue.lease("worker-1")
+    assert (job["_id"], job["attempts"], job["priority"], job["traceparent"]) == ("evt-1", 1, PRIORITY_AI, "00-abc")
+    assert queue.requeue_dead_letters() == 1
+    assert queue.dead_letters.count_documents({}) == 0
+
+def test_stats_count_ready_in_flight_delayed_and_dead_letters():
+    queue = job_queue(max_attempts=1)
+    assert queue.stats() == {"ready": 0, "in_flight": 0, "delayed": 0, "lag_seconds": 0.0, "dead_letters": 0}
+    for job_id in ("evt-1", "evt-2", "evt-3", "evt-4"):
+        queue.enqueue(job_id, {})
+    queue.lease("worker-1")
+    queue.fail(queue.lease("worker-1"), "boom")
+    queue.jobs.update_one({"_id": "evt-3"}, {"$set": {"available_at": datetime.utcnow() + timedelta(seconds=30)}})
+    queue.jobs.update_one({"_id": "evt-4"}, {"$set": {"available_at": datetime.utcnow() - timedelta(seconds=5)}})
+    stats = queue.stats()
+    assert (stats["ready"], stats["in_flight"], stats["delayed"], stats["dead_letters"]) == (1, 1, 1, 1)
+    assert stats["lag_seconds"] >= 5
+
+def test_conversation_runs_on_one_worker_at_a_time():
+    queue = job_queue()
+    queue.enqueue("c1-a", {"conversation_id": 1}, PRIORITY_AI)
+    queue.enqueue("c1-b", {"conversation_id": 1}, PRIORITY_AI)
+    queue.enqueue("c2-a", {"conversation_id": 2}, PRIORITY_LOG_ONLY)
+
+    first = queue.lease("worker-1")
+    assert first["_id"] == "c1-a"
+    # worker-2 skips the conversation worker-1 is running
+    assert queue.lease("worker-2")["_id"] == "c2-a"
+    assert queue.lease("worker-2") is None
+    # worker-1 takes the rest of its conversation, so its lock and coalescer see it
+    second = queue.lease("worker-1")
+    assert second["_id"] == "c1-b"
+    assert queue.conversation_leases.find_one({"_id": 1})["jobs"] == 2
+
+    queue.ack(first)
+    assert queue.conversation_leases.find_one({"_id": 1})["worker"] == "worker-1"
+    queue.fail(second, "boom", 0)
+    assert queue.conversation_leases.find_one({"_id": 1}) is None
+    assert queue.lease("worker-2")["_id"] == "c1-b"
+
+def test_conversation_jobs_are_leased_oldest_first():
+    queue = job_queue()
+    queue.enqueue("c1-log", {"conversation_id": 1}, PRIORITY_LOG_ONLY)
+    queue.enqueue("c1-ai", {"conversation_id": 1}, PRIORITY_AI)
+    assert [queue.lease("worker-1")["_id"] for _ in range(2)] == ["c1-log", "c1-ai"]
+
+def test_conversation_hold_expires_with_its_worker():
+    queue = job_queue(visibility_timeout=60)
+    queue.enqueue("c1-a", {"conversation_id": 1})
+    queue.enqueue("c1-b", {"conversation_id": 1})
+    queue.lease("worker-1")
+    assert queue.lease("worker-2") is None
+    # worker-1 died: its hold runs out together with the job's visibility timeout
+    expire_holds(queue)
+    make_visible(queue, "c1-a")
+    assert queue.lease("worker-2")["_id"] == "c1-a"
+    assert queue.conversation_leases.find_one({"_id": 1})["worker"] == "worker-2"
+
+def test_dead_letter_releases_the_conversation():
+    queue = job_queue(max_attempts=1)
+    queue.enqueue("c1-a", {"conversation_id": 1})
+    queue.enqueue("c1-b", {"conversation_id": 1})
+    queue.fail(queue.lease("worker-1"), "boom")
+    assert queue.dead_letters.find_one({"_id": "c1-a"}) is not None
+    assert queue.lease("worker-2")["_id"] == "c1-b"
+
+def test_defer_at_the_last_attempt_does_not_dead_letter():
+    queue = job_queue(max_attempts=2, retry_backoff=1)
+    queue.enqueue("c1-a", {"conversation_id": 1})
+    queue.fail(queue.lease("worker-1"), "boom")
+    make_visible(queue, "c1-a")
+    last = queue.lease("worker-1")
+    assert last["attempts"] == 2
+
+    before = datetime.utcnow()
+    queue.defer(last, 90, "Event leased by another worker")
+    stored = queue.jobs.find_one({"_id": "c1-a"})
+    assert stored["attempts"] == 1
+    assert stored["leased_by"] is None
+    assert round((stored["available_at"] - before).total_seconds()) == 90
+    assert queue.dead_letters.count_documents({}) == 0
+    assert queue.conversation_leases.count_documents({}) == 0
+
+    make_visible(queue, "c1-a")
+    assert queue.lease("worker-2")["attempts"] == 2
+
+def test_worker_defers_a_job_whose_event_another_worker_holds(monkeypatch):
+    class EventLeasedElsewhere:
+        def event_state(self, event_id):
+            return "leased"
+
+    async def duplicate(event, deadline, traceparent=None):
+        return {"status": "duplicate_ignored"}
+
+    monkeypatch.setattr(worker.webhook, "process_queued_event", duplicate)
+    monkeypatch.setattr(services, "_mongodb_service", EventLeasedElsewhere())
+    queue = job_queue(max_attempts=1)
+    queue.enqueue("evt-1", {
+        "event_id": "evt-1", "conversation_id": 1, "conversation_created_at": "2025-09-04T16:11:44.000Z",
+        "message_id": "msg-1", "message_created_at": "2025-09-04T16:11:44.500Z", "text": "Hallo",
+        "author_id": "user-1", "author_email": "klant@example.com",
+    })
+    job = queue.lease("worker-1")
+
+    async def run():
+        runner = worker.Worker(concurrency=1, poll_interval=0.01)
+        await runner._slots.acquire()
+        await runner._process(queue, job)
+
+    asyncio.run(run())
+    stored = queue.jobs.find_one({"_id": "evt-1"})
+    assert stored["attempts"] == 0
+    assert stored["last_error"] == "Event leased by another worker"
+    assert stored["available_at"] > datetime.utcnow() + timedelta(seconds=settings.CHECKPOINT_LEASE_SECONDS - 5)
+    assert queue.dead_letters.count_documents({}) == 0
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-conversation FIFO lock table
+"""
+import asyncio
+import pytest
+from utils.keyed_lock import KeyedLock
+
+def test_same_key_runs_in_arrival_order_one_at_a_time():
+    async def run():
+        locks = KeyedLock()
+        order = []
+        running = 0
+        peak = 0
+
+        async def event(name):
+            nonlocal running, peak
+            async with locks.hold("conv-1"):
+                running += 1
+                peak = max(peak, running)
+                order.append(name)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        tasks = [asyncio.create_task(event(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        depth = locks.depth("conv-1")
+        await asyncio.gather(*tasks)
+        return locks, order, peak, depth
+
+    locks, order, peak, depth = asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+    assert peak == 1
+    assert depth == 4
+    assert locks.max_depth_seen == 4
+
+def test_different_keys_run_in_parallel():
+    async def run():
+        locks = KeyedLock()
+        inside = asyncio.Event()
+
+        async def first():
+            async with locks.hold("conv-1"):
+                await asyncio.wait_for(inside.wait(), 1.0)
+
+        async def second():
+            async with locks.hold("conv-2"):
+                inside.set()
+
+        await asyncio.gather(first(), second())
+        return locks
+
+    assert len(asyncio.run(run())) == 0
+
+def test_entry_is_dropped_once_no_event_holds_or_waits():
+    async def run():
+        locks = KeyedLock()
+        async with locks.hold("conv-1"):
+            held = len(locks)
+        return locks, held
+
+    locks, held = asyncio.run(run())
+    assert held == 1
+    assert len(locks) == 0
+    assert locks.depth("conv-1") == 0
+
+def test_entry_is_dropped_after_exception_and_cancelled_waiter():
+    async def run():
+        locks = KeyedLock()
+
+        with pytest.raises(RuntimeError):
+            async with locks.hold("conv-1"):
+                raise RuntimeError("pipeline failed")
+        after_error = len(locks)
+
+        release = asyncio.Event()
+
+        async def holder():
+            async with locks.hold("conv-2"):
+                await release.wait()
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(locks.hold("conv-2").__aenter__())
+        await asyncio.sleep(0)
+        depth_while_waiting = locks.depth("conv-2")
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        depth_after_cancel = locks.depth("conv-2")
+        release.set()
+        await holding
+        return locks, after_error, depth_while_waiting, depth_after_cancel
+
+    locks, after_error, depth_while_waiting, depth_after_cancel = asyncio.run(run())
+    assert after_error == 0
+    assert depth_while_waiting == 1
+    assert depth_after_cancel == 0
+    assert len(locks) == 0
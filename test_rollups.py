@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the time-bucketed conversation rollups
+"""
+from datetime import datetime
+import mongomock
+from core.services.archive_service import ConversationArchiveService
+from core.services.rollup_service import ConversationRollupService, derived_rates, rollup_increments
+
+LOGGED_AT = datetime(2025, 9, 4, 12, 30, 0)
+
+def processed(**fields):
+    doc = {
+        "conversation_id": 1, "logged_at": LOGGED_AT, "ai_response": "Uw bestelling is onderweg.",
+        "is_initial_message": True, "handoff_required": False, "dixa_message_sent": True,
+        "slack_notification_sent": True, "openai_failed": False,
+        "deadline": {"elapsed_ms": 1200, "exceeded": False},
+    }
+    doc.update(fields)
+    return doc
+
+def test_openai_error_reply_counts_as_failure():
+    increments = rollup_increments(processed(ai_response="Error: Request timed out", openai_failed=True,
+                                             dixa_message_sent=False))
+    assert increments["failures.openai"] == 1
+
+def test_empty_reply_is_not_an_openai_failure():
+    assert "failures.openai" not in rollup_increments(processed(ai_response=""))
+    assert "failures.openai" not in rollup_increments(processed())
+
+def test_documents_logged_before_the_flag_use_the_error_reply():
+    legacy = processed(ai_response="Error: No response content received from OpenAI")
+    del legacy["openai_failed"]
+    assert rollup_increments(legacy)["failures.openai"] == 1
+    del legacy["ai_response"]
+    assert "failures.openai" not in rollup_increments(legacy)
+
+def test_openai_failure_rate_over_recorded_conversations():
+    rollups = ConversationRollupService(mongomock.MongoClient().dirq.conversation_rollups)
+    rollups.record(processed())
+    rollups.record(processed(ai_response="Error: boom", openai_failed=True, handoff_required=True,
+                             dixa_message_sent=False))
+    result = rollups.query("hour", LOGGED_AT.replace(minute=0), LOGGED_AT.replace(hour=13))
+    assert result["totals"]["failures"]["openai"] == 1
+    assert result["totals"]["rates"]["openai_failure_rate"] == 0.5
+    assert derived_rates({})["openai_failure_rate"] is None
+
+def archived_history():
+    db = mongomock.MongoClient().dirq
+    db.conversations.insert_many([
+        processed(conversation_id=1),
+        processed(conversation_id=2, ai_response="Error: boom", openai_failed=True, handoff_required=True,
+                  dixa_message_sent=False, openai_usage={"input_tokens": 100, "output_tokens": 20, "cost_usd": 0.01}),
+        processed(conversation_id=3, skipped_reason="Not an initial message", is_initial_message=False),
+    ])
+    return db, ConversationRollupService(db.conversation_rollups), ConversationArchiveService(db.conversations, db.conversations_archive)
+
+def rebuilt_totals(db, rollups):
+    rollups.rebuild(db.conversations, LOGGED_AT, LOGGED_AT)
+    return rollups.query("day", LOGGED_AT, LOGGED_AT.replace(hour=23))["totals"]
+
+def test_rebuild_over_archived_range_matches_live_counts():
+    db, rollups, archive = archived_history()
+    before = rebuilt_totals(db, rollups)
+    assert archive.archive_older_than(days=0)["archived"] == 3
+    assert db.conversations.find_one({"conversation_id": 2}).get("ai_response") is None
+    assert rebuilt_totals(db, rollups) == before
+    assert before["failures"]["openai"] == 1
+    assert before["initial_messages"] == 2
+    assert before["latency_ms"]["count"] == 3
+    assert before["openai"]["input_tokens"] == 100
+
+def test_stubs_archived_without_rollup_fields_are_restored_from_the_archive():
+    db, rollups, archive = archived_history()
+    db.conversations.update_many({}, {"$unset": {"openai_failed": ""}})
+    before = rebuilt_totals(db, rollups)
+    archive.archive_older_than(days=0)
+    # Stubs as they were cut before they kept the rollup fields
+    db.conversations.update_many({}, {"$unset": {field: "" for field in (
+        "openai_failed", "is_initial_message", "slack_notification_sent", "deadline", "openai_usage")}})
+    assert archive.restore_stub_fields(batch_size=2) == 3
+    assert archive.restore_stub_fields() == 0
+    assert rebuilt_totals(db, rollups) == before
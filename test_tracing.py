@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Test script for W3C traceparent parsing
+"""
+from utils.tracing import _parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+def test_valid_traceparent_is_parsed():
+    assert _parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert _parse_traceparent(f" 00-{TRACE_ID}-{PARENT_ID}-00 ") == (TRACE_ID, PARENT_ID, False)
+
+def test_malformed_traceparent_is_ignored():
+    for header in (
+        None,
+        "",
+        f"00-{TRACE_ID}-{PARENT_ID}-zz",
+        f"00-{TRACE_ID}-{PARENT_ID}",
+        f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+        f"00-{'g' * 32}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{'x' * 16}-01",
+        f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+        f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01",
+        f"ff-{TRACE_ID}-{PARENT_ID}-01",
+    ):
+        assert _parse_traceparent(header) is None, header
+
+def test_all_zero_ids_are_rejected():
+    assert _parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert _parse_traceparent(f"00-{TRACE_ID}-{'0' * 16}-01") is None
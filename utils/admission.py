@@ -0,0 +1,77 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from utils.metrics import registry
+
+IN_FLIGHT = registry.gauge("dirq_webhooks_in_flight", "Webhooks currently being processed")
+QUEUED = registry.gauge("dirq_webhooks_queued", "Webhooks waiting for an admission slot")
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "dirq_admission_queue_wait_seconds",
+    "Time admitted webhooks spent waiting for a slot",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+SHED_TOTAL = registry.counter(
+    "dirq_webhooks_shed_total",
+    "Webhooks rejected with 503 by admission control",
+    labelnames=("reason",)
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the Retry-After hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number of in-flight requests with a short waiting queue
+    Requests beyond max_in_flight wait for a slot for at most max_queue_wait
+    seconds; when more than max_queue are already waiting, or the wait times
+    out, the request is rejected so the caller can retry later.
+    A max_in_flight of 0 disables admission control.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_wait: float, retry_after: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._semaphore is not None and self._semaphore.locked():
+            if self.queued >= self.max_queue:
+                SHED_TOTAL.labels("queue_full").inc()
+                raise AdmissionRejected("queue_full", self.retry_after)
+            self.queued += 1
+            QUEUED.set(self.queued)
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_queue_wait)
+            except asyncio.TimeoutError:
+                SHED_TOTAL.labels("queue_timeout").inc()
+                raise AdmissionRejected("queue_timeout", self.retry_after)
+            finally:
+                self.queued -= 1
+                QUEUED.set(self.queued)
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+        elif self._semaphore is not None:
+            await self._semaphore.acquire()
+            QUEUE_WAIT_SECONDS.observe(0.0)
+
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight)
+            if self._semaphore is not None:
+                self._semaphore.release()
@@ -0,0 +1,93 @@
+import time
+from typing import Any, Dict, List, Optional
+from utils.metrics import registry
+
+DEADLINE_EXCEEDED_TOTAL = registry.counter(
+    "dirq_deadline_exceeded_total",
+    "Webhooks whose end-to-end budget ran out, by the stage where it happened",
+    labelnames=("stage",)
+)
+STAGES_SKIPPED_TOTAL = registry.counter(
+    "dirq_deadline_stages_skipped_total",
+    "Optional stages skipped because the remaining budget was too low",
+    labelnames=("stage",)
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a call is attempted after the webhook budget ran out"""
+
+
+class Deadline:
+    """
+    End-to-end time budget for one webhook
+    Created when the webhook arrives and passed to every service call, which
+    uses the remaining budget as its timeout. Mandatory calls (idempotency
+    bookkeeping) can ask for a small floor so they still run after expiry.
+    """
+
+    __slots__ = ("budget", "started_at", "expires_at", "exceeded_at", "skipped_stages")
+
+    def __init__(self, budget_seconds: float):
+        self.budget = budget_seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_seconds
+        self.exceeded_at: Optional[str] = None
+        self.skipped_stages: List[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None, floor: float = 0.0) -> float:
+        """
+        Timeout for the next call: the remaining budget, capped by the call's own default
+
+        Raises:
+            DeadlineExceeded: if the budget is spent and no floor was requested
+        """
+        remaining = self.remaining()
+        if remaining <= 0 and floor <= 0:
+            raise DeadlineExceeded(f"Deadline of {self.budget}s exceeded")
+        if cap is not None:
+            remaining = min(remaining, cap)
+        return max(remaining, floor)
+
+    def allows(self, stage: str, min_seconds: float) -> bool:
+        """Whether an optional stage should run; records the skip if not"""
+        if self.remaining() >= min_seconds:
+            return True
+        self.skipped_stages.append(stage)
+        STAGES_SKIPPED_TOTAL.labels(stage).inc()
+        return False
+
+    def check(self, stage: str) -> bool:
+        """Record the first stage that finished past the deadline; returns True if expired"""
+        if self.expired:
+            if self.exceeded_at is None:
+                self.exceeded_at = stage
+                DEADLINE_EXCEEDED_TOTAL.labels(stage).inc()
+            return True
+        return False
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "budget_s": self.budget,
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+            "exceeded": self.exceeded_at is not None,
+            "exceeded_at": self.exceeded_at,
+            "skipped_stages": self.skipped_stages
+        }
+
+
+def timeout_for(deadline: Optional[Deadline], default: Optional[float], floor: float = 0.0) -> Optional[float]:
+    """Timeout for a call that may or may not run under a deadline"""
+    if deadline is None:
+        return default
+    return deadline.timeout(default, floor)
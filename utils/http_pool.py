@@ -0,0 +1,70 @@
+import logging
+import time
+from typing import Any, Dict
+from urllib.parse import urlsplit
+import httpx
+from config import settings, per_worker
+from utils.tracing import traced_async_client
+
+logger = logging.getLogger(__name__)
+
+
+def pooled_async_client(timeout: float) -> httpx.AsyncClient:
+    """
+    Long-lived traced client for one upstream API
+    Reusing it keeps TCP and TLS connections alive between webhooks instead of
+    paying the handshakes on every call; per-call timeouts are passed per request.
+    Connection limits are instance-wide and divided between worker processes.
+    """
+    return traced_async_client(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=per_worker(settings.HTTP_POOL_MAX_CONNECTIONS),
+            max_keepalive_connections=per_worker(settings.HTTP_POOL_MAX_KEEPALIVE),
+            keepalive_expiry=settings.HTTP_POOL_KEEPALIVE_SECONDS
+        )
+    )
+
+
+async def warm_connection(client: httpx.AsyncClient, url: str, timeout: float = 5.0) -> Dict[str, Any]:
+    """
+    Open a pooled connection (DNS, TCP, TLS) to the host of `url` ahead of real traffic
+    Any HTTP response counts as success: only the connection matters, and a
+    HEAD to the API root usually answers 404 or 405.
+    """
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    started = time.perf_counter()
+    try:
+        response = await client.head(origin, timeout=timeout)
+        return {"success": True, "host": parts.netloc, "status_code": response.status_code,
+                "ms": round((time.perf_counter() - started) * 1000, 1)}
+    except httpx.HTTPError as e:
+        logger.warning("⚠️  Could not pre-connect to %s: %s: %s", parts.netloc, type(e).__name__, e)
+        return {"success": False, "host": parts.netloc, "error": f"{type(e).__name__}: {e}"}
+
+
+def pool_stats(client: httpx.AsyncClient) -> Dict[str, Any]:
+    """
+    Connection usage of a client's pool, read from the httpcore pool
+    Cheap and I/O-free (it only counts list entries); empty when the client
+    does not use the standard transport.
+    """
+    transport = getattr(client, "_transport", None)
+    transport = getattr(transport, "_transport", transport)  # unwrap TracingTransport
+    pool = getattr(transport, "_pool", None)
+    if pool is None:
+        return {}
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+    waiting = sum(1 for request in list(getattr(pool, "_requests", [])) if request.is_queued())
+    maximum = getattr(pool, "_max_connections", None)
+    active = len(connections) - idle
+    return {
+        "connections": len(connections),
+        "active": active,
+        "idle": idle,
+        "waiting": waiting,
+        "max": maximum,
+        "saturation": round(active / maximum, 3) if maximum else None,
+    }
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable
+from utils.metrics import registry
+
+LOCK_WAIT_SECONDS = registry.histogram(
+    "dirq_conversation_lock_wait_seconds",
+    "Time spent waiting for the per-conversation lock",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+MAILBOX_DEPTH = registry.gauge(
+    "dirq_conversation_mailbox_depth",
+    "Events waiting behind a running event of the same conversation"
+)
+ACTIVE_KEYS = registry.gauge(
+    "dirq_conversation_locks_active",
+    "Conversations with a running or queued event"
+)
+
+
+class _KeyEntry:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class KeyedLock:
+    """
+    Per-key FIFO locks for ordered execution within a conversation
+    Events for the same key run one at a time in arrival order while different
+    keys run fully in parallel. Entries are reference counted and dropped as
+    soon as no event holds or waits for them, so idle conversations cost nothing.
+    All access happens on the event loop thread, so the table needs no sharding
+    or extra locking.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _KeyEntry] = {}
+        self.max_depth_seen = 0
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _KeyEntry()
+            ACTIVE_KEYS.set(len(self._entries))
+        entry.users += 1
+
+        queued = entry.lock.locked()
+        if queued:
+            MAILBOX_DEPTH.inc()
+            self.max_depth_seen = max(self.max_depth_seen, entry.users - 1)
+        started = time.perf_counter()
+        try:
+            await entry.lock.acquire()
+        except BaseException:
+            self._release_entry(key, entry)
+            raise
+        finally:
+            if queued:
+                MAILBOX_DEPTH.dec()
+        LOCK_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+        try:
+            yield
+        finally:
+            entry.lock.release()
+            self._release_entry(key, entry)
+
+    def _release_entry(self, key: Hashable, entry: _KeyEntry) -> None:
+        entry.users -= 1
+        if entry.users == 0 and self._entries.get(key) is entry:
+            del self._entries[key]
+            ACTIVE_KEYS.set(len(self._entries))
+
+    def depth(self, key: Hashable) -> int:
+        """Number of events queued behind the running one for this key"""
+        entry = self._entries.get(key)
+        return max(0, entry.users - 1) if entry else 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,16 +1,264 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import orjson
+from utils.metrics import registry
+
+LOG_RECORDS_DROPPED = registry.counter(
+    "dirq_log_records_dropped_total",
+    "Log records dropped before reaching the output (queue_full, sampled)",
+    labelnames=("reason",)
+)
+
+# Per-request correlation ID and extra fields attached to every record logged in that request
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+log_context: ContextVar[Dict[str, object]] = ContextVar("log_context", default={})
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s"
+
+APP_LOGGERS = ("main", "__main__", "api", "core", "models", "utils")
+THIRD_PARTY_LOGGERS = ("httpx", "httpcore", "pymongo", "openai", "slack_sdk", "urllib3")
+
+PROFILES = {
+    "development": {"format": "text", "level": "DEBUG", "third_party_level": "INFO", "compact": False},
+    "production": {"format": "json", "level": "INFO", "third_party_level": "WARNING", "compact": True},
+}
+
+# Attributes every LogRecord has; anything else was passed via extra= and goes into the JSON
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "correlation_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_correlation_id(value: Optional[str] = None) -> str:
+    """Set the correlation ID for the current request context (generated if not given)"""
+    value = value or uuid.uuid4().hex[:16]
+    correlation_id.set(value)
+    return value
+
+
+def bind_log_context(**fields) -> None:
+    """Attach fields (e.g. event_id, conversation_id) to every record of the current request"""
+    log_context.set({**log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request context onto the record; runs in the caller's thread, before queueing"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        context = log_context.get()
+        if context:
+            record.context = context
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps only a fraction of DEBUG records for the configured logger prefixes
+    The decision is made per correlation ID, so a sampled request keeps all of
+    its debug lines instead of a random scattering across requests.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def _rate_for(self, name: str) -> Optional[float]:
+        if name not in self._resolved:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + ".")]
+            self._resolved[name] = self.rates[max(matches, key=len)] if matches else None
+        return self._resolved[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate_for(record.name)
+        if rate is None:
+            return True
+        request_id = getattr(record, "correlation_id", "-")
+        if request_id != "-":
+            keep = zlib.crc32(request_id.encode()) / 0xFFFFFFFF < rate
+        else:
+            keep = random.random() < rate
+        if not keep:
+            LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return keep
+
+
+class CompactFilter(logging.Filter):
+    """Drops purely decorative lines (e.g. "=" * 80 separators) in the production profile"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not (isinstance(record.msg, str) and not record.args and record.msg and not record.msg.strip("=-─ "))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, correlation_id plus context and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage().strip(),
+            "correlation_id": getattr(record, "correlation_id", "-"),
+        }
+        context = getattr(record, "context", None)
+        if context:
+            entry.update(context)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key != "context":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them
+    Records never leave the process, so message interpolation and exception
+    rendering are deferred to the listener; a full queue drops the record
+    instead of blocking the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "logger=rate,logger=rate" into a dict, ignoring malformed entries"""
+    rates = {}
+    for item in spec.split(","):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+def setup_logging(level: Optional[str] = None, profile: Optional[str] = None, fmt: Optional[str] = None) -> None:
+    """
+    Configure logging for the application
+    Application code logs into a bounded in-memory queue; a single listener
+    thread formats records and writes them to stdout.
+    """
+    global _listener
+    from config import settings
+
+    profile_name = profile or settings.LOG_PROFILE
+    # An unknown profile must not turn on DEBUG (message content) in production
+    options = PROFILES.get(profile_name, PROFILES["production"])
+    app_level = getattr(logging, (level or settings.LOG_LEVEL or options["level"]).upper())
+    output_format = fmt or settings.LOG_FORMAT or options["format"]
+    sample_rates = parse_sample_rates(settings.LOG_DEBUG_SAMPLE_RATES)
+
+    if _listener is not None:
+        _listener.stop()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if output_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter())
+    if sample_rates:
+        queue_handler.addFilter(DebugSampler(sample_rates))
+    if options["compact"]:
+        queue_handler.addFilter(CompactFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, options["third_party_level"]))
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(app_level)
+    for name in THIRD_PARTY_LOGGERS:
+        logging.getLogger(name).setLevel(getattr(logging, options["third_party_level"]))
+    # Sampled loggers must emit DEBUG records for the sampler to choose from
+    for name in sample_rates:
+        logging.getLogger(name).setLevel(logging.DEBUG)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork() -> None:
+    """
+    The listener thread does not survive fork, and the inherited queue may hold
+    records the parent will also write: give the child a fresh queue and listener.
+    """
+    global _listener
+    queue_handler = next((h for h in logging.getLogger().handlers if isinstance(h, NonBlockingQueueHandler)), None)
+    if _listener is None or queue_handler is None:
+        return
+    handlers = _listener.handlers
+    queue_handler.queue = queue.Queue(maxsize=queue_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+class CorrelationIdMiddleware:
+    """
+    ASGI middleware binding a correlation ID to each HTTP request
+    Reuses an incoming X-Correlation-ID / X-Request-ID header when present and
+    echoes the ID back in the X-Correlation-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope["headers"]:
+            if key in (b"x-correlation-id", b"x-request-id"):
+                incoming = value.decode("latin-1")[:64]
+                break
+        request_id = bind_correlation_id(incoming)
+        log_context.set({})
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-correlation-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_with_id)
 
-def setup_logging(level: str = "INFO") -> None:
-    """Configure logging for the application"""
-    logging.basicConfig(
-        level=getattr(logging, level.upper()),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger instance for a module"""
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "dirq_event_loop_lag_seconds",
+    "Delay between when the watchdog heartbeat was due and when the loop ran it",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_LAG_QUANTILES = registry.gauge(
+    "dirq_event_loop_lag_recent_seconds",
+    "Event loop lag over the recent window, by quantile (0.5, 0.99, max)",
+    labelnames=("quantile",)
+)
+LOOP_BLOCKED_TOTAL = registry.counter(
+    "dirq_event_loop_blocked_total",
+    "Stalls longer than the threshold, by the application frame that was running",
+    labelnames=("location",)
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames outside the stdlib and installed packages count as application code when attributing a stall
+LIBRARY_PATHS = tuple({sysconfig.get_paths()[name] for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+class LoopLagWatchdog:
+    """
+    Measures event-loop scheduling lag and catches blocking calls in the act
+    A heartbeat task on the loop wakes every `interval` seconds and records how
+    late it ran. A separate thread watches the heartbeat; once it is overdue by
+    more than `threshold` the loop thread is stuck in synchronous code, so the
+    thread samples that thread's stack and attributes the stall to the
+    innermost application frame.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, window: int = 600, history: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self._recent_lags: Deque[float] = deque(maxlen=window)
+        self.blocked_calls: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.hotspots: Dict[str, Dict[str, float]] = {}
+        self._last_beat = time.monotonic()
+        self._stall_beat: Optional[float] = None
+        self._stall_record: Optional[Dict[str, Any]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running loop; must be called from the loop thread"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("🐕 Event loop watchdog started (interval %ss, threshold %ss)", self.interval, self.threshold)
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        ticks = 0
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._recent_lags.append(lag)
+            ticks += 1
+            if ticks % 10 == 0:
+                self._publish_quantiles()
+
+    def _publish_quantiles(self) -> None:
+        summary = self.lag_summary()
+        LOOP_LAG_QUANTILES.labels("0.5").set(summary["p50_ms"] / 1000)
+        LOOP_LAG_QUANTILES.labels("0.99").set(summary["p99_ms"] / 1000)
+        LOOP_LAG_QUANTILES.labels("max").set(summary["max_ms"] / 1000)
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._last_beat
+            stalled_for = time.monotonic() - beat - self.interval
+            if stalled_for < self.threshold:
+                self._stall_beat = None
+                continue
+            if self._stall_beat == beat:
+                # Same stall still going on: extend the record captured at its start
+                record = self._stall_record
+                if record is not None:
+                    record["stalled_ms"] = round(stalled_for * 1000, 1)
+                    hotspot = self.hotspots[record["location"]]
+                    hotspot["max_ms"] = max(hotspot["max_ms"], record["stalled_ms"])
+                continue
+            self._stall_beat = beat
+            self._stall_record = self._capture(stalled_for)
+
+    def _capture(self, stalled_for: float) -> Optional[Dict[str, Any]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        app_frames = [entry for entry in stack if not entry.filename.startswith(LIBRARY_PATHS)]
+        culprit = app_frames[-1] if app_frames else stack[-1]
+        leaf = stack[-1]
+        filename = culprit.filename
+        if filename.startswith(PROJECT_ROOT):
+            filename = os.path.relpath(filename, PROJECT_ROOT)
+        location = f"{filename}:{culprit.lineno} {culprit.name}"
+        record = {
+            "detected_at": time.time(),
+            "stalled_ms": round(stalled_for * 1000, 1),
+            "location": location,
+            "code": culprit.line,
+            "leaf": f"{leaf.filename}:{leaf.lineno} {leaf.name}",
+            "stack": traceback.format_list(stack[-15:]),
+        }
+        self.blocked_calls.append(record)
+        hotspot = self.hotspots.setdefault(location, {"count": 0, "max_ms": 0.0})
+        hotspot["count"] += 1
+        hotspot["max_ms"] = max(hotspot["max_ms"], record["stalled_ms"])
+        LOOP_BLOCKED_TOTAL.labels(location).inc()
+        logger.warning("🐢 EVENT LOOP BLOCKED for %.0fms+ at %s (leaf: %s)\n%s",
+                       stalled_for * 1000, location, record["leaf"], "".join(record["stack"]))
+        return record
+
+    def lag_summary(self) -> Dict[str, float]:
+        """Lag percentiles over the recent window, in milliseconds"""
+        samples: List[float] = sorted(self._recent_lags)
+        if not samples:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(samples),
+            "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+            "max_ms": round(samples[-1] * 1000, 2),
+        }
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_s": self.interval,
+            "threshold_s": self.threshold,
+            "lag": self.lag_summary(),
+            "hotspots": dict(sorted(self.hotspots.items(), key=lambda item: item[1]["count"], reverse=True)),
+            "recent_blocked_calls": list(self.blocked_calls),
+        }
@@ -0,0 +1,270 @@
+import bisect
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils import tracing
+
+# Default latency buckets in seconds (1ms .. 60s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    Base class for in-process metrics
+    Children are cached per label-value tuple so the hot path is a dict
+    lookup plus an attribute increment.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self.children.setdefault(key, self._new_child())
+        return child
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics, keyed by metric name"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _reset_locks_after_fork(self) -> None:
+        """A lock held by another thread at fork time would stay locked forever in the child"""
+        self._lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self.metrics.get(name)
+
+
+def histogram_quantile(child: _HistogramChild, quantile: float) -> Optional[float]:
+    """Estimate a quantile from histogram buckets (linear interpolation, like PromQL)"""
+    if not child.count:
+        return None
+    rank = quantile * child.count
+    cumulative = 0
+    lower = 0.0
+    for index, bucket_count in enumerate(child.counts):
+        upper = child.bounds[index] if index < len(child.bounds) else None
+        if cumulative + bucket_count >= rank and bucket_count:
+            if upper is None:
+                return lower
+            return lower + (upper - lower) * (rank - cumulative) / bucket_count
+        cumulative += bucket_count
+        if upper is not None:
+            lower = upper
+    return lower
+
+
+# Global registry instance
+registry = MetricsRegistry()
+os.register_at_fork(after_in_child=registry._reset_locks_after_fork)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_string(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render_prometheus(metrics_registry: MetricsRegistry = None) -> str:
+    """Render all metrics in the Prometheus text exposition format (0.0.4)"""
+    metrics_registry = metrics_registry or registry
+    lines: List[str] = []
+    for metric in list(metrics_registry.metrics.values()):
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, child in list(metric.children.items()):
+            if metric.kind == "histogram":
+                cumulative = 0
+                for bound, bucket_count in zip(child.bounds + (float("inf"),), child.counts):
+                    cumulative += bucket_count
+                    labels = _label_string(metric.labelnames, values, f'le="{_format_value(bound)}"')
+                    lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                labels = _label_string(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {_format_value(child.sum)}")
+                lines.append(f"{metric.name}_count{labels} {child.count}")
+            else:
+                labels = _label_string(metric.labelnames, values)
+                lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+    return "\n".join(lines) + "\n"
+
+
+STAGE_DURATION_SECONDS = registry.histogram(
+    "dirq_stage_duration_seconds",
+    "Duration of each webhook pipeline stage",
+    labelnames=("stage", "outcome")
+)
+
+
+class stage_timer:
+    """
+    Time one pipeline stage into dirq_stage_duration_seconds
+    The outcome defaults to "ok", becomes "error" if the block raises, and can
+    be set explicitly (e.g. from a service's success flag) before the block ends.
+    Inside a trace the stage is also recorded as a span, parenting any HTTP or
+    Mongo spans made during it.
+    """
+
+    __slots__ = ("stage", "outcome", "started", "span", "token")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "ok"
+
+    def __enter__(self) -> "stage_timer":
+        self.span = tracing.start_span(self.stage)
+        self.token = tracing.activate(self.span)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self.outcome = "error"
+        STAGE_DURATION_SECONDS.labels(self.stage, self.outcome).observe(time.perf_counter() - self.started)
+        if self.span is not None:
+            tracing.deactivate(self.token)
+            self.span.set_attribute("outcome", self.outcome)
+            if exc is not None:
+                self.span.record_error(exc)
+            elif self.outcome in ("error", "timeout"):
+                self.span.record_error(self.outcome)
+            self.span.end()
+        return False
+
+    def succeeded(self, success: bool) -> None:
+        """Set the outcome from a service result's success flag"""
+        self.outcome = "ok" if success else "error"
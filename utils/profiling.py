@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SLOW_PROFILES_TOTAL = registry.counter(
+    "dirq_slow_webhook_profiles_total",
+    "Webhooks slower than the profiling threshold whose profile was kept"
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilerBusy(Exception):
+    """Raised when a CPU profile is requested while another one is running"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _collapse(frames) -> str:
+    """Frames innermost-first -> "outer;...;inner" as used by flamegraph tools"""
+    return ";".join(_frame_label(frame.f_code) for frame in reversed(frames))
+
+
+def _walk(frame) -> List[Any]:
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    return frames
+
+
+def _await_chain(task: asyncio.Task) -> List[Any]:
+    """
+    Frames of a suspended task, innermost first
+    Task.get_stack() only returns the outermost frame of a suspended coroutine,
+    so follow the cr_await / ag_await links down to the innermost awaitable.
+    """
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None) \
+            or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None) \
+            or getattr(awaitable, "gi_yieldfrom", None)
+    return frames[::-1]
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """Collapsed-stack text (one "stack count" line per stack), ready for flamegraph.pl or speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_frames(stacks: Counter, limit: int = 15) -> List[Dict[str, Any]]:
+    """Leaf functions by share of samples"""
+    total = sum(stacks.values()) or 1
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [
+        {"frame": frame, "samples": count, "pct": round(100 * count / total, 1)}
+        for frame, count in leaves.most_common(limit)
+    ]
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for a live process
+    A background thread reads the stacks of the target threads via
+    sys._current_frames() every `interval` seconds. Only one profile runs at a
+    time so an admin cannot stack up profilers on a struggling instance.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = 0.005, thread_id: Optional[int] = None) -> Dict[str, Any]:
+        """Blocking: sample for `seconds` and return collapsed stacks (run it in a worker thread)"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A CPU profile is already running")
+        try:
+            own_thread = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own_thread or (thread_id is not None and ident != thread_id):
+                        continue
+                    stacks[_collapse(_walk(frame))] += 1
+                samples += 1
+                time.sleep(interval)
+            return {"seconds": seconds, "interval_ms": interval * 1000, "samples": samples, "stacks": stacks}
+        finally:
+            self._lock.release()
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots diffed against a baseline taken at start (or the last reset)"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+    def diff(self, limit: int = 25, reset: bool = False) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing() or self._baseline is None:
+            return {"tracing": False, "error": "tracemalloc is not running; start it first"}
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        stats = snapshot.compare_to(self._baseline, "lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        if reset:
+            self._baseline = snapshot
+        return {
+            "tracing": True,
+            "traced_current_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "top_growth": [
+                {
+                    "location": str(stat.traceback[0]),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        self._baseline = None
+        return {"tracing": False}
+
+
+class _TrackedRequest:
+    __slots__ = ("event_id", "started", "stacks")
+
+    def __init__(self, event_id: str):
+        self.event_id = event_id
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+
+
+class SlowRequestProfiler:
+    """
+    Low-rate profiler that keeps the profile of slow webhooks only
+    While any webhook is tracked, a task on the event loop samples the await
+    chain of each tracked request's task every `interval` seconds, which shows
+    where the request is waiting (OpenAI, Dixa, Mongo, a lock...). When the
+    webhook finishes slower than `threshold` its top frames are kept with its
+    event_id; otherwise the samples are discarded.
+    """
+
+    def __init__(self, enabled: bool, threshold: float, interval: float = 0.01, history: int = 50):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.interval = interval
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._tracked: Dict[asyncio.Task, _TrackedRequest] = {}
+        self._sampler: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def track(self, event_id: str):
+        task = asyncio.current_task() if self.enabled else None
+        if task is None:
+            yield
+            return
+        tracked = self._tracked[task] = _TrackedRequest(event_id)
+        if self._sampler is None or self._sampler.done():
+            self._sampler = asyncio.get_running_loop().create_task(self._sample())
+        try:
+            yield
+        finally:
+            del self._tracked[task]
+            duration = time.perf_counter() - tracked.started
+            if duration >= self.threshold and tracked.stacks:
+                self._keep(tracked, duration)
+
+    async def _sample(self) -> None:
+        while self._tracked:
+            await asyncio.sleep(self.interval)
+            for task, tracked in list(self._tracked.items()):
+                frames = _await_chain(task)
+                if frames:
+                    tracked.stacks[_collapse(frames)] += 1
+
+    def _keep(self, tracked: _TrackedRequest, duration: float) -> None:
+        record = {
+            "event_id": tracked.event_id,
+            "duration_ms": round(duration * 1000, 1),
+            "recorded_at": time.time(),
+            "samples": sum(tracked.stacks.values()),
+            "top_frames": top_frames(tracked.stacks, limit=10),
+            "top_stacks": [
+                {"stack": stack, "samples": count} for stack, count in tracked.stacks.most_common(5)
+            ],
+        }
+        self.profiles.append(record)
+        SLOW_PROFILES_TOTAL.inc()
+        logger.warning("🐌 SLOW WEBHOOK %s took %.0fms - top frames: %s",
+                       tracked.event_id, record["duration_ms"],
+                       ", ".join(f"{frame['frame']} {frame['pct']}%" for frame in record["top_frames"][:3]))
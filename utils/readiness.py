@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import orjson
+from utils.metrics import STAGE_DURATION_SECONDS, registry
+
+logger = logging.getLogger(__name__)
+
+READY = registry.gauge("dirq_ready", "1 while the readiness snapshot reports ready")
+READINESS_REFRESH_SECONDS = registry.histogram(
+    "dirq_readiness_refresh_seconds",
+    "Time taken to refresh the readiness snapshot",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Pipeline stages that call an upstream dependency, and the outcomes that count as failures
+UPSTREAM_STAGES = ("claim", "dashboard", "openai", "dixa_send", "transfer", "slack", "mongo_log")
+FAILED_OUTCOMES = frozenset({"error", "timeout"})
+
+
+class UpstreamOutcomes:
+    """
+    Recent call outcomes per upstream, from the stage duration histogram
+    Each call to window() returns the calls and failures recorded since the
+    previous call, so the readiness loop sees each dependency's error rate
+    over its refresh interval without making any request of its own.
+    """
+
+    def __init__(self, degraded_error_rate: float = 0.5, min_calls: int = 3):
+        self.degraded_error_rate = degraded_error_rate
+        self.min_calls = min_calls
+        self._previous: Dict[Tuple[str, ...], int] = {}
+
+    def window(self) -> Dict[str, Dict[str, Any]]:
+        calls = {stage: 0 for stage in UPSTREAM_STAGES}
+        failures = {stage: 0 for stage in UPSTREAM_STAGES}
+        for key, child in list(STAGE_DURATION_SECONDS.children.items()):
+            stage, outcome = key
+            if stage not in calls:
+                continue
+            delta = child.count - self._previous.get(key, 0)
+            self._previous[key] = child.count
+            calls[stage] += delta
+            if outcome in FAILED_OUTCOMES:
+                failures[stage] += delta
+        report = {}
+        for stage in UPSTREAM_STAGES:
+            error_rate = failures[stage] / calls[stage] if calls[stage] else None
+            if not calls[stage]:
+                state = "idle"
+            elif calls[stage] >= self.min_calls and error_rate >= self.degraded_error_rate:
+                state = "degraded"
+            else:
+                state = "ok"
+            report[stage] = {
+                "calls": calls[stage],
+                "failures": failures[stage],
+                "error_rate": round(error_rate, 3) if error_rate is not None else None,
+                "state": state,
+            }
+        return report
+
+
+class ReadinessMonitor:
+    """
+    Serves readiness from a snapshot refreshed by a background task
+    The snapshot is collected every `interval` seconds and stored already
+    serialized, so a readiness probe is a lookup with no I/O however often
+    the platform polls, and probe bursts never reach Mongo or the APIs. A
+    snapshot older than `stale_after` seconds counts as not ready: the
+    refresh task itself is stuck or the loop is starved.
+    """
+
+    STALE_BODY = orjson.dumps({"status": "stale", "ready": False, "reasons": ["snapshot_stale"]})
+
+    def __init__(self, interval: float, stale_after: float):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.ready = False
+        self.body = orjson.dumps({"status": "starting", "ready": False, "reasons": ["starting"]})
+        self.refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, collect: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        """Refresh from `collect` in a background task; must be called from the running loop"""
+        self._task = asyncio.get_running_loop().create_task(self._run(collect))
+
+    async def _run(self, collect: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                snapshot = await collect()
+            except Exception as e:
+                logger.warning("⚠️  Readiness refresh failed: %s: %s", type(e).__name__, e)
+                snapshot = {"ready": False, "reasons": [f"refresh_failed: {type(e).__name__}"]}
+            elapsed = time.perf_counter() - started
+            READINESS_REFRESH_SECONDS.observe(elapsed)
+            self.publish(snapshot, elapsed)
+            await asyncio.sleep(self.interval)
+
+    def publish(self, snapshot: Dict[str, Any], elapsed: float = 0.0) -> None:
+        ready = bool(snapshot.get("ready"))
+        if ready != self.ready:
+            if ready:
+                logger.info("✅ Instance is ready")
+            else:
+                logger.warning("🚫 Instance is not ready: %s", ", ".join(snapshot.get("reasons", [])))
+        snapshot = {
+            "status": "ready" if ready else "not_ready",
+            **snapshot,
+            "pid": os.getpid(),
+            "checked_at": time.time(),
+            "refresh_ms": round(elapsed * 1000, 2),
+        }
+        self.ready = ready
+        self.body = orjson.dumps(snapshot, default=str)
+        self.refreshed_at = time.monotonic()
+        READY.set(1 if ready else 0)
+
+    def current(self) -> Tuple[bool, bytes]:
+        """(ready, serialized snapshot) without any I/O"""
+        if self.refreshed_at is not None and time.monotonic() - self.refreshed_at > self.stale_after:
+            return False, self.STALE_BODY
+        return self.ready, self.body
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
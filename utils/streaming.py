@@ -0,0 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator
+
+
+async def iterate_in_thread(chunks: Iterator[bytes], name: str = "stream") -> AsyncIterator[bytes]:
+    """
+    Drive a blocking chunk iterator (e.g. one reading a pymongo cursor) from async code
+    The next chunk is produced only after the previous one has been sent, so a
+    slow client slows the database reads down instead of filling memory. One
+    thread per stream runs the iterator, which lets the close on disconnect
+    wait for a read in progress instead of racing it.
+    """
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(reader, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        if hasattr(chunks, "close"):
+            reader.submit(chunks.close)
+        reader.shutdown(wait=False)
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """Handle returned by TimerWheel.schedule; cancel() is O(1)"""
+
+    __slots__ = ("callback", "rounds", "cancelled", "fired")
+
+    def __init__(self, callback: Callable[[], None], rounds: int):
+        self.callback = callback
+        self.rounds = rounds
+        self.cancelled = False
+        self.fired = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel driven by a single asyncio task
+    Scheduling and cancelling are O(1) and thousands of pending timers share
+    one tick task, which stops itself when no timers are pending.
+    Resolution is one tick; timers never fire early.
+    """
+
+    def __init__(self, tick_seconds: float = 0.05, slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self.slots: List[List[TimerHandle]] = [[] for _ in range(slots)]
+        self.cursor = 0
+        self.pending = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, delay_seconds: float, callback: Callable[[], None]) -> TimerHandle:
+        """Run callback (synchronously, on the event loop) after delay_seconds"""
+        # Round up so a timer never fires before its delay has elapsed
+        ticks = max(1, int(-(-delay_seconds // self.tick_seconds)))
+        rounds, offset = divmod(ticks, len(self.slots))
+        if offset == 0:
+            rounds, offset = rounds - 1, len(self.slots)
+        handle = TimerHandle(callback, rounds)
+        self.slots[(self.cursor + offset) % len(self.slots)].append(handle)
+        self.pending += 1
+        self._ensure_running()
+        return handle
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic() + self.tick_seconds
+        while self.pending:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            next_tick += self.tick_seconds
+            self._advance()
+
+    def _advance(self) -> None:
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        slot = self.slots[self.cursor]
+        if not slot:
+            return
+        remaining = []
+        for handle in slot:
+            if handle.cancelled:
+                self.pending -= 1
+            elif handle.rounds > 0:
+                handle.rounds -= 1
+                remaining.append(handle)
+            else:
+                self.pending -= 1
+                handle.fired = True
+                try:
+                    handle.callback()
+                except Exception as e:
+                    logger.error("Timer callback failed: %s: %s", type(e).__name__, str(e))
+        self.slots[self.cursor] = remaining
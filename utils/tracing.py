@@ -0,0 +1,457 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional
+import httpx
+import orjson
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+# Lowercase hex only, as the W3C Trace Context spec requires
+_TRACEPARENT = re.compile(r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Trace:
+    """All spans of one request; the keep/drop decision is made when the root span ends"""
+
+    __slots__ = ("trace_id", "sampled", "spans", "has_error")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.has_error = False
+
+
+class Span:
+    """
+    A timed operation within a trace (OpenTelemetry-compatible fields)
+    Spans are cheap to create: ids, a start timestamp and an attribute dict.
+    Nothing is exported until the whole trace finishes.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, kind: str = "internal", parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        trace.spans.append(self)
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: Any) -> None:
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        self.trace.has_error = True
+
+    def end(self) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class JsonlExporter:
+    """Appends one JSON line per span to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "ab") as output:
+            for span in spans:
+                output.write(orjson.dumps(span.to_dict(), default=str) + b"\n")
+
+
+class OtlpHttpExporter:
+    """Sends spans to an OTLP/HTTP collector using the JSON encoding (no SDK required)"""
+
+    def __init__(self, endpoint: str, service_name: str, headers: Optional[Dict[str, str]] = None):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.client = httpx.Client(timeout=5.0, headers={"Content-Type": "application/json", **(headers or {})})
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        return {"key": key, "value": encoded}
+
+    def _encode(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": KINDS.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [self._attribute(key, value) for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def export(self, spans: List[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{"scope": {"name": "dirq"}, "spans": [self._encode(span) for span in spans]}],
+            }]
+        }
+        response = self.client.post(self.url, content=orjson.dumps(body))
+        if response.status_code >= 300:
+            logger.warning("⚠️  OTLP export failed: HTTP %s", response.status_code)
+
+
+class Tracer:
+    """
+    Creates traces and hands finished ones to the exporters on a background thread
+    Every trace is recorded in memory; when the root span ends it is kept if it
+    was head-sampled, took longer than the slow threshold, or contains an error.
+    """
+
+    def __init__(self):
+        self.exporters: List[Any] = []
+        self.sample_rate = 0.0
+        self.slow_threshold = float("inf")
+        self._queue: "queue.Queue[List[Span]]" = queue.Queue(maxsize=1000)
+        self._worker: Optional[threading.Thread] = None
+        self.exported_traces = 0
+        self.dropped_traces = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def configure(self, exporters: List[Any], sample_rate: float, slow_threshold: float) -> None:
+        self.exporters = exporters
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    def finish(self, root: Span) -> None:
+        trace = root.trace
+        keep = trace.sampled or trace.has_error or root.duration_ms >= self.slow_threshold * 1000
+        if not keep:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._worker.start()
+        try:
+            self._queue.put_nowait(trace.spans)
+        except queue.Full:
+            self.dropped_traces += 1
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            for exporter in self.exporters:
+                try:
+                    exporter.export(spans)
+                except Exception as e:
+                    logger.warning("⚠️  Trace export failed (%s): %s", type(exporter).__name__, e)
+            self.exported_traces += 1
+
+    def shutdown(self) -> None:
+        """Export everything still queued before the process exits"""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def _reset_after_fork(self) -> None:
+        """The exporter thread does not survive fork; a child starts its own on first export"""
+        self._queue = queue.Queue(maxsize=1000)
+        self._worker = None
+
+
+tracer = Tracer()
+atexit.register(tracer.shutdown)
+os.register_at_fork(after_in_child=tracer._reset_after_fork)
+
+
+def _parse_traceparent(header: Optional[str]):
+    """
+    W3C traceparent "00-<trace_id>-<parent_id>-<flags>" -> (trace_id, parent_id, sampled)
+    None for anything malformed, so a bad header starts a new trace instead of failing the request.
+    """
+    if not header:
+        return None
+    match = _TRACEPARENT.fullmatch(header.strip())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, int(flags, 16) & 1 == 1
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes):
+    """
+    Open the root span of a request; yields None when tracing is disabled
+    An incoming W3C traceparent header continues the caller's trace and
+    inherits its sampling decision.
+    """
+    if not tracer.enabled:
+        yield None
+        return
+    parent = _parse_traceparent(traceparent)
+    if parent:
+        trace = Trace(parent[0], parent[2] or random.random() < tracer.sample_rate)
+        root = Span(trace, name, "server", parent[1], attributes)
+    else:
+        trace = Trace(_new_id(16), random.random() < tracer.sample_rate)
+        root = Span(trace, name, "server", None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+        tracer.finish(root)
+
+
+def start_span(name: str, kind: str = "internal", **attributes) -> Optional[Span]:
+    """Start a child of the current span without activating it; None outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+def activate(span: Optional[Span]) -> Optional[Token]:
+    """Make span the parent of spans started in this context; pair with deactivate()"""
+    return _current_span.set(span) if span is not None else None
+
+
+def deactivate(token: Optional[Token]) -> None:
+    if token is not None:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Child span around a block; yields None outside a trace"""
+    child = start_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """W3C traceparent header for outbound calls from the current span"""
+    active = _current_span.get()
+    if active is None:
+        return None
+    return f"00-{active.trace_id}-{active.span_id}-{'01' if active.trace.sampled else '00'}"
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport wrapper recording a client span per outbound request
+    Also propagates the trace to the callee via the traceparent header.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        child = start_span(f"HTTP {request.method}", "client", **{
+            "http.method": request.method,
+            "server.address": request.url.host,
+            "url.path": request.url.path,
+        })
+        if child is None:
+            return await self._transport.handle_async_request(request)
+        request.headers["traceparent"] = f"00-{child.trace_id}-{child.span_id}-{'01' if child.trace.sampled else '00'}"
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException as e:
+            child.record_error(e)
+            child.end()
+            raise
+        child.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            child.record_error(f"HTTP {response.status_code}")
+        child.end()
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def traced_async_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient whose requests become spans of the current trace"""
+    # httpx ignores `limits` when a transport is given, so they go to the wrapped transport
+    limits = kwargs.pop("limits", None)
+    transport = httpx.AsyncHTTPTransport(limits=limits) if limits is not None else None
+    return httpx.AsyncClient(transport=TracingTransport(transport), **kwargs)
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """pymongo command listener turning each Mongo command into a client span"""
+
+    # Connection handshakes and monitoring chatter are not interesting per request
+    IGNORED_COMMANDS = frozenset({"hello", "ismaster", "isMaster", "saslStart", "saslContinue", "endSessions"})
+
+    def __init__(self):
+        self._spans: Dict[Any, Span] = {}
+
+    def started(self, event) -> None:
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        child = start_span(f"mongo {event.command_name}", "client", **{
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.collection": str(event.command.get(event.command_name, "")),
+        })
+        if child is not None:
+            self._spans[(event.connection_id, event.request_id)] = child
+
+    def succeeded(self, event) -> None:
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.end()
+
+    def failed(self, event) -> None:
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.record_error(event.failure.get("errmsg", event.failure) if isinstance(event.failure, dict) else event.failure)
+            child.end()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the root span of every HTTP request
+    Continues an incoming traceparent, records the response status and tags
+    the request's log records with the trace ID.
+    """
+
+    def __init__(self, app, excluded_paths=("/metrics", "/health", "/ready")):
+        # Imported here: utils.logging depends on utils.metrics, which depends on this module
+        from utils.logging import bind_log_context
+        self.app = app
+        self.excluded_paths = frozenset(excluded_paths)
+        self._bind_log_context = bind_log_context
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_trace(f"{scope['method']} {scope['path']}", traceparent, **{
+            "http.method": scope["method"], "url.path": scope["path"]
+        }) as root:
+            self._bind_log_context(trace_id=root.trace_id)
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.record_error(f"HTTP {message['status']}")
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+def setup_tracing() -> None:
+    """Configure exporters and sampling from settings; tracing stays off without exporters"""
+    from config import settings
+
+    exporters = []
+    for name in (item.strip() for item in settings.TRACE_EXPORTERS.split(",") if item.strip()):
+        if name == "jsonl":
+            exporters.append(JsonlExporter(settings.TRACE_JSONL_PATH))
+        elif name == "otlp":
+            headers = dict(
+                pair.split("=", 1) for pair in settings.OTLP_HEADERS.split(",") if "=" in pair
+            )
+            exporters.append(OtlpHttpExporter(settings.OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME, headers))
+        else:
+            logger.warning("⚠️  Unknown trace exporter: %s", name)
+    tracer.configure(exporters, settings.TRACE_SAMPLE_RATE, settings.TRACE_SLOW_THRESHOLD_SECONDS)
+    if exporters:
+        logger.info("🔭 Tracing enabled: exporters=%s, sample_rate=%s, slow>=%ss",
+                    [type(exporter).__name__ for exporter in exporters],
+                    settings.TRACE_SAMPLE_RATE, settings.TRACE_SLOW_THRESHOLD_SECONDS)
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STARTUP_PHASE_SECONDS = registry.gauge(
+    "dirq_startup_phase_seconds",
+    "Time spent in each startup phase (imports, warm-up steps)",
+    labelnames=("phase",)
+)
+STARTUP_READY = registry.gauge(
+    "dirq_startup_ready",
+    "1 once warm-up has finished and the instance reports healthy"
+)
+
+
+class Warmup:
+    """
+    Runs the startup warm-up steps and tracks readiness
+    Steps run concurrently in the background so the server can answer health
+    checks (503 "starting") while connections are being opened. A step that
+    fails or overruns the timeout is reported but does not keep the instance
+    unready: the services fall back to connecting on first use.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record_phase(self, name: str, seconds: float, ok: bool = True, error: Optional[str] = None) -> None:
+        self.phases[name] = {"ms": round(seconds * 1000, 1), "ok": ok, **({"error": error} if error else {})}
+        STARTUP_PHASE_SECONDS.labels(name).set(seconds)
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        self.finished_at = time.time()
+        STARTUP_READY.set(1)
+
+    def start(self, steps: Dict[str, Callable[[], Awaitable[Any]]], timeout: float) -> None:
+        """Run the steps in a background task; must be called from the running loop"""
+        self.ready = False
+        self.started_at = time.time()
+        STARTUP_READY.set(0)
+        self._task = asyncio.get_running_loop().create_task(self._run(steps, timeout))
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        started = time.perf_counter()
+        try:
+            result = await step()
+            error = result.get("error") if isinstance(result, dict) and not result.get("success", True) else None
+            self.record_phase(f"warmup_{name}", time.perf_counter() - started, ok=error is None, error=error)
+        except Exception as e:
+            self.record_phase(f"warmup_{name}", time.perf_counter() - started, ok=False, error=f"{type(e).__name__}: {e}")
+
+    async def _run(self, steps: Dict[str, Callable[[], Awaitable[Any]]], timeout: float) -> None:
+        started = time.perf_counter()
+        pending = {name: asyncio.ensure_future(self._step(name, step)) for name, step in steps.items()}
+        done, not_done = await asyncio.wait(pending.values(), timeout=timeout)
+        for name, task in pending.items():
+            if task in not_done:
+                task.cancel()
+                self.record_phase(f"warmup_{name}", timeout, ok=False, error=f"timed out after {timeout}s")
+        self.record_phase("warmup", time.perf_counter() - started)
+        self.mark_ready()
+        failed = [name for name, phase in self.phases.items() if not phase["ok"]]
+        if failed:
+            logger.warning("⚠️  Warm-up finished in %.2fs with failures: %s", time.perf_counter() - started,
+                           ", ".join(f"{name} ({self.phases[name]['error']})" for name in failed))
+        else:
+            logger.info("🔥 Warm-up finished in %.2fs: %s", time.perf_counter() - started,
+                        ", ".join(f"{name} {phase['ms']}ms" for name, phase in self.phases.items()))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "phases": self.phases,
+        }
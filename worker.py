@@ -0,0 +1,203 @@
+"""
+Worker tier for PROCESSING_MODE=queue
+
+The web service only validates webhooks and queues them; this process
+leases jobs from the MongoDB job queue and runs the existing
+claim/context/OpenAI/send/log pipeline on them. Run as many worker
+processes as the backlog needs, independently of the web replicas:
+
+    python worker.py
+"""
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import signal
+from typing import Any, Dict, Optional, Set
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+import uvicorn
+from dotenv import load_dotenv
+from utils.logging import setup_logging, get_logger, bind_log_context
+from utils.tracing import setup_tracing
+from api.routes import webhook, metrics
+from api.dependencies import services
+from core.services.job_queue import JobQueue, publish_queue_metrics, worker_id
+from models.event import WebhookEvent
+from utils.deadline import Deadline
+from config import settings
+
+load_dotenv()
+
+setup_logging()
+setup_tracing()
+logger = get_logger(__name__)
+
+_import_seconds = time.perf_counter() - _import_started
+services.warmup.record_phase("imports", _import_seconds)
+
+
+class Worker:
+    """
+    Leases jobs and runs them through the webhook pipeline, up to `concurrency` at a time
+    A job is acknowledged once the pipeline returns and failed (retried with
+    backoff, then dead-lettered) when it raises. The event's own checkpoint
+    lease still guards the pipeline, so a job whose visibility timeout ran
+    out while its first worker was still busy is answered as a duplicate.
+    The queue hands every job of a conversation to the worker already running
+    one of them, so the per-conversation lock and coalescer work as inline.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float):
+        self.id = worker_id()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stopping = asyncio.Event()
+        self.processed = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, queue: JobQueue) -> None:
+        """Lease and process jobs until stop(), then wait for the jobs in flight"""
+        logger.info("👷 Worker %s started (concurrency %s)", self.id, self.concurrency)
+        while not self.stopping.is_set():
+            await self._slots.acquire()
+            try:
+                job = await asyncio.to_thread(queue.lease, self.id)
+            except Exception as e:
+                logger.warning("⚠️  Could not lease a job: %s", e)
+                job = None
+            if job is None:
+                self._slots.release()
+                await self._idle(self.poll_interval)
+                continue
+            task = asyncio.create_task(self._process(queue, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            logger.info("⏳ Draining %s jobs in flight", len(self._tasks))
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info("👋 Worker %s stopped after %s jobs", self.id, self.processed)
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    async def _idle(self, seconds: float) -> None:
+        """Sleep, waking early on stop()"""
+        try:
+            await asyncio.wait_for(self.stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _process(self, queue: JobQueue, job: Dict[str, Any]) -> None:
+        try:
+            event = WebhookEvent(**job["payload"])
+            bind_log_context(event_id=event.event_id, conversation_id=event.conversation_id, job_attempt=job["attempts"])
+            result = await webhook.process_queued_event(
+                event, Deadline(settings.WEBHOOK_DEADLINE_SECONDS), job.get("traceparent")
+            )
+            if result.get("status") == "duplicate_ignored" and \
+                    await asyncio.to_thread(services.mongodb_service.event_state, event.event_id) == "leased":
+                # Another worker holds the event (an earlier lease of this job that overran); check back after its lease
+                await asyncio.to_thread(queue.defer, job, settings.CHECKPOINT_LEASE_SECONDS, "Event leased by another worker")
+            else:
+                await asyncio.to_thread(queue.ack, job)
+        except Exception as e:
+            # HTTPException (reservation unavailable, pipeline error) carries its message in detail
+            error = f"{type(e).__name__}: {getattr(e, 'detail', None) or e}"
+            logger.error("❌ Job %s failed on attempt %s: %s", job["_id"], job["attempts"], error)
+            try:
+                await asyncio.to_thread(queue.fail, job, error)
+            except Exception as fail_error:
+                # The visibility timeout returns the job to the queue anyway
+                logger.warning("⚠️  Could not record the failure of job %s: %s", job["_id"], fail_error)
+        finally:
+            self.processed += 1
+            self._slots.release()
+
+
+async def publish_stats(interval: float) -> None:
+    """Export queue depth and lag every `interval` seconds"""
+    while True:
+        stats = await asyncio.to_thread(services.mongodb_service.job_stats)
+        if stats is not None:
+            publish_queue_metrics(stats)
+        await asyncio.sleep(interval)
+
+
+def metrics_app(worker: Worker) -> FastAPI:
+    """/metrics and /health for the worker process; it serves no webhooks"""
+    app = FastAPI(title="Dixa Workflow Worker", default_response_class=ORJSONResponse)
+    app.include_router(metrics.router, tags=["metrics"])
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "stopping" if worker.stopping.is_set() else "healthy",
+            "service": "dixa-worker",
+            "worker": worker.id,
+            "in_flight": worker.in_flight,
+            "processed": worker.processed,
+            "startup": services.warmup.report(),
+        }
+
+    return app
+
+
+async def main() -> None:
+    if settings.PROCESSING_MODE != "queue":
+        logger.warning("⚠️  PROCESSING_MODE is %r: the web service processes webhooks itself and queues nothing",
+                       settings.PROCESSING_MODE)
+    if settings.JOB_VISIBILITY_TIMEOUT_SECONDS <= settings.WEBHOOK_DEADLINE_SECONDS:
+        logger.warning("⚠️  JOB_VISIBILITY_TIMEOUT_SECONDS (%s) should exceed WEBHOOK_DEADLINE_SECONDS (%s), "
+                       "or slow jobs are leased twice", settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+                       settings.WEBHOOK_DEADLINE_SECONDS)
+
+    worker = Worker(settings.WORKER_CONCURRENCY, settings.WORKER_POLL_INTERVAL_SECONDS)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, worker.stop)
+
+    if settings.LOOP_WATCHDOG_ENABLED:
+        services.loop_watchdog.start()
+    if settings.WARMUP_ENABLED:
+        services.start_warm_up()
+    else:
+        services.warmup.mark_ready()
+
+    mongodb = await asyncio.to_thread(lambda: services.mongodb_service)
+    if mongodb.jobs is None:
+        logger.error("❌ The job queue is unavailable (MongoDB not connected), worker exiting")
+        await services.close()
+        raise SystemExit(1)
+
+    stats_task = asyncio.create_task(publish_stats(settings.READINESS_INTERVAL_SECONDS))
+    server: Optional[uvicorn.Server] = None
+    server_task: Optional[asyncio.Task] = None
+    if settings.WORKER_METRICS_PORT > 0:
+        server = uvicorn.Server(uvicorn.Config(
+            metrics_app(worker), host="0.0.0.0", port=settings.WORKER_METRICS_PORT, log_config=None
+        ))
+        # The worker handles SIGTERM itself: stop leasing, drain, then shut the server down
+        server.install_signal_handlers = lambda: None
+        server_task = asyncio.create_task(server.serve())
+
+    try:
+        await worker.run(mongodb.jobs)
+    finally:
+        stats_task.cancel()
+        if server is not None:
+            server.should_exit = True
+        await asyncio.gather(stats_task, *([server_task] if server_task else []), return_exceptions=True)
+        await services.close()
+        if settings.LOOP_WATCHDOG_ENABLED:
+            await services.loop_watchdog.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())